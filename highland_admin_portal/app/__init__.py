@@ -38,6 +38,46 @@ def create_app():
     from app.logging_config import setup_logging
     setup_logging(app)
 
+    # Knowledge base full-text search index (hooks + CLI rebuild)
+    from app import kb_search
+    kb_search.init_app(app)
+
+    # Buffered knowledge base view tracking
+    from app.kb_views import article_view_buffer
+    article_view_buffer.init_app(app)
+
+    # Knowledge base render cache (sanitized bodies, excerpts, payload LRU)
+    from app.kb_render import article_render_cache
+    article_render_cache.init_app(app)
+
+    # Precomputed related articles (incremental refresh + CLI rebuild)
+    from app.kb_related import related_article_index
+    related_article_index.init_app(app)
+
+    # Supplier search index and article summaries (hooks + CLI rebuild)
+    from app import kb_supplier_directory
+    kb_supplier_directory.init_app(app)
+
+    # Trigram indexes behind substring searches (hooks + CLI rebuild)
+    from app import search_index
+    search_index.init_app(app)
+
+    # Product catalogue search (code/name-token lookups + result cache)
+    from app.product_search import product_search
+    product_search.init_app(app)
+
+    # Customer stock ledger (atomic movements with conflict retries)
+    from app.stock_ledger import stock_ledger
+    stock_ledger.init_app(app)
+
+    # In-memory customer autocomplete index
+    from app.customer_index import customer_index
+    customer_index.init_app(app)
+
+    # Shared image store for uploads
+    from app.media import media_store
+    media_store.init_app(app)
+
     # Register blueprints
     from app.routes import main
     from app.blueprints.auth import auth_bp
@@ -49,6 +89,7 @@ def create_app():
     from app.blueprints.forms import forms_bp
     from app.blueprints.customers import customers_bp
     from app.blueprints.company_updates import company_updates_bp
+    from app.blueprints.media import media_bp
 
     # Knowledge Base blueprints
     from app.blueprints.kb_articles import bp as kb_articles_bp
@@ -65,6 +106,7 @@ def create_app():
     app.register_blueprint(forms_bp)
     app.register_blueprint(customers_bp)
     app.register_blueprint(company_updates_bp)
+    app.register_blueprint(media_bp)
 
     # Register Knowledge Base blueprints
     app.register_blueprint(kb_articles_bp)
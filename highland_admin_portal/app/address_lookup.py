@@ -0,0 +1,180 @@
+"""
+Customer Address Lookup
+
+Pickers, callsheets and forms resolve addresses for many customers at
+once. Lookups go through one ``customer_id IN (...)`` query for the
+customers not resolved yet in this request, and the results are cached on
+flask.g, so repeated lookups (primary address, address by label, the
+picker list) don't query again. Writes to CustomerAddress drop the
+customer from the cache; a commit or rollback drops the whole cache,
+since the cached instances are expired.
+
+(customer_id, label) is unique, so adding an address from a form is a
+single INSERT ... ON CONFLICT DO NOTHING instead of check-then-insert.
+"""
+
+import logging
+from flask import g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import CustomerAddress
+
+logger = logging.getLogger(__name__)
+
+# Dialects whose INSERT supports ON CONFLICT
+UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def _cache():
+    if not has_app_context():
+        return {}
+    return g.setdefault('_address_cache', {})
+
+
+# ==================== LOOKUPS ====================
+
+def addresses_by_customer(customer_ids):
+    """
+    Resolve the addresses of many customers with at most one query per request.
+
+    Args:
+        customer_ids (iterable): Customer IDs to resolve (None values are ignored)
+
+    Returns:
+        dict: Mapping of customer ID to its addresses in creation order
+        (customers without addresses map to an empty list)
+    """
+    cache = _cache()
+    wanted = {cid for cid in customer_ids if cid is not None}
+    missing = wanted - cache.keys()
+
+    if missing:
+        for cid in missing:
+            cache[cid] = []
+        rows = CustomerAddress.query\
+            .filter(CustomerAddress.customer_id.in_(missing))\
+            .order_by(CustomerAddress.customer_id, CustomerAddress.id)\
+            .all()
+        for address in rows:
+            cache[address.customer_id].append(address)
+
+    return {cid: cache[cid] for cid in wanted}
+
+
+def addresses_for(customer_id):
+    """All addresses of one customer, through the per-request cache"""
+    return addresses_by_customer([customer_id])[customer_id]
+
+
+def pick_primary(addresses):
+    """The primary address of a list, else the first, else None"""
+    for address in addresses:
+        if address.is_primary:
+            return address
+    return addresses[0] if addresses else None
+
+
+def pick_label(addresses, label):
+    """The address with the given label from a list, or None"""
+    for address in addresses:
+        if address.label == label:
+            return address
+    return None
+
+
+def legacy_address(street):
+    """Picker entry for a customer that only has the deprecated single address field"""
+    return {
+        'id': None,
+        'label': 'Primary',
+        'phone': '',
+        'street': street,
+        'city': '',
+        'zip': '',
+        'is_primary': True
+    }
+
+
+def address_dicts(addresses, legacy_street=None):
+    """
+    Serialize addresses for the pickers.
+
+    Falls back to the legacy single address when the customer has no
+    addresses yet.
+    """
+    if addresses:
+        return [address.to_dict() for address in addresses]
+    if legacy_street:
+        return [legacy_address(legacy_street)]
+    return []
+
+
+# ==================== WRITES ====================
+
+def add_address(customer_id, label, street='', city='', zip='', phone='', is_primary=False):
+    """
+    Add an address unless the customer already has one with that label.
+
+    One INSERT ... ON CONFLICT (customer_id, label) DO NOTHING in the
+    current transaction (the caller commits). Dialects without ON CONFLICT
+    insert inside a savepoint and treat a unique violation as the existing
+    address.
+
+    Returns:
+        bool: True if the address was created, False if the label already existed
+    """
+    values = {
+        'customer_id': customer_id,
+        'label': label,
+        'street': street,
+        'city': city,
+        'zip': zip,
+        'phone': phone,
+        'is_primary': is_primary
+    }
+
+    insert = UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        created = db.session.execute(
+            insert(CustomerAddress).values(**values)
+            .on_conflict_do_nothing(index_elements=['customer_id', 'label'])
+            .returning(CustomerAddress.id)
+        ).scalar() is not None
+    else:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(db.insert(CustomerAddress).values(**values))
+            created = True
+        except IntegrityError:
+            created = False
+
+    forget([customer_id])
+    return created
+
+
+# ==================== CACHE INVALIDATION ====================
+
+def forget(customer_ids):
+    """Drop customers from the per-request cache"""
+    cache = _cache()
+    for cid in customer_ids:
+        cache.pop(cid, None)
+
+
+@event.listens_for(CustomerAddress, 'after_insert')
+@event.listens_for(CustomerAddress, 'after_update')
+@event.listens_for(CustomerAddress, 'after_delete')
+def _address_changed(mapper, connection, target):
+    forget([target.customer_id])
+
+
+@event.listens_for(db.session, 'after_commit')
+@event.listens_for(db.session, 'after_rollback')
+def _clear_after_transaction(session):
+    if has_app_context():
+        g.pop('_address_cache', None)
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_required, current_user
 from app import db
 from app.models import Callsheet, CallsheetEntry, CallsheetArchive, Customer, User, CallHistory
+from app.address_lookup import addresses_by_customer
 from datetime import datetime, date, timedelta
 from sqlalchemy.orm import joinedload
 import json
@@ -28,6 +29,11 @@ def callsheets():
         Callsheet.name
     ).all()
     
+    # Resolve every entry's location in one query; entry.address then loads from the identity map
+    addresses_by_customer(
+        entry.customer_id for callsheet in callsheets for entry in callsheet.entries if entry.address_id
+    )
+    
     # Organize callsheets by day
     days_of_week = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
     callsheets_by_day = {day: [] for day in days_of_week}
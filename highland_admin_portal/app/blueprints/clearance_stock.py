@@ -1,46 +1,151 @@
 from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required, current_user
-from app import db
+from app import db, search_index, clearance_sales
 from app.models import ClearanceStock
-from datetime import datetime
-from sqlalchemy import or_
+from app.clearance_sales import SaleError, BatchSaleRejected
+from app.stock_ledger import stock_ledger
+from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
 import openpyxl
 from io import BytesIO
 
 clearance_stock_bp = Blueprint('clearance_stock', __name__, url_prefix='/clearance')
 
+# Columns the item list can be sorted by (?sort=)
+SORT_COLUMNS = {
+    'pallet': ClearanceStock.pallet,
+    'description': ClearanceStock.description,
+    'supplier_code': ClearanceStock.supplier_code,
+    'his_code': ClearanceStock.his_code,
+    'qty': ClearanceStock.qty,
+    'qty_sold': ClearanceStock.qty_sold,
+    'cost_price': ClearanceStock.cost_price,
+    'total_price': ClearanceStock.total_price,
+    'updated_at': ClearanceStock.updated_at,
+}
+
+MAX_PER_PAGE = 200
+
+# Items without a pallet are grouped under ''
+pallet_key = db.func.coalesce(ClearanceStock.pallet, '')
+
 @clearance_stock_bp.route('/')
 @login_required
 def clearance_stock():
     return render_template('clearance_stock.html', title='Clearance Stock')
 
-@clearance_stock_bp.route('/api/clearance-stock')
-@login_required
-def get_clearance_stock():
-    search = request.args.get('search', '').strip()
-    pallet_filter = request.args.get('pallet', '').strip()
-    
-    query = ClearanceStock.query
-    
+def filter_clearance_query(query, args):
+    """
+    Apply the list filters: ?search= and ?pallet=.
+
+    A present but empty ?pallet= selects items without a pallet.
+    """
+    search = args.get('search', '').strip()
     if search:
         query = query.filter(
-            or_(
-                ClearanceStock.supplier_code.ilike(f'%{search}%'),
-                ClearanceStock.his_code.ilike(f'%{search}%'),
-                ClearanceStock.description.ilike(f'%{search}%'),
-                ClearanceStock.pallet.ilike(f'%{search}%')
-            )
+            search_index.search(ClearanceStock, ['supplier_code', 'his_code', 'description', 'pallet'], search)
         )
-    
-    if pallet_filter:
-        query = query.filter(ClearanceStock.pallet == pallet_filter)
-    
-    items = query.order_by(ClearanceStock.pallet, ClearanceStock.description).all()
-    
+
+    if 'pallet' in args:
+        pallet = args.get('pallet', '').strip()
+        if pallet:
+            query = query.filter(ClearanceStock.pallet == pallet)
+        else:
+            query = query.filter(pallet_key == '')
+
+    return query
+
+def aggregate_columns():
+    """Line count, units left, units sold and remaining cost value"""
+    return (
+        db.func.count(ClearanceStock.id).label('line_count'),
+        db.func.coalesce(db.func.sum(ClearanceStock.qty), 0).label('qty'),
+        db.func.coalesce(db.func.sum(ClearanceStock.qty_sold), 0).label('qty_sold'),
+        db.func.coalesce(db.func.sum(ClearanceStock.qty * ClearanceStock.cost_price), 0).label('total_value'),
+    )
+
+def aggregates_to_dict(row):
+    return {
+        'line_count': row.line_count,
+        'qty': int(row.qty),
+        'qty_sold': int(row.qty_sold),
+        'total_value': round(float(row.total_value), 2)
+    }
+
+def pallet_aggregates(query):
+    """Per-pallet aggregates of a filtered item query (GROUP BY pallet)"""
+    rows = query.with_entities(pallet_key.label('pallet'), *aggregate_columns())\
+        .group_by(pallet_key).order_by(pallet_key).all()
+    return [dict(pallet=row.pallet, **aggregates_to_dict(row)) for row in rows]
+
+@clearance_stock_bp.route('/api/clearance-stock')
+@login_required
+def get_clearance_stock():
+    """
+    Clearance items, a page at a time.
+
+    Filters: ?search=, ?pallet=. Sorting: ?sort= (one of SORT_COLUMNS,
+    default pallet then description) and ?order=asc|desc. Paging: ?page=
+    and ?per_page=. The response carries totals for the whole filtered
+    set and per-pallet aggregates for the pallets on this page.
+    """
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 100, type=int), 1), MAX_PER_PAGE)
+    sort = request.args.get('sort', 'pallet')
+    descending = request.args.get('order', 'asc') == 'desc'
+
+    if sort not in SORT_COLUMNS:
+        return jsonify({'success': False, 'message': f'Invalid sort column: {sort}'}), 400
+
+    query = filter_clearance_query(ClearanceStock.query, request.args)
+
+    sort_column = SORT_COLUMNS[sort]
+    ordering = [sort_column.desc() if descending else sort_column.asc()]
+    if sort == 'pallet':
+        ordering.append(ClearanceStock.description)
+    ordering.append(ClearanceStock.id.desc() if descending else ClearanceStock.id)
+
+    items = query.order_by(*ordering).offset((page - 1) * per_page).limit(per_page).all()
+    totals = aggregates_to_dict(query.with_entities(*aggregate_columns()).one())
+
+    page_pallets = {item.pallet or '' for item in items}
+    pallet_totals = []
+    if page_pallets:
+        pallet_totals = pallet_aggregates(query.filter(pallet_key.in_(page_pallets)))
+
     return jsonify({
         'success': True,
-        'items': [item.to_dict() for item in items]
+        'items': [item.to_dict() for item in items],
+        'page': page,
+        'per_page': per_page,
+        'total': totals['line_count'],
+        'has_next': page * per_page < totals['line_count'],
+        'sort': sort,
+        'order': 'desc' if descending else 'asc',
+        'totals': totals,
+        'pallet_totals': pallet_totals
+    })
+
+@clearance_stock_bp.route('/api/clearance-stock/pallets/summary')
+@login_required
+def get_pallet_summary():
+    """
+    Pallet headers with aggregates (line count, qty, qty sold, remaining
+    cost value), honouring ?search= and ?pallet=. Lines are loaded per
+    pallet from /api/clearance-stock?pallet=.
+    """
+    pallets = pallet_aggregates(filter_clearance_query(ClearanceStock.query, request.args))
+
+    totals = {
+        key: sum(pallet[key] for pallet in pallets)
+        for key in ('line_count', 'qty', 'qty_sold', 'total_value')
+    }
+    totals['total_value'] = round(totals['total_value'], 2)
+
+    return jsonify({
+        'success': True,
+        'pallets': pallets,
+        'totals': totals
     })
 
 @clearance_stock_bp.route('/api/clearance-stock/pallets')
@@ -121,25 +226,19 @@ def sell_clearance_item(item_id):
         data = request.json
         
         qty_to_sell = int(data.get('qty_sold', 0))
+        user_id = current_user.id
         
-        if qty_to_sell <= 0:
-            return jsonify({'success': False, 'message': 'Quantity must be greater than 0'}), 400
-        
-        if qty_to_sell > item.qty:
-            return jsonify({'success': False, 'message': f'Cannot sell {qty_to_sell}. Only {item.qty} available.'}), 400
-        
-        # Update quantities
-        item.qty -= qty_to_sell
-        item.qty_sold += qty_to_sell
-        item.updated_at = datetime.utcnow()
-        
-        db.session.commit()
+        # Conditional UPDATE + sale ledger row; fails instead of overselling
+        stock_ledger.run(lambda: clearance_sales.sell(item_id, qty_to_sell, user_id))
         
+        db.session.refresh(item)
         return jsonify({
             'success': True,
             'message': f'Marked {qty_to_sell} units as sold',
             'item': item.to_dict()
         })
+    except SaleError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 400
@@ -157,6 +256,78 @@ def sell_clearance_item(item_id):
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 400
 
+@clearance_stock_bp.route('/api/clearance-stock/sell', methods=['POST'])
+@login_required
+def sell_clearance_batch():
+    """
+    Sell several clearance lines in one transaction.
+    
+    Body: {lines: [{item_id, qty}], all_or_nothing: false}
+    Each line is a conditional update; the response reports success per
+    line. With all_or_nothing, any failed line rolls back the whole batch.
+    """
+    data = request.json or {}
+    raw_lines = data.get('lines') or []
+    
+    if not isinstance(raw_lines, list) or not raw_lines:
+        return jsonify({'success': False, 'message': 'At least one line is required'}), 400
+    if len(raw_lines) > clearance_sales.MAX_BATCH_LINES:
+        return jsonify({'success': False, 'message': f'Too many lines (max {clearance_sales.MAX_BATCH_LINES})'}), 400
+    
+    lines = []
+    for number, line in enumerate(raw_lines, start=1):
+        try:
+            lines.append((int(line['item_id']), int(line['qty'])))
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'success': False, 'message': f'Line {number}: item_id and qty must be numbers'}), 400
+    
+    try:
+        results = clearance_sales.sell_batch(lines, current_user.id, all_or_nothing=bool(data.get('all_or_nothing')))
+    except BatchSaleRejected as e:
+        return jsonify({'success': False, 'message': str(e), 'lines': e.results}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    sold = sum(1 for result in results if result['success'])
+    return jsonify({
+        'success': sold == len(results),
+        'message': f'Sold {sold} of {len(results)} lines',
+        'lines': results
+    })
+
+@clearance_stock_bp.route('/api/clearance-stock/sales')
+@login_required
+def get_clearance_sales():
+    """
+    Sold quantities from the sale ledger, grouped by ?group_by=pallet|item|day.
+    
+    ?from= and ?to= (YYYY-MM-DD, inclusive) limit the date range.
+    """
+    group_by = request.args.get('group_by', 'pallet')
+    if group_by not in clearance_sales.REPORT_GROUPS:
+        return jsonify({'success': False, 'message': f'Invalid group_by: {group_by}'}), 400
+    
+    try:
+        start = request.args.get('from')
+        end = request.args.get('to')
+        start = datetime.strptime(start, '%Y-%m-%d') if start else None
+        end = datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1) if end else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be YYYY-MM-DD'}), 400
+    
+    rows = clearance_sales.sales_summary(group_by, start, end)
+    return jsonify({
+        'success': True,
+        'group_by': group_by,
+        'rows': rows,
+        'totals': {
+            'sale_count': sum(row['sale_count'] for row in rows),
+            'qty': sum(row['qty'] for row in rows),
+            'cost_value': round(sum(row['cost_value'] for row in rows), 2)
+        }
+    })
+
 @clearance_stock_bp.route('/api/clearance-stock/upload', methods=['POST'])
 @login_required
 def upload_clearance_file():
@@ -8,11 +8,8 @@ from flask_login import current_user, login_required
 from app import db
 from app.models import User, CompanyUpdate
 from app.utils import validate_company_update, sanitize_html_content, get_category_config, allowed_file
-import os
+from app.media import media_store
 from datetime import datetime
-from werkzeug.utils import secure_filename
-from PIL import Image
-import uuid
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,32 +20,6 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 MAX_IMAGE_SIZE = 2 * 1024 * 1024  # 2MB
 
 
-def ensure_upload_dir():
-    """Create upload directory if it doesn't exist"""
-    now = datetime.now()
-    upload_dir = os.path.join('static', 'uploads', 'company_updates', str(now.year), f"{now.month:02d}")
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir)
-    return upload_dir
-
-
-def resize_image(image_path, max_width=800, max_height=600):
-    """Resize image while maintaining aspect ratio"""
-    try:
-        with Image.open(image_path) as img:
-            # Convert to RGB if necessary (for JPEG saving)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
-
-            # Calculate new dimensions
-            img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-
-            # Save optimized image
-            img.save(image_path, 'JPEG', quality=85, optimize=True)
-    except Exception as e:
-        logger.error(f"Error resizing image: {e}", exc_info=True)
-
-
 # API Routes
 @company_updates_bp.route('/api', methods=['GET'])
 @login_required
@@ -252,38 +223,21 @@ def upload_image():
     if not allowed_file(file.filename):
         return jsonify({'success': False, 'message': 'Invalid file type. Please upload PNG, JPG, JPEG, GIF, or WebP files.'}), 400
 
-    # Check file size
-    if len(file.read()) > MAX_IMAGE_SIZE:
-        return jsonify({'success': False, 'message': 'File too large. Maximum size is 2MB.'}), 400
-
-    file.seek(0)  # Reset file pointer after reading
-
     try:
-        # Generate unique filename
-        original_filename = secure_filename(file.filename)
-        name, ext = os.path.splitext(original_filename)
-        unique_filename = f"{uuid.uuid4().hex[:8]}_{name}{ext}"
-
-        # Create upload directory
-        upload_dir = ensure_upload_dir()
-        file_path = os.path.join(upload_dir, unique_filename)
-
-        # Save file
-        file.save(file_path)
-
-        # Resize image
-        resize_image(file_path)
-
-        # Return URL for frontend
-        from flask import url_for
-        image_url = url_for('static', filename=file_path.replace('static/', ''))
+        # Stored by content hash; variants are generated in the background
+        digest = media_store.save(file, max_bytes=MAX_IMAGE_SIZE)
+        urls = media_store.urls(digest)
 
         return jsonify({
             'success': True,
-            'image_url': image_url,
+            'image_url': urls['medium'],
+            'original_url': urls['original'],
+            'thumbnail_url': urls['thumb'],
             'message': 'Image uploaded successfully'
         })
 
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         logger.error(f"Error uploading image: {e}", exc_info=True)
         return jsonify({'success': False, 'message': f'Upload failed: {str(e)}'}), 500
@@ -1,22 +1,29 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
-from app import db
-from app.models import CustomerStock, StockTransaction, Customer, Form, CustomerAddress
+from app import db, search_index
+from app.models import CustomerStock, StockTransaction, Customer, Form
 from app.forms import BrandedStockForm
-from datetime import datetime
+from app.stock_ledger import (stock_ledger, balance_as_of, low_stock_count,
+                              StockLedgerError, BatchRejected, TRANSACTION_TYPES)
+from app.address_lookup import add_address
+from app.pagination import keyset_paginate, approximate_count, InvalidCursor
+from sqlalchemy.orm import joinedload
+from datetime import datetime, date, time
 import json
 
 customer_stock_bp = Blueprint('customer_stock', __name__, url_prefix='/customer-stock')
 
-def validate_stock_transaction(data, stock_item):
-    """Validate stock transaction input"""
+MAX_DELIVERY_NOTE_LINES = 500
+
+def validate_stock_transaction(data, stock_item=None):
+    """Validate stock transaction input (stock availability is checked when stock_item is given)"""
     errors = []
     
     # Required fields
     if not data.get('transaction_type'):
         errors.append('Transaction type is required')
     
-    if data.get('transaction_type') not in ['stock_in', 'stock_out', 'adjustment']:
+    if data.get('transaction_type') not in TRANSACTION_TYPES:
         errors.append('Invalid transaction type')
     
     # Validate quantity
@@ -24,11 +31,13 @@ def validate_stock_transaction(data, stock_item):
         quantity = int(data.get('quantity', 0))
         if quantity == 0:
             errors.append('Quantity cannot be zero')
+        if quantity < 0 and data.get('transaction_type') in ('stock_in', 'stock_out'):
+            errors.append('Quantity must be positive (use an adjustment to correct stock)')
         if abs(quantity) > 10000:
             errors.append('Quantity seems unreasonably high (max 10,000)')
         
         # Check stock availability for stock_out
-        if data.get('transaction_type') == 'stock_out' and quantity > stock_item.current_stock:
+        if stock_item is not None and data.get('transaction_type') == 'stock_out' and quantity > stock_item.current_stock:
             errors.append(f'Insufficient stock (available: {stock_item.current_stock})')
         
     except (ValueError, TypeError):
@@ -45,18 +54,53 @@ def validate_stock_transaction(data, stock_item):
     return errors
 
 
+def filter_stock_query(query, customer_id=None, search='', status=''):
+    """Apply the stock list filters (customer, product/customer search, low/zero/normal status)"""
+    if customer_id:
+        query = query.filter(CustomerStock.customer_id == customer_id)
+    
+    if search:
+        query = query.filter(
+            db.or_(
+                search_index.search(CustomerStock, ['product_code', 'product_name'], search),
+                CustomerStock.customer_id.in_(
+                    db.select(Customer.id).where(search_index.search(Customer, ['name'], search))
+                )
+            )
+        )
+    
+    if status == 'low':
+        query = query.filter(CustomerStock.is_low_stock.is_(True))
+    elif status == 'normal':
+        query = query.filter(CustomerStock.is_low_stock.is_(False))
+    elif status == 'zero':
+        query = query.filter(CustomerStock.is_low_stock.is_(True), CustomerStock.current_stock == 0)
+    
+    return query
+
+
 @customer_stock_bp.route('/')
 @login_required
 def customer_stock():
-    # Get all customer stock with low stock alerts
-    stock_items = CustomerStock.query.join(Customer).order_by(Customer.name, CustomerStock.product_name).all()
-    low_stock_items = [item for item in stock_items if item.current_stock <= item.reorder_level]
+    # Rows are loaded page by page from /api/customer-stock; only totals are computed here
+    total_items, customer_count, total_units = db.session.query(
+        db.func.count(CustomerStock.id),
+        db.func.count(db.distinct(CustomerStock.customer_id)),
+        db.func.coalesce(db.func.sum(CustomerStock.current_stock), 0)
+    ).one()
+    
+    stock_customers = db.session.query(Customer.id, Customer.name)\
+        .filter(Customer.id.in_(db.select(CustomerStock.customer_id)))\
+        .order_by(Customer.name).all()
     
     return render_template(
         'customer_stock.html',
         title='Customer Stock Management',
-        stock_items=stock_items,
-        low_stock_count=len(low_stock_items)
+        total_items=total_items,
+        customer_count=customer_count,
+        total_units=total_units,
+        low_stock_count=low_stock_count(),
+        stock_customers=stock_customers
     )
 
 
@@ -76,45 +120,49 @@ def branded_stock():
                     flash('Cannot order more than available stock', 'danger')
                     return redirect(url_for('customer_stock.branded_stock'))
                 
-                transaction = StockTransaction(
-                    stock_item_id=stock_item_id,
-                    transaction_type='stock_out',
-                    quantity=quantity_ordered,
-                    reference=request.form.get('order_reference', ''),
-                    notes=request.form.get('order_notes', ''),
-                    created_by=current_user.id
-                )
+                user_id = current_user.id
                 
-                stock_item.current_stock -= quantity_ordered
-                stock_item.updated_at = datetime.now()
+                def place_order():
+                    # Conditional update: fails instead of overselling if stock moved since the check above
+                    _, new_stock_level = stock_ledger.apply(
+                        stock_item.id, 'stock_out', quantity_ordered, user_id,
+                        reference=request.form.get('order_reference', ''),
+                        notes=request.form.get('order_notes', '')
+                    )
+                    
+                    form_data = {
+                        'customer_account': request.form.get('customer_account'),
+                        'customer_name': request.form.get('customer_name'),
+                        'address_label': request.form.get('address_label', ''),
+                        'product_code': request.form.get('product_code'),
+                        'product_name': request.form.get('product_name'),
+                        'quantity_delivered': quantity_ordered,
+                        'current_stock': new_stock_level,
+                        'order_reference': request.form.get('order_reference', ''),
+                        'order_notes': request.form.get('order_notes', ''),
+                        'transaction_type': 'Customer Stock Order'
+                    }
+                    
+                    new_form = Form(
+                        type='branded_stock',
+                        data=json.dumps(form_data),
+                        user_id=user_id,
+                        **Form.customer_fields(form_data)
+                    )
+                    db.session.add(new_form)
+                    db.session.flush()
+                    return new_form.id
                 
-                db.session.add(transaction)
-                
-                form_data = {
-                    'customer_account': request.form.get('customer_account'),
-                    'customer_name': request.form.get('customer_name'),
-                    'address_label': request.form.get('address_label', ''),
-                    'product_code': request.form.get('product_code'),
-                    'product_name': request.form.get('product_name'),
-                    'quantity_delivered': quantity_ordered,
-                    'current_stock': stock_item.current_stock,
-                    'order_reference': request.form.get('order_reference', ''),
-                    'order_notes': request.form.get('order_notes', ''),
-                    'transaction_type': 'Customer Stock Order'
-                }
-                
-                new_form = Form(
-                    type='branded_stock',
-                    data=json.dumps(form_data),
-                    user_id=current_user.id
-                )
-                db.session.add(new_form)
-                db.session.commit()
+                try:
+                    form_id = stock_ledger.run(place_order)
+                except StockLedgerError as e:
+                    flash(str(e), 'danger')
+                    return redirect(url_for('customer_stock.branded_stock'))
                 
-                print(f"✓ Order created successfully: #{new_form.id}")
+                print(f"✓ Order created successfully: #{form_id}")
                 
                 # Generate URLs
-                print_url = url_for('forms.print_form', form_id=new_form.id)
+                print_url = url_for('forms.print_form', form_id=form_id)
                 redirect_url = url_for('customer_stock.branded_stock')
                 
                 print(f"✓ Print URL: {print_url}")
@@ -140,9 +188,7 @@ def branded_stock():
         if request.method == 'POST':
             print(f"❌ Form validation failed: {form.errors}")
     
-    # GET request - display the form
-    stock_items = CustomerStock.query.join(Customer).order_by(Customer.name, CustomerStock.product_name).all()
-    
+    # GET request - display the form (stock lines are loaded from /api/customer-stock)
     recent_forms = Form.query.filter_by(type='branded_stock').order_by(Form.date_created.desc()).limit(5).all()
     recent_branded_stock = []
     
@@ -157,10 +203,53 @@ def branded_stock():
     return render_template('branded_stock.html', 
                          title='Customer Stock Orders', 
                          form=form,
-                         stock_items=stock_items,
                          recent_branded_stock=recent_branded_stock)
 
 
+@customer_stock_bp.route('/api/customer-stock', methods=['GET'])
+@login_required
+def list_customer_stock():
+    """
+    Customer stock lines, a page at a time, ordered by product name.
+    
+    Filters: ?customer_id=, ?q= (product code/name or customer name) and
+    ?status=low|zero|normal. Uses keyset pagination on (product_name, id):
+    pass the previous response's next_cursor as ?cursor= to get the next
+    page. ?include_total=1 adds an approximate total.
+    """
+    per_page = min(request.args.get('per_page', 50, type=int), 200)
+    cursor = request.args.get('cursor') or None
+    include_total = request.args.get('include_total', type=int) == 1
+    
+    query = filter_stock_query(
+        CustomerStock.query,
+        customer_id=request.args.get('customer_id', type=int),
+        search=request.args.get('q', '').strip(),
+        status=request.args.get('status', '').strip()
+    )
+    
+    try:
+        stock_items, next_cursor = keyset_paginate(
+            query.options(joinedload(CustomerStock.customer)),
+            CustomerStock.product_name, CustomerStock.id,
+            cursor=cursor, limit=per_page
+        )
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    result = {
+        'stock_items': [item.to_dict() for item in stock_items],
+        'per_page': per_page,
+        'next_cursor': next_cursor,
+        'has_next': next_cursor is not None
+    }
+    
+    if include_total:
+        result['total'], result['total_exact'] = approximate_count(query)
+    
+    return jsonify(result)
+
+
 @customer_stock_bp.route('/api/customer-stock', methods=['POST'])
 @login_required
 def create_customer_stock():
@@ -181,18 +270,15 @@ def create_customer_stock():
             new_address_data = data.get('new_address', {})
             
             if new_address_data and new_address_data.get('label'):
-                # Create new address for this customer
-                new_address = CustomerAddress(
-                    customer_id=customer_id,
-                    label=new_address_data['label'],
+                # Create new address for this customer (kept as is if the label exists)
+                add_address(
+                    customer_id,
+                    new_address_data['label'],
                     street=new_address_data.get('street', ''),
                     city=new_address_data.get('city', ''),
                     zip=new_address_data.get('zip', ''),
-                    phone=new_address_data.get('phone', ''),
-                    is_primary=False
+                    phone=new_address_data.get('phone', '')
                 )
-                db.session.add(new_address)
-                db.session.flush()  # Get the ID
                 
                 # Use the new address label
                 address_label = new_address_data['label']
@@ -238,7 +324,8 @@ def create_customer_stock():
                 quantity=data['initial_stock'],
                 reference=data.get('invoice_number', 'Initial Stock'),
                 notes=notes,
-                created_by=current_user.id
+                created_by=current_user.id,
+                balance_after=data['initial_stock']
             )
             db.session.add(transaction)
         
@@ -273,42 +360,106 @@ def create_stock_transaction(stock_id):
     try:
         transaction_type = data['transaction_type']
         quantity = int(data['quantity'])
+        user_id = current_user.id
         
-        # Create the transaction
-        transaction = StockTransaction(
-            stock_item_id=stock_id,
-            transaction_type=transaction_type,
-            quantity=quantity,
+        # Atomic conditional update; the check above may already be stale under concurrent bookings
+        _, new_stock_level = stock_ledger.run(lambda: stock_ledger.apply(
+            stock_id, transaction_type, quantity, user_id,
             reference=data.get('reference', ''),
-            notes=data.get('notes', ''),
-            created_by=current_user.id
-        )
+            notes=data.get('notes', '')
+        ))
+        
+        return jsonify({
+            'success': True, 
+            'message': f'Stock {transaction_type.replace("_", " ")} recorded successfully',
+            'new_stock_level': new_stock_level
+        })
         
-        # Update stock levels
-        if transaction_type == 'stock_in':
-            stock_item.current_stock += quantity
-        elif transaction_type == 'stock_out':
-            if stock_item.current_stock < quantity:
-                return jsonify({'success': False, 'message': 'Insufficient stock available'}), 400
-            stock_item.current_stock -= quantity
-        elif transaction_type == 'adjustment':
-            # For adjustments, quantity can be positive or negative
-            new_stock = stock_item.current_stock + quantity
-            if new_stock < 0:
-                return jsonify({'success': False, 'message': 'Cannot adjust to negative stock'}), 400
-            stock_item.current_stock = new_stock
+    except StockLedgerError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+
+@customer_stock_bp.route('/api/customer-stock/delivery-note', methods=['POST'])
+@login_required
+def book_delivery_note():
+    """
+    Book every line of a delivery note in one transaction.
+    
+    Body: {reference, notes, transaction_type (default stock_out),
+           lines: [{stock_item_id, quantity, transaction_type?, notes?}]}
+    Either every line is booked or none is; rejected lines are listed in 'errors'.
+    """
+    data = request.json or {}
+    lines = data.get('lines') or []
+    
+    if not isinstance(lines, list) or not lines:
+        return jsonify({'success': False, 'message': 'At least one line is required'}), 400
+    if len(lines) > MAX_DELIVERY_NOTE_LINES:
+        return jsonify({'success': False, 'message': f'Too many lines (max {MAX_DELIVERY_NOTE_LINES})'}), 400
+    
+    # Validate every line before touching stock
+    movements = []
+    errors = []
+    for number, line in enumerate(lines, start=1):
+        line = line if isinstance(line, dict) else {}
+        movement = {
+            'stock_item_id': line.get('stock_item_id'),
+            'transaction_type': line.get('transaction_type', data.get('transaction_type', 'stock_out')),
+            'quantity': line.get('quantity'),
+            'reference': data.get('reference', ''),
+            'notes': line.get('notes', data.get('notes', ''))
+        }
+        line_errors = validate_stock_transaction(movement)
+        try:
+            movement['stock_item_id'] = int(movement['stock_item_id'])
+        except (ValueError, TypeError):
+            line_errors.append('Invalid stock item')
         
-        stock_item.updated_at = datetime.now()
+        if line_errors:
+            errors.append({'line': number, 'stock_item_id': line.get('stock_item_id'), 'message': '; '.join(line_errors)})
+        else:
+            movement['quantity'] = int(movement['quantity'])
+            movements.append(movement)
+    
+    if errors:
+        return jsonify({'success': False, 'message': 'Validation errors', 'errors': errors}), 400
+    
+    try:
+        user_id = current_user.id
         
-        db.session.add(transaction)
-        db.session.commit()
+        def book():
+            results = stock_ledger.apply_batch(movements, user_id)
+            db.session.flush()  # Assign transaction IDs
+            return [
+                {
+                    'line': number,
+                    'stock_item_id': movement['stock_item_id'],
+                    'transaction_id': transaction.id,
+                    'new_stock_level': new_stock_level
+                }
+                for number, (movement, (transaction, new_stock_level)) in enumerate(zip(movements, results), start=1)
+            ]
+        
+        booked = stock_ledger.run(book)
         
         return jsonify({
-            'success': True, 
-            'message': f'Stock {transaction_type.replace("_", " ")} recorded successfully',
-            'new_stock_level': stock_item.current_stock
+            'success': True,
+            'message': f'Delivery note booked ({len(booked)} lines)',
+            'lines': booked
         })
         
+    except BatchRejected as e:
+        return jsonify({
+            'success': False,
+            'message': str(e),
+            'errors': [
+                {'line': index + 1, 'stock_item_id': movements[index]['stock_item_id'], 'message': str(error)}
+                for index, error in e.failures
+            ]
+        }), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 400
@@ -328,9 +479,8 @@ def search_customer_stock():
     if query:
         stock_query = stock_query.filter(
             db.or_(
-                CustomerStock.product_code.ilike(f'%{query}%'),
-                CustomerStock.product_name.ilike(f'%{query}%'),
-                Customer.name.ilike(f'%{query}%')
+                search_index.search(CustomerStock, ['product_code', 'product_name'], query),
+                search_index.search(Customer, ['name'], query)
             )
         )
     
@@ -341,8 +491,63 @@ def search_customer_stock():
 @customer_stock_bp.route('/api/customer-stock/<int:stock_id>/history')
 @login_required
 def get_stock_history(stock_id):
+    """
+    Stock movements for an item, newest first, a page at a time.
+    
+    Uses keyset pagination on (transaction_date, id): pass the previous
+    response's next_cursor as ?cursor= to get the next page. Each movement
+    carries balance_after, the stock level right after it.
+    """
     stock_item = CustomerStock.query.get_or_404(stock_id)
-    transactions = StockTransaction.query.filter_by(stock_item_id=stock_id)\
-        .order_by(StockTransaction.transaction_date.desc()).all()
+    per_page = min(request.args.get('per_page', 50, type=int), 200)
+    cursor = request.args.get('cursor') or None
+    
+    query = StockTransaction.query.filter_by(stock_item_id=stock_id).options(joinedload(StockTransaction.user))
+    try:
+        transactions, next_cursor = keyset_paginate(
+            query, StockTransaction.transaction_date, StockTransaction.id,
+            cursor=cursor, limit=per_page, descending=True
+        )
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return jsonify({
+        'stock_item_id': stock_item.id,
+        'current_stock': stock_item.current_stock,
+        'transactions': [transaction.to_dict() for transaction in transactions],
+        'per_page': per_page,
+        'next_cursor': next_cursor,
+        'has_next': next_cursor is not None
+    })
+
+
+@customer_stock_bp.route('/api/customer-stock/<int:stock_id>/balance')
+@login_required
+def get_stock_balance(stock_id):
+    """
+    Stock level of an item at a point in time.
+    
+    ?as_of= takes an ISO date or datetime (a bare date means the end of
+    that day); without it the current level is returned.
+    """
+    stock_item = CustomerStock.query.get_or_404(stock_id)
+    as_of = request.args.get('as_of', '').strip()
+    
+    if not as_of:
+        return jsonify({'stock_item_id': stock_item.id, 'as_of': None, 'balance': stock_item.current_stock})
+    
+    try:
+        if len(as_of) == 10:
+            moment = datetime.combine(date.fromisoformat(as_of), time.max)
+        else:
+            moment = datetime.fromisoformat(as_of)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid as_of date (use YYYY-MM-DD or an ISO datetime)'}), 400
     
-    return jsonify([transaction.to_dict() for transaction in transactions])
+    balance, transaction = balance_as_of(stock_id, moment)
+    return jsonify({
+        'stock_item_id': stock_item.id,
+        'as_of': moment.isoformat(),
+        'balance': balance,
+        'transaction_id': transaction.id if transaction else None
+    })
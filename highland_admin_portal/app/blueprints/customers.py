@@ -3,40 +3,54 @@ Customers Blueprint - Handles all customer-related operations
 Includes: Customer CRUD, addresses, search, directory
 """
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, Response
 from flask_login import current_user, login_required
-from app import db
-from app.models import Customer, CustomerAddress
+from app import db, search_index
+from app.models import Customer, CustomerAddress, StandingOrder, CallHistory, Form
 from app.utils import validate_customer_data
+from app.pagination import keyset_paginate, approximate_count, InvalidCursor
+from app.customer_index import customer_index
+from app.address_lookup import addresses_by_customer, addresses_for, address_dicts, forget as forget_addresses
+from sqlalchemy.orm import selectinload, joinedload, defer
+import hashlib
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
 customers_bp = Blueprint('customers', __name__, url_prefix='/customers')
 
+MAX_ADDRESS_LOOKUP_IDS = 200
+
+
+def find_duplicate_label(addresses):
+    """First address label that appears more than once in the submitted addresses, or None"""
+    seen = set()
+    for addr_data in addresses:
+        label = addr_data.get('label')
+        if label in seen:
+            return label
+        seen.add(label)
+    return None
+
 
 # API Routes
 @customers_bp.route('/api/search')
 @login_required
 def search_customers():
-    """Search customers by account number or name"""
+    """Autocomplete customers by account number or name (served from the in-memory index)"""
     query = request.args.get('q', '').strip()
 
     if len(query) < 2:
         return jsonify([])
 
-    customers = Customer.query.filter(
-        db.or_(
-            Customer.account_number.ilike(f'%{query}%'),
-            Customer.name.ilike(f'%{query}%')
-        )
-    ).limit(20).all()
+    results = customer_index.search(query, limit=20)
 
-    # Use to_dict() - includes addresses array
-    results = [customer.to_dict() for customer in customers]
+    # Addresses for every hit in one query
+    addresses = addresses_by_customer(result['id'] for result in results)
 
-    # Add display field
     for result in results:
+        result['addresses'] = address_dicts(addresses[result['id']], legacy_street=result['address'])
         result['display'] = f"{result['account_number']} - {result['name']}"
 
     return jsonify(results)
@@ -45,10 +59,17 @@ def search_customers():
 @customers_bp.route('/api/directory')
 @login_required
 def get_customers_directory():
-    """Get paginated customers for directory with optional search"""
+    """
+    Get customers for the directory, a page at a time, with optional search.
+
+    Uses keyset pagination on (name, id): pass the previous response's
+    next_cursor as ?cursor= to get the next page. ?include_total=1 adds an
+    approximate total.
+    """
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)  # Load 50 at a time
+        per_page = min(request.args.get('per_page', 50, type=int), 200)  # Load 50 at a time
+        cursor = request.args.get('cursor') or None
+        include_total = request.args.get('include_total', type=int) == 1
         search = request.args.get('search', '').strip()
 
         # Build query
@@ -56,19 +77,14 @@ def get_customers_directory():
 
         # Apply search filter if provided
         if search:
-            query = query.filter(
-                db.or_(
-                    Customer.account_number.ilike(f'%{search}%'),
-                    Customer.name.ilike(f'%{search}%'),
-                    Customer.contact_name.ilike(f'%{search}%')
-                )
-            )
+            query = query.filter(search_index.search(Customer, ['account_number', 'name', 'contact_name'], search))
 
-        # Order and paginate
-        query = query.order_by(Customer.name)
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        try:
+            customers, next_cursor = keyset_paginate(query, Customer.name, Customer.id, cursor=cursor, limit=per_page)
+        except InvalidCursor as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
 
-        return jsonify({
+        result = {
             'customers': [{
                 'id': customer.id,
                 'account_number': customer.account_number,
@@ -76,14 +92,16 @@ def get_customers_directory():
                 'contact_name': customer.contact_name,
                 'phone': customer.phone,
                 'email': customer.email
-            } for customer in pagination.items],
-            'page': page,
+            } for customer in customers],
             'per_page': per_page,
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'has_next': pagination.has_next,
-            'has_prev': pagination.has_prev
-        })
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None
+        }
+
+        if include_total:
+            result['total'], result['total_exact'] = approximate_count(query)
+
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Error fetching customer directory: {e}", exc_info=True)
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -97,6 +115,89 @@ def get_customer(customer_id):
     return jsonify(customer.to_dict())
 
 
+@customers_bp.route('/api/<int:customer_id>/overview')
+@login_required
+def get_customer_overview(customer_id):
+    """
+    Everything the customer view shows, in one response.
+
+    Profile, addresses, active standing orders with their items, stock
+    lines, the latest calls (?calls=, default 10) and recent forms
+    (?forms=, default 10). Relationships are loaded with selectinload, so
+    the endpoint runs the same seven queries for any customer. The
+    response carries an ETag; a matching If-None-Match gets a 304.
+    """
+    call_limit = min(max(request.args.get('calls', 10, type=int), 1), 50)
+    form_limit = min(max(request.args.get('forms', 10, type=int), 1), 50)
+
+    customer = Customer.query.options(
+        selectinload(Customer.addresses),
+        selectinload(Customer.standing_orders.and_(StandingOrder.status == 'active'))
+            .selectinload(StandingOrder.items),
+        selectinload(Customer.stock_items)
+    ).filter(Customer.id == customer_id).first_or_404()
+
+    calls = CallHistory.query.options(joinedload(CallHistory.caller))\
+        .filter(CallHistory.customer_id == customer_id)\
+        .order_by(CallHistory.call_date.desc())\
+        .limit(call_limit).all()
+
+    forms = Form.query.options(joinedload(Form.author), defer(Form.data))\
+        .filter(Form.customer_account == customer.account_number)\
+        .order_by(Form.date_created.desc())\
+        .limit(form_limit).all()
+
+    profile = customer.to_dict()
+    addresses = profile.pop('addresses')
+
+    stock_items = [item.to_dict() for item in sorted(customer.stock_items, key=lambda item: item.product_name)]
+
+    payload = {
+        'customer': profile,
+        'addresses': addresses,
+        'standing_orders': [{
+            'id': order.id,
+            'status': order.status,
+            'delivery_days': order.get_delivery_days_list(),
+            'delivery_day_names': order.get_delivery_days_names(),
+            'start_date': order.start_date.isoformat() if order.start_date else None,
+            'end_date': order.end_date.isoformat() if order.end_date else None,
+            'special_instructions': order.special_instructions,
+            'items': [{
+                'id': item.id,
+                'product_code': item.product_code,
+                'product_name': item.product_name,
+                'quantity': item.quantity,
+                'unit_type': item.unit_type,
+                'special_notes': item.special_notes
+            } for item in order.items]
+        } for order in sorted(customer.standing_orders, key=lambda order: order.id)],
+        'stock_items': stock_items,
+        'low_stock_count': sum(1 for item in stock_items if item['is_low_stock']),
+        'recent_calls': [call.to_dict() for call in calls],
+        'recent_forms': [{
+            'id': form.id,
+            'type': form.type,
+            'date_created': form.date_created.isoformat(),
+            'author': form.author.username if form.author else None,
+            'is_completed': form.is_completed,
+            'is_archived': form.is_archived
+        } for form in forms]
+    }
+
+    body = json.dumps(payload, sort_keys=True)
+    etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @customers_bp.route('/api', methods=['POST'])
 @login_required
 def create_customer():
@@ -120,6 +221,10 @@ def create_customer():
         if 'addresses' not in data or len(data['addresses']) == 0:
             return jsonify({'success': False, 'message': 'At least one address is required'}), 400
 
+        duplicate = find_duplicate_label(data['addresses'])
+        if duplicate:
+            return jsonify({'success': False, 'message': f"Address label '{duplicate}' is used more than once"}), 400
+
         # Create customer
         customer = Customer(
             account_number=data['account_number'],
@@ -191,8 +296,13 @@ def update_customer(customer_id):
 
         # Handle addresses
         if 'addresses' in data:
-            # Remove old addresses
+            duplicate = find_duplicate_label(data['addresses'])
+            if duplicate:
+                return jsonify({'success': False, 'message': f"Address label '{duplicate}' is used more than once"}), 400
+
+            # Remove old addresses (a bulk delete skips the lookup cache's mapper events)
             CustomerAddress.query.filter_by(customer_id=customer_id).delete()
+            forget_addresses([customer_id])
 
             # Add new addresses
             for idx, addr_data in enumerate(data['addresses']):
@@ -229,21 +339,38 @@ def get_customer_addresses(customer_id):
     """Get all addresses for a customer"""
     try:
         customer = Customer.query.get_or_404(customer_id)
-        addresses = [addr.to_dict() for addr in customer.addresses]
 
         # Fallback to old single address field if no addresses exist
-        if not addresses and customer.address:
-            addresses = [{
-                'id': None,
-                'label': 'Primary',
-                'phone': '',
-                'street': customer.address,
-                'city': '',
-                'zip': '',
-                'is_primary': True
-            }]
+        addresses = address_dicts(addresses_for(customer_id), legacy_street=customer.address)
 
         return jsonify(addresses)
     except Exception as e:
         logger.error(f"Error fetching addresses for customer {customer_id}: {e}", exc_info=True)
         return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@customers_bp.route('/api/addresses')
+@login_required
+def get_addresses_for_customers():
+    """
+    Addresses for several customers at once (?ids=1,2,3, up to MAX_ADDRESS_LOOKUP_IDS).
+
+    Returns a mapping of customer ID to its picker addresses, resolved with
+    one IN query for the addresses and one for the legacy address fields.
+    """
+    try:
+        ids = [int(value) for value in request.args.get('ids', '').split(',') if value.strip()]
+    except ValueError:
+        return jsonify({'success': False, 'message': 'ids must be a comma-separated list of customer IDs'}), 400
+    if len(ids) > MAX_ADDRESS_LOOKUP_IDS:
+        return jsonify({'success': False, 'message': f'At most {MAX_ADDRESS_LOOKUP_IDS} customers per request'}), 400
+    if not ids:
+        return jsonify({})
+
+    legacy = dict(db.session.query(Customer.id, Customer.address).filter(Customer.id.in_(ids)).all())
+    addresses = addresses_by_customer(legacy.keys())
+
+    return jsonify({
+        str(customer_id): address_dicts(addresses[customer_id], legacy_street=legacy[customer_id])
+        for customer_id in legacy
+    })
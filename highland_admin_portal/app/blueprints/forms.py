@@ -5,10 +5,11 @@ Includes: Returns, Invoice Corrections, Branded Stock, Form management
 
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import current_user, login_required
-from app import db
+from app import db, search_index
 from app.models import User, Customer, Form
 from app.forms import ReturnsForm, BrandedStockForm, InvoiceCorrectionForm
-from app.utils import handle_new_address_from_form
+from app.utils import handle_new_address_from_form, get_user_cached
+from sqlalchemy.orm import joinedload, contains_eager
 import json
 from datetime import datetime
 import logging
@@ -78,7 +79,8 @@ def returns():
         new_form = Form(
             type='returns',
             data=json.dumps(form_data),
-            user_id=current_user.id
+            user_id=current_user.id,
+            **Form.customer_fields(form_data)
         )
         db.session.add(new_form)
         db.session.commit()
@@ -151,7 +153,8 @@ def invoice_correction():
         new_form = Form(
             type='invoice_correction',
             data=json.dumps(form_data),
-            user_id=current_user.id
+            user_id=current_user.id,
+            **Form.customer_fields(form_data)
         )
 
         db.session.add(new_form)
@@ -195,8 +198,8 @@ def list_forms():
     per_page = request.args.get('per_page', 25, type=int)
     per_page = min(per_page, 100)  # Cap at 100 items per page
 
-    # Base query
-    query = Form.query
+    # Base query - authors and completers are loaded in the same query
+    query = Form.query.options(joinedload(Form.author), joinedload(Form.completer))
 
     # Apply archived filter
     if not show_archived:
@@ -224,36 +227,18 @@ def list_forms():
     if submitted_by:
         query = query.join(User, Form.user_id == User.id).filter(User.username.ilike(f'%{submitted_by}%'))
 
+    # Customer search runs against the trigram-indexed customer columns
+    if customer_search:
+        query = query.filter(search_index.search(Form, ['customer_account', 'customer_name'], customer_search))
+
     # Order by date (most recent first)
     query = query.order_by(Form.date_created.desc())
 
-    # Handle customer search (needs special handling due to JSON field)
-    if customer_search:
-        # For customer search, we need to load all forms and filter in Python
-        # This is less efficient but necessary due to JSON field
-        all_forms = query.all()
-        filtered_forms = []
-        for form in all_forms:
-            form_data = json.loads(form.data)
-            customer_account = form_data.get('customer_account', '')
-            customer_name = form_data.get('customer_name', '')
-            if customer_search.lower() in customer_account.lower() or customer_search.lower() in customer_name.lower():
-                filtered_forms.append(form)
-
-        # Manual pagination for filtered results
-        total = len(filtered_forms)
-        start = (page - 1) * per_page
-        end = start + per_page
-        paginated_forms = filtered_forms[start:end]
-
-        # Calculate pagination info
-        total_pages = (total + per_page - 1) // per_page
-    else:
-        # Use database pagination for better performance
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        paginated_forms = pagination.items
-        total = pagination.total
-        total_pages = pagination.pages
+    # Use database pagination for better performance
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    paginated_forms = pagination.items
+    total = pagination.total
+    total_pages = pagination.pages
 
     # Prepare forms with data
     forms_with_data = []
@@ -264,13 +249,13 @@ def list_forms():
             'type': form.type.replace('_', ' ').title(),
             'type_raw': form.type,
             'date_created': form.date_created,
-            'author': User.query.get(form.user_id).username if User.query.get(form.user_id) else 'Unknown',
+            'author': form.author.username if form.author else 'Unknown',
             'data': form_data,
-            'customer_account': form_data.get('customer_account', 'N/A'),
-            'customer_name': form_data.get('customer_name', 'N/A'),
+            'customer_account': form.customer_account or form_data.get('customer_account', 'N/A'),
+            'customer_name': form.customer_name or form_data.get('customer_name', 'N/A'),
             'is_completed': form.is_completed,
             'completed_date': form.completed_date,
-            'completed_by': User.query.get(form.completed_by).username if form.completed_by else None,
+            'completed_by': form.completer.username if form.completer else None,
             'is_archived': form.is_archived
         }
         forms_with_data.append(form_dict)
@@ -279,8 +264,8 @@ def list_forms():
     unique_types = db.session.query(Form.type).distinct().all()
     form_types = [t[0] for t in unique_types]
 
-    # Get all users for filter dropdown
-    all_users = User.query.all()
+    # Get usernames for filter dropdown
+    all_users = db.session.query(User.username).order_by(User.username).all()
 
     # Calculate pagination info
     has_prev = page > 1
@@ -317,7 +302,7 @@ def view_form(form_id):
     """View a specific form"""
     form = Form.query.get_or_404(form_id)
     form_data = json.loads(form.data)
-    user = User.query.get(form.user_id)
+    user = get_user_cached(form.user_id)
     author = user.username if user else 'Unknown'
 
     return render_template(
@@ -385,13 +370,103 @@ def unarchive_form(form_id):
         return jsonify({'success': False, 'message': str(e)}), 400
 
 
+BULK_FORM_ACTIONS = ('complete', 'archive', 'unarchive')
+
+
+def build_bulk_form_criteria(data):
+    """
+    Build WHERE criteria for a bulk form action.
+
+    Accepts either an explicit list of form IDs (``form_ids``) or a
+    ``filter`` dict with any of ``type``, ``created_before`` and
+    ``completed_before`` (YYYY-MM-DD). Returns (criteria, error_message).
+    """
+    form_ids = data.get('form_ids')
+    filters = data.get('filter') or {}
+
+    if form_ids:
+        try:
+            ids = [int(form_id) for form_id in form_ids]
+        except (ValueError, TypeError):
+            return None, 'Invalid form IDs'
+        if len(ids) > 5000:
+            return None, 'Too many forms selected (max 5,000)'
+        return [Form.id.in_(ids)], None
+
+    criteria = []
+    if filters.get('type'):
+        criteria.append(Form.type == filters['type'])
+
+    for key, column in (('created_before', Form.date_created), ('completed_before', Form.completed_date)):
+        if filters.get(key):
+            try:
+                cutoff = datetime.strptime(filters[key], '%Y-%m-%d')
+            except (ValueError, TypeError):
+                return None, f'Invalid {key.replace("_", " ")} date format'
+            criteria.append(column < cutoff)
+
+    if not criteria:
+        return None, 'Select at least one form or provide a filter'
+
+    return criteria, None
+
+
+@forms_bp.route('/bulk/<action>', methods=['POST'])
+@login_required
+def bulk_form_action(action):
+    """Complete, archive or unarchive many forms with a single UPDATE"""
+    if action not in BULK_FORM_ACTIONS:
+        return jsonify({'success': False, 'message': 'Invalid action'}), 400
+
+    criteria, error = build_bulk_form_criteria(request.json or {})
+    if error:
+        return jsonify({'success': False, 'message': error}), 400
+
+    now = datetime.now()
+
+    try:
+        if action == 'complete':
+            stmt = db.update(Form).where(*criteria, Form.is_completed.isnot(True)).values(
+                is_completed=True,
+                completed_date=now,
+                completed_by=current_user.id
+            )
+        elif action == 'archive':
+            # Forms that weren't completed yet get completed by the archiving user
+            already_completed = Form.is_completed == True
+            stmt = db.update(Form).where(*criteria, Form.is_archived.isnot(True)).values(
+                is_archived=True,
+                completed_date=db.case((already_completed, Form.completed_date), else_=now),
+                completed_by=db.case((already_completed, Form.completed_by), else_=current_user.id),
+                is_completed=True
+            )
+        else:
+            stmt = db.update(Form).where(*criteria, Form.is_archived == True).values(is_archived=False)
+
+        result = db.session.execute(stmt.execution_options(synchronize_session=False))
+        db.session.commit()
+
+        updated = result.rowcount
+        logger.info(f"Bulk {action} by {current_user.username}: {updated} forms updated")
+
+        return jsonify({
+            'success': True,
+            'updated': updated,
+            'message': f'{updated} form(s) updated'
+        })
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error in bulk form {action}: {e}", exc_info=True)
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+
 @forms_bp.route('/print/<int:form_id>')
 @login_required
 def print_form(form_id):
     """Print a form"""
     form = Form.query.get_or_404(form_id)
     form_data = json.loads(form.data)
-    user = User.query.get(form.user_id)
+    user = get_user_cached(form.user_id)
     author = user.username if user else 'Unknown'
 
     # Determine which template to use based on form type
@@ -439,7 +514,7 @@ def get_recent_forms():
     try:
         forms = Form.query.filter_by(is_archived=False).join(
             User, Form.user_id == User.id
-        ).order_by(Form.date_created.desc()).limit(5).all()
+        ).options(contains_eager(Form.author)).order_by(Form.date_created.desc()).limit(5).all()
 
         result = []
         for form in forms:
@@ -2,26 +2,34 @@
 Knowledge Base Articles Blueprint
 Handles article management including CRUD operations and approval workflow
 """
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, send_from_directory
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, send_from_directory, Response, abort
 from flask_login import login_required, current_user
 from functools import wraps
 from datetime import datetime
 from werkzeug.utils import secure_filename
-import os
-import uuid
 from app import db
-from app.models import Article, Category, ArticleView, User, Supplier
-from sqlalchemy import or_, func
+from app.models import Article, Category, User, Supplier, Tag, article_tag, RelatedArticle
+from app.kb_search import filter_articles_by_search, get_search_snippets
+from app.kb_views import article_view_buffer
+from app.kb_render import article_render_cache, article_meta, article_etag, summary_only
+from app.media import media_store
+from app.pagination import keyset_paginate, approximate_count, InvalidCursor
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 
 bp = Blueprint('kb_articles', __name__, url_prefix='/kb/articles')
 
 # Image upload configuration
-UPLOAD_FOLDER = 'app/static/uploads/kb_images'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def get_tag_filter():
+    """Normalized tag names requested via ?tag=a&tag=b or ?tags=a,b"""
+    return Tag.parse(','.join(request.args.getlist('tag') + request.args.getlist('tags')))
+
 def role_required(allowed_roles):
     """Decorator to check if user has required role"""
     def decorator(f):
@@ -50,23 +58,25 @@ def kb_dashboard():
 
     # Get recent articles
     recent_articles = Article.query.filter_by(status='published')\
+        .options(joinedload(Article.author), joinedload(Article.category), *summary_only())\
         .order_by(Article.created_at.desc())\
         .limit(5).all()
 
-    # Get popular articles
+    # Get trending articles (time-decayed popularity)
     popular_articles = Article.query.filter_by(status='published')\
-        .order_by(Article.view_count.desc())\
+        .options(joinedload(Article.author), joinedload(Article.category), *summary_only())\
+        .order_by(Article.popularity_score.desc())\
         .limit(5).all()
 
     # Get categories with article counts
+    article_counts = Article.published_counts_by(Article.category_id)
     categories_data = []
     categories = Category.query.all()
     for category in categories:
-        article_count = Article.query.filter_by(category_id=category.id, status='published').count()
         categories_data.append({
             'id': category.id,
             'name': category.name,
-            'article_count': article_count
+            'article_count': article_counts.get(category.id, 0)
         })
 
     return render_template('kb/dashboard.html',
@@ -84,6 +94,7 @@ def kb_dashboard():
 def admin_approvals():
     """Admin dashboard for article approvals (admin and manager only)"""
     pending_articles = Article.query.filter_by(status='pending')\
+        .options(*summary_only())\
         .order_by(Article.updated_at.desc()).all()
 
     draft_count = Article.query.filter_by(status='draft').count()
@@ -106,9 +117,10 @@ def list_articles():
     """Articles listing page"""
     category_id = request.args.get('category_id', type=int)
     search = request.args.get('search', '')
+    tag_names = get_tag_filter()
 
     # Build query
-    query = Article.query
+    query = Article.query.options(*summary_only())
 
     # Filter by role
     if current_user.role == 'rep':
@@ -118,24 +130,26 @@ def list_articles():
     if category_id:
         query = query.filter(Article.category_id == category_id)
 
-    # Search
+    # Filter by tags (articles must carry every requested tag)
+    if tag_names:
+        query = query.filter(Article.id.in_(Tag.article_ids_with_all(tag_names)))
+
+    # Search (relevance ranked when the full-text index is available)
     if search:
-        query = query.filter(
-            or_(
-                Article.title.contains(search),
-                Article.body.contains(search),
-                Article.tags.contains(search)
-            )
-        )
+        query = filter_articles_by_search(query, search)
 
     articles = query.order_by(Article.created_at.desc()).all()
     categories = Category.query.all()
 
+    snippets = get_search_snippets(search, [article.id for article in articles]) if search else {}
+
     return render_template('kb/articles_list.html',
                          articles=articles,
                          categories=categories,
                          selected_category=category_id,
-                         search_query=search)
+                         selected_tags=tag_names,
+                         search_query=search,
+                         snippets=snippets)
 
 @bp.route('/<int:article_id>')
 @login_required
@@ -148,13 +162,21 @@ def view_article(article_id):
         flash('You do not have permission to view this article.', 'error')
         return redirect(url_for('kb_articles.list_articles'))
 
-    # Track view
-    article_view = ArticleView(article_id=article_id, user_id=current_user.id)
-    db.session.add(article_view)
-    article.view_count += 1
-    db.session.commit()
+    # Track view - buffered and written in batches, so this request stays read-only
+    article_view_buffer.record(article_id, current_user.id)
+    view_count = (article.view_count or 0) + article_view_buffer.pending_views(article_id)
+
+    # Precomputed neighbours (see app/kb_related.py)
+    related_articles = db.session.query(Article.id, Article.title, Article.excerpt)\
+        .join(RelatedArticle, RelatedArticle.related_id == Article.id)\
+        .filter(RelatedArticle.article_id == article_id, Article.status == 'published')\
+        .order_by(RelatedArticle.score.desc())\
+        .all()
 
-    return render_template('kb/article_detail.html', article=article)
+    return render_template('kb/article_detail.html',
+                         article=article,
+                         view_count=view_count,
+                         related_articles=related_articles)
 
 @bp.route('/new')
 @login_required
@@ -186,14 +208,24 @@ def edit_article(article_id):
 @bp.route('/api', methods=['GET'])
 @login_required
 def api_list_articles():
-    """API: List articles with filtering"""
+    """
+    API: List articles with filtering.
+
+    Newest first, paged by cursor: the X-Next-Cursor header (and a
+    rel="next" Link) carries the token for ?cursor= on the next request.
+    Search results are relevance ranked and page by ?offset= instead.
+    ?include_total=1 adds an approximate X-Total-Count header.
+    """
     category_id = request.args.get('category_id', type=int)
     search = request.args.get('search')
     status_filter = request.args.get('status')
-    limit = request.args.get('limit', 50, type=int)
+    tag_names = get_tag_filter()
+    limit = min(request.args.get('limit', 50, type=int), 200)
     offset = request.args.get('offset', 0, type=int)
+    cursor = request.args.get('cursor') or None
+    include_total = request.args.get('include_total', type=int) == 1
 
-    query = Article.query
+    query = Article.query.options(*summary_only())
 
     # Filter by status based on user role
     if current_user.role == 'rep':
@@ -205,30 +237,73 @@ def api_list_articles():
     if category_id:
         query = query.filter(Article.category_id == category_id)
 
-    # Search
+    # Filter by tags (articles must carry every requested tag)
+    if tag_names:
+        query = query.filter(Article.id.in_(Tag.article_ids_with_all(tag_names)))
+
+    # Search (relevance ranked when the full-text index is available)
     if search:
-        query = query.filter(
-            or_(
-                Article.title.contains(search),
-                Article.body.contains(search),
-                Article.tags.contains(search)
+        query = filter_articles_by_search(query, search)
+
+    total = approximate_count(query) if include_total else None
+
+    next_cursor = None
+    if search or (offset and not cursor):
+        articles = query.order_by(Article.created_at.desc()).limit(limit).offset(offset).all()
+    else:
+        try:
+            articles, next_cursor = keyset_paginate(
+                query, Article.created_at, Article.id, cursor=cursor, limit=limit, descending=True
             )
-        )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
 
-    articles = query.order_by(Article.created_at.desc()).limit(limit).offset(offset).all()
-    return jsonify([article.to_dict(include_body=False) for article in articles])
+    results = [article.to_dict(include_body=False) for article in articles]
+
+    if search:
+        snippets = get_search_snippets(search, [article.id for article in articles])
+        for result in results:
+            result['snippet'] = str(snippets[result['id']]) if result['id'] in snippets else None
+
+    response = jsonify(results)
+    if next_cursor:
+        args = request.args.to_dict(flat=False)
+        args['cursor'] = next_cursor
+        args.pop('include_total', None)
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for("kb_articles.api_list_articles", **args)}>; rel="next"'
+    if total is not None:
+        response.headers['X-Total-Count'] = str(total[0])
+        response.headers['X-Total-Exact'] = 'true' if total[1] else 'false'
+    return response
 
 @bp.route('/api/<int:article_id>', methods=['GET'])
 @login_required
 def api_get_article(article_id):
-    """API: Get specific article"""
-    article = Article.query.get_or_404(article_id)
+    """API: Get specific article (ETag/304 aware, served from the render cache when unchanged)"""
+    # Only the small version columns are read until we know the payload is needed
+    meta = article_meta(article_id)
+    if meta is None:
+        abort(404)
 
     # Check permissions
-    if article.status != 'published' and current_user.role == 'rep':
+    if meta.status != 'published' and current_user.role == 'rep':
         return jsonify({'error': 'Cannot view unpublished articles'}), 403
 
-    return jsonify(article.to_dict())
+    etag = article_etag(article_id, meta)
+
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        payload = article_render_cache.get(article_id, etag)
+        if payload is None:
+            article = Article.query.get_or_404(article_id)
+            payload = article_render_cache.put(article_id, etag, article.to_dict())
+        response = Response(payload, mimetype='application/json')
+
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 @bp.route('/api', methods=['POST'])
 @login_required
@@ -347,6 +422,7 @@ def api_recent_articles():
     limit = request.args.get('limit', 5, type=int)
 
     articles = Article.query.filter_by(status='published')\
+        .options(*summary_only())\
         .order_by(Article.created_at.desc())\
         .limit(limit).all()
 
@@ -355,15 +431,35 @@ def api_recent_articles():
 @bp.route('/api/popular', methods=['GET'])
 @login_required
 def api_popular_articles():
-    """API: Get popular articles by view count"""
+    """API: Get popular articles - trending by default, ?period=all for all-time views"""
     limit = request.args.get('limit', 5, type=int)
+    period = request.args.get('period', 'trending')
+
+    sort_column = Article.view_count if period == 'all' else Article.popularity_score
 
     articles = Article.query.filter_by(status='published')\
-        .order_by(Article.view_count.desc())\
+        .options(*summary_only())\
+        .order_by(sort_column.desc())\
         .limit(limit).all()
 
     return jsonify([article.to_dict(include_body=False) for article in articles])
 
+@bp.route('/api/tags', methods=['GET'])
+@login_required
+def api_tag_cloud():
+    """API: Tags with published article counts, most used first"""
+    limit = request.args.get('limit', 50, type=int)
+
+    tags = db.session.query(Tag.name, func.count(Article.id).label('article_count'))\
+        .join(article_tag, article_tag.c.tag_id == Tag.id)\
+        .join(Article, Article.id == article_tag.c.article_id)\
+        .filter(Article.status == 'published')\
+        .group_by(Tag.id, Tag.name)\
+        .order_by(func.count(Article.id).desc(), Tag.name)\
+        .limit(limit).all()
+
+    return jsonify([{'name': name, 'article_count': count} for name, count in tags])
+
 @bp.route('/<int:article_id>/approve', methods=['POST'])
 @login_required
 @role_required(['admin'])
@@ -408,34 +504,20 @@ def upload_image():
     if not allowed_file(file.filename):
         return jsonify({'success': False, 'error': 'Invalid file type. Allowed: PNG, JPG, JPEG, GIF, WEBP'}), 400
 
-    # Check file size (5MB limit)
-    file.seek(0, os.SEEK_END)
-    file_size = file.tell()
-    file.seek(0)
-
-    if file_size > 5 * 1024 * 1024:  # 5MB
-        return jsonify({'success': False, 'error': 'File too large. Maximum size is 5MB'}), 400
-
     try:
-        # Create upload folder if it doesn't exist
-        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-        # Generate unique filename
-        ext = file.filename.rsplit('.', 1)[1].lower()
-        filename = f"{uuid.uuid4().hex}.{ext}"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-
-        # Save file
-        file.save(filepath)
-
-        # Return URL for the uploaded image
-        image_url = url_for('static', filename=f'uploads/kb_images/{filename}')
+        # Stored by content hash; re-uploading the same image reuses it
+        digest = media_store.save(file, max_bytes=MAX_IMAGE_SIZE)
+        urls = media_store.urls(digest)
 
         return jsonify({
             'success': True,
-            'image_url': image_url,
-            'filename': filename
+            'image_url': urls['medium'],
+            'original_url': urls['original'],
+            'thumbnail_url': urls['thumb'],
+            'filename': digest
         }), 200
 
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
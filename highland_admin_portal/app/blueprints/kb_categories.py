@@ -30,19 +30,16 @@ def admin_required(f):
 def list_categories():
     """Categories listing page"""
     categories = Category.query.all()
+    article_counts = Article.published_counts_by(Article.category_id)
 
     # Add article count for each category
     category_data = []
     for category in categories:
-        article_count = db.session.query(func.count(Article.id))\
-            .filter(Article.category_id == category.id, Article.status == 'published')\
-            .scalar()
-
         category_data.append({
             'id': category.id,
             'name': category.name,
             'description': category.description,
-            'article_count': article_count,
+            'article_count': article_counts.get(category.id, 0),
             'created_at': category.created_at
         })
 
@@ -57,18 +54,15 @@ def list_categories():
 def api_list_categories():
     """API: List all categories with article counts"""
     categories = Category.query.all()
+    article_counts = Article.published_counts_by(Article.category_id)
 
     result = []
     for category in categories:
-        article_count = db.session.query(func.count(Article.id))\
-            .filter(Article.category_id == category.id, Article.status == 'published')\
-            .scalar()
-
         result.append({
             'id': category.id,
             'name': category.name,
             'description': category.description,
-            'article_count': article_count
+            'article_count': article_counts.get(category.id, 0)
         })
 
     return jsonify(result)
@@ -7,10 +7,14 @@ from flask_login import login_required, current_user
 from functools import wraps
 from datetime import datetime
 from app import db
-from app.models import Supplier
+from app.models import Supplier, Category
+from app.kb_supplier_directory import filter_suppliers_by_search
+from app.pagination import keyset_paginate, approximate_count, InvalidCursor
 
 bp = Blueprint('kb_suppliers', __name__, url_prefix='/kb/suppliers')
 
+SUPPLIERS_PER_PAGE = 24
+
 def role_required(allowed_roles):
     """Decorator to check if user has required role"""
     def decorator(f):
@@ -32,16 +36,15 @@ def role_required(allowed_roles):
 def list_suppliers():
     """Suppliers listing page"""
     search = request.args.get('search', '')
+    page = request.args.get('page', 1, type=int)
 
-    query = Supplier.query
-
-    if search:
-        query = query.filter(Supplier.name.contains(search))
-
-    suppliers = query.order_by(Supplier.name).all()
+    query = filter_suppliers_by_search(Supplier.query, search)
+    pagination = query.order_by(Supplier.name, Supplier.id)\
+        .paginate(page=page, per_page=SUPPLIERS_PER_PAGE, error_out=False)
 
     return render_template('kb/suppliers.html',
-                         suppliers=suppliers,
+                         suppliers=pagination.items,
+                         pagination=pagination,
                          search_query=search)
 
 @bp.route('/<int:supplier_id>')
@@ -49,7 +52,22 @@ def list_suppliers():
 def view_supplier(supplier_id):
     """Supplier detail page"""
     supplier = Supplier.query.get_or_404(supplier_id)
-    return render_template('kb/supplier_detail.html', supplier=supplier)
+
+    # Article roll-up is precomputed (see app/kb_supplier_directory.py)
+    summary = supplier.article_summary
+    category_counts = summary.get_category_counts() if summary else {}
+    categories = []
+    if category_counts:
+        categories = [
+            {'id': category.id, 'name': category.name, 'color': category.color,
+             'article_count': category_counts[category.id]}
+            for category in Category.query.filter(Category.id.in_(category_counts)).order_by(Category.name)
+        ]
+
+    return render_template('kb/supplier_detail.html',
+                         supplier=supplier,
+                         article_summary=summary,
+                         summary_categories=categories)
 
 @bp.route('/new')
 @login_required
@@ -73,16 +91,50 @@ def edit_supplier(supplier_id):
 @bp.route('/api', methods=['GET'])
 @login_required
 def api_list_suppliers():
-    """API: List all suppliers with optional search"""
+    """
+    API: List suppliers with optional search.
+
+    Ordered by name and paged by cursor: the X-Next-Cursor header (and a
+    rel="next" Link) carries the token for ?cursor= on the next request.
+    Search results are ranked and page by ?offset= instead.
+    ?include_total=1 adds an approximate X-Total-Count header.
+    """
     search = request.args.get('search')
-
-    query = Supplier.query
-
-    if search:
-        query = query.filter(Supplier.name.contains(search))
-
-    suppliers = query.order_by(Supplier.name).all()
-    return jsonify([supplier.to_dict() for supplier in suppliers])
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    offset = request.args.get('offset', 0, type=int)
+    cursor = request.args.get('cursor') or None
+    include_total = request.args.get('include_total', type=int) == 1
+
+    query = filter_suppliers_by_search(Supplier.query, search)
+
+    total = approximate_count(query) if include_total else None
+
+    next_cursor = None
+    if search or (offset and not cursor):
+        suppliers = query.order_by(Supplier.name, Supplier.id).limit(limit).offset(offset).all()
+    else:
+        try:
+            suppliers, next_cursor = keyset_paginate(query, Supplier.name, Supplier.id, cursor=cursor, limit=limit)
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+
+    result = []
+    for supplier in suppliers:
+        data = supplier.to_dict()
+        data['article_count'] = supplier.article_summary.article_count if supplier.article_summary else 0
+        result.append(data)
+
+    response = jsonify(result)
+    if next_cursor:
+        args = request.args.to_dict(flat=False)
+        args['cursor'] = next_cursor
+        args.pop('include_total', None)
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{url_for("kb_suppliers.api_list_suppliers", **args)}>; rel="next"'
+    if total is not None:
+        response.headers['X-Total-Count'] = str(total[0])
+        response.headers['X-Total-Exact'] = 'true' if total[1] else 'false'
+    return response
 
 @bp.route('/api/<int:supplier_id>', methods=['GET'])
 @login_required
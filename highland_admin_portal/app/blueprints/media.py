@@ -0,0 +1,35 @@
+"""
+Media Blueprint
+Serves images from the shared content-addressed store (see app/media.py)
+"""
+import re
+from flask import Blueprint, request, send_file, abort
+from app.media import media_store, SIZES
+
+media_bp = Blueprint('media', __name__, url_prefix='/media')
+
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Content at a media URL never changes, so browsers may cache it for a year
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+# The original standing in for a variant still being generated
+PROVISIONAL_CACHE = 'public, max-age=60'
+
+
+@media_bp.route('/<digest>/<size>')
+def serve_image(digest, size):
+    """Serve an image at the requested size, preferring WebP when the client accepts it"""
+    if not DIGEST_PATTERN.match(digest) or size not in SIZES:
+        abort(404)
+
+    accept_webp = 'image/webp' in request.headers.get('Accept', '')
+    resolved = media_store.resolve(digest, size, accept_webp=accept_webp)
+    if resolved is None:
+        abort(404)
+
+    path, mimetype, is_final = resolved
+    response = send_file(path, mimetype=mimetype, conditional=True)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE if is_final else PROVISIONAL_CACHE
+    if size != 'original':
+        response.vary.add('Accept')
+    return response
@@ -88,25 +88,45 @@ def standing_orders():
     today = date.today()
     today_day = today.weekday()  # 0 = Monday, 6 = Sunday
     
+    # Day filter is applied in SQL against the delivery bitmask
+    todays = StandingOrder.query.join(Customer).filter(
+        StandingOrder.status == 'active',
+        StandingOrder.delivers_on(today_day)
+    ).order_by(Customer.name).all()
+    
+    # Fetch today's schedules for those orders in one query
+    schedules_today = {}
+    if todays:
+        schedules_today = {
+            s.standing_order_id: s for s in StandingOrderSchedule.query.filter(
+                StandingOrderSchedule.standing_order_id.in_([o.id for o in todays]),
+                StandingOrderSchedule.scheduled_date == today
+            ).all()
+        }
+    
     todays_orders = []
-    for order in orders:
-        if order.status == 'active' and str(today_day) in order.delivery_days.split(','):
-            # Check if there's a schedule for today
-            schedule = StandingOrderSchedule.query.filter_by(
-                standing_order_id=order.id,
-                scheduled_date=today
-            ).first()
-            
-            todays_orders.append({
-                'order': order,
-                'schedule': schedule,
-                'status': schedule.status if schedule else 'pending'
-            })
+    for order in todays:
+        schedule = schedules_today.get(order.id)
+        todays_orders.append({
+            'order': order,
+            'schedule': schedule,
+            'status': schedule.status if schedule else 'pending'
+        })
     
     # Get statistics
     active_count = len([o for o in orders if o.status == 'active'])
     paused_count = len([o for o in orders if o.status == 'paused'])
     
+    # Optional ?day=N filter for the full listing
+    selected_day = request.args.get('day', type=int)
+    if selected_day is not None and selected_day in StandingOrder.WEEKDAYS:
+        orders = StandingOrder.query.join(Customer).filter(
+            StandingOrder.status != 'ended',
+            StandingOrder.delivers_on(selected_day)
+        ).order_by(Customer.name).all()
+    else:
+        selected_day = None
+    
     # Get this week's pending schedules
     week_start = today - timedelta(days=today.weekday())
     week_end = week_start + timedelta(days=6)
@@ -122,7 +142,9 @@ def standing_orders():
                          today=today,
                          active_count=active_count,
                          paused_count=paused_count,
-                         pending_this_week=pending_this_week)
+                         pending_this_week=pending_this_week,
+                         selected_day=selected_day,
+                         weekday_names=StandingOrder.WEEKDAY_NAMES)
 
 @standing_orders_bp.route('/new', methods=['GET', 'POST'])
 @login_required
@@ -145,7 +167,7 @@ def new_standing_order():
             # Create standing order
             standing_order = StandingOrder(
                 customer_id=data['customer_id'],
-                delivery_days=','.join([str(d) for d in clean_days]),  # Use cleaned days
+                delivery_mask=StandingOrder.days_to_mask(clean_days),  # Use cleaned days
                 start_date=date.today(),
                 end_date=datetime.strptime(data['end_date'], '%Y-%m-%d').date() if data.get('end_date') else None,
                 special_instructions=data.get('special_instructions', '')[:500],
@@ -288,20 +310,9 @@ def edit_standing_order(order_id):
             )
             db.session.add(log)
             
-            # Regenerate schedules if delivery days changed and order is active
-            if 'delivery_days' in changes and order.status == 'active':
-                # Delete future pending schedules
-                future_schedules = StandingOrderSchedule.query.filter(
-                    StandingOrderSchedule.standing_order_id == order.id,
-                    StandingOrderSchedule.scheduled_date > date.today(),
-                    StandingOrderSchedule.status == 'pending'
-                ).all()
-                
-                for schedule in future_schedules:
-                    db.session.delete(schedule)
-                
-                # Generate new schedules
-                generate_schedules_for_order(order.id)
+            # Reconcile future schedules if the delivery pattern changed and order is active
+            if ('delivery_days' in changes or 'end_date' in changes) and order.status == 'active':
+                reconcile_schedules_for_order(order)
             
             db.session.commit()
             
@@ -467,7 +478,11 @@ def skip_schedule(schedule_id):
 def generate_all_schedules():
     """Generate schedules for all active standing orders for the next month"""
     try:
-        active_orders = StandingOrder.query.filter_by(status='active').all()
+        # Skip orders with no weekday deliveries in SQL
+        active_orders = StandingOrder.query.filter(
+            StandingOrder.status == 'active',
+            StandingOrder.delivery_mask.op('&')(StandingOrder.days_to_mask(StandingOrder.WEEKDAYS)) != 0
+        ).all()
         count = 0
         
         for order in active_orders:
@@ -551,16 +566,18 @@ def generate_schedules_for_order(order_id, months_ahead=1):
     # USE MODEL'S METHOD - Already filters weekends!
     delivery_days = order.get_delivery_days_list()
     
+    # Load existing schedule dates in the window once, with locking
+    existing_dates = {
+        row.scheduled_date for row in db.session.query(StandingOrderSchedule.scheduled_date).filter(
+            StandingOrderSchedule.standing_order_id == order_id,
+            StandingOrderSchedule.scheduled_date.between(current_date, end_date)
+        ).with_for_update().all()
+    }
+    
     while current_date <= end_date:
         # USE MODEL'S is_weekday METHOD
         if StandingOrder.is_weekday(current_date) and current_date.weekday() in delivery_days:
-            # Check if schedule already exists with locking
-            existing = StandingOrderSchedule.query.filter_by(
-                standing_order_id=order_id,
-                scheduled_date=current_date
-            ).with_for_update().first()
-            
-            if not existing:
+            if current_date not in existing_dates:
                 schedule = StandingOrderSchedule(
                     standing_order_id=order_id,
                     scheduled_date=current_date,
@@ -573,6 +590,70 @@ def generate_schedules_for_order(order_id, months_ahead=1):
     
     return count
 
+def reconcile_schedules_for_order(order, months_ahead=1):
+    """
+    Bring an order's future pending schedules in line with its current
+    delivery days and end date.
+
+    Only the difference is applied: pending schedules on days that are no
+    longer delivered are removed with a single bulk DELETE, and missing
+    days are added with a single bulk INSERT. Schedules that already carry
+    notes or an order reference are left untouched. Nothing is committed
+    here so the caller's transaction covers the whole edit.
+
+    Returns:
+        tuple: (number of schedules removed, number of schedules added)
+    """
+    today = date.today()
+    window_end = today + timedelta(days=30 * months_ahead)
+    if order.end_date and order.end_date < window_end:
+        window_end = order.end_date
+
+    # Dates the order should deliver on within the scheduling window
+    delivery_days = set(order.get_delivery_days_list())
+    wanted_dates = set()
+    current_date = max(order.start_date, today)
+    while current_date <= window_end:
+        if StandingOrder.is_weekday(current_date) and current_date.weekday() in delivery_days:
+            wanted_dates.add(current_date)
+        current_date += timedelta(days=1)
+
+    # One query for every schedule from today on, whatever its status
+    existing = db.session.query(
+        StandingOrderSchedule.id,
+        StandingOrderSchedule.scheduled_date,
+        StandingOrderSchedule.status,
+        StandingOrderSchedule.notes,
+        StandingOrderSchedule.order_reference
+    ).filter(
+        StandingOrderSchedule.standing_order_id == order.id,
+        StandingOrderSchedule.scheduled_date >= today
+    ).all()
+
+    existing_dates = {row.scheduled_date for row in existing}
+    removed_ids = [
+        row.id for row in existing
+        if row.status == 'pending'
+        and row.scheduled_date > today
+        and row.scheduled_date not in wanted_dates
+        and not row.notes
+        and not row.order_reference
+    ]
+
+    if removed_ids:
+        db.session.execute(
+            db.delete(StandingOrderSchedule).where(StandingOrderSchedule.id.in_(removed_ids))
+        )
+
+    added = [
+        {'standing_order_id': order.id, 'scheduled_date': d, 'status': 'pending'}
+        for d in sorted(wanted_dates - existing_dates)
+    ]
+    if added:
+        db.session.execute(db.insert(StandingOrderSchedule), added)
+
+    return len(removed_ids), len(added)
+
 @standing_orders_bp.route('/<int:order_id>/print')
 @login_required
 def print_standing_order(order_id):
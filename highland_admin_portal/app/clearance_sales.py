@@ -0,0 +1,162 @@
+"""
+Clearance Stock Sales
+
+Selling off a clearance line is one conditional UPDATE, so concurrent
+sales can't oversell a line on a stale read:
+
+    UPDATE clearance_stock
+       SET qty = qty - :q, qty_sold = qty_sold + :q
+     WHERE id = :id AND qty >= :q
+
+Every sale also appends a ClearanceSale row (item, pallet, qty, unit cost,
+time, user). Sold-quantity reports aggregate that ledger over its
+(sold_at) / (pallet, sold_at) / (item_id, sold_at) indexes instead of
+reading the mutable qty_sold column.
+
+Batches are applied in one transaction through the stock ledger's
+retrying commit (see app/stock_ledger.py).
+"""
+
+import logging
+from datetime import datetime
+from app import db
+from app.models import ClearanceStock, ClearanceSale
+from app.stock_ledger import stock_ledger
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_LINES = 500
+
+
+class SaleError(ValueError):
+    """Raised when a clearance line can't be sold"""
+
+
+class BatchSaleRejected(SaleError):
+    """Raised by an all-or-nothing batch when any line fails"""
+
+    def __init__(self, results):
+        self.results = results
+        failed = sum(1 for result in results if not result['success'])
+        super().__init__(f'{failed} line(s) could not be sold')
+
+
+# ==================== SELLING ====================
+
+def sell(item_id, qty, user_id):
+    """
+    Sell qty units of a clearance line in the current transaction (the caller commits).
+
+    Returns:
+        ClearanceSale: The ledger row (added to the session)
+
+    Raises:
+        SaleError: The line doesn't exist or has fewer than qty units left
+    """
+    if qty <= 0:
+        raise SaleError('Quantity must be greater than 0')
+
+    row = db.session.execute(
+        db.update(ClearanceStock)
+        .where(ClearanceStock.id == item_id, ClearanceStock.qty >= qty)
+        .values(
+            qty=ClearanceStock.qty - qty,
+            qty_sold=db.func.coalesce(ClearanceStock.qty_sold, 0) + qty,
+            updated_at=datetime.utcnow()
+        )
+        .returning(ClearanceStock.pallet, ClearanceStock.cost_price)
+        .execution_options(synchronize_session='fetch')
+    ).first()
+
+    if row is None:
+        available = db.session.query(ClearanceStock.qty).filter(ClearanceStock.id == item_id).scalar()
+        if available is None:
+            raise SaleError(f'Item {item_id} not found')
+        raise SaleError(f'Cannot sell {qty}. Only {available} available.')
+
+    sale = ClearanceSale(item_id=item_id, pallet=row.pallet, qty=qty, unit_cost=row.cost_price, sold_by=user_id)
+    db.session.add(sale)
+    return sale
+
+
+def sell_batch(lines, user_id, all_or_nothing=False):
+    """
+    Sell several clearance lines in one transaction.
+
+    Lines are applied in item ID order so concurrent batches can't
+    deadlock. A failed line leaves its item untouched; the others still
+    commit unless all_or_nothing is set.
+
+    Args:
+        lines (list): (item_id, qty) pairs
+        user_id (int): User recording the sale
+        all_or_nothing (bool): Roll back the whole batch if any line fails
+
+    Returns:
+        list: Per-line dicts (item_id, qty, success, and message or sale_id), in input order
+
+    Raises:
+        BatchSaleRejected: all_or_nothing is set and a line failed (nothing is committed)
+    """
+    def work():
+        results = [None] * len(lines)
+        sales = {}
+        for index in sorted(range(len(lines)), key=lambda i: (lines[i][0], i)):
+            item_id, qty = lines[index]
+            try:
+                sales[index] = sell(item_id, qty, user_id)
+                results[index] = {'item_id': item_id, 'qty': qty, 'success': True}
+            except SaleError as e:
+                results[index] = {'item_id': item_id, 'qty': qty, 'success': False, 'message': str(e)}
+
+        if all_or_nothing and len(sales) < len(lines):
+            raise BatchSaleRejected(results)
+
+        db.session.flush()  # Assign sale IDs
+        for index, sale in sales.items():
+            results[index]['sale_id'] = sale.id
+        return results
+
+    return stock_ledger.run(work)
+
+
+# ==================== REPORTS ====================
+
+REPORT_GROUPS = {
+    'pallet': ClearanceSale.pallet,
+    'item': ClearanceSale.item_id,
+    'day': db.func.date(ClearanceSale.sold_at),
+}
+
+
+def sales_summary(group_by='pallet', start=None, end=None):
+    """
+    Sold quantities and cost value from the sale ledger.
+
+    Args:
+        group_by (str): 'pallet', 'item' or 'day'
+        start (datetime): Include sales at or after this moment
+        end (datetime): Include sales before this moment
+
+    Returns:
+        list: Dicts with key, sale_count, qty and cost_value
+    """
+    key = REPORT_GROUPS[group_by]
+    query = db.session.query(
+        key.label('key'),
+        db.func.count(ClearanceSale.id).label('sale_count'),
+        db.func.sum(ClearanceSale.qty).label('qty'),
+        db.func.sum(ClearanceSale.qty * ClearanceSale.unit_cost).label('cost_value'),
+    )
+    if start is not None:
+        query = query.filter(ClearanceSale.sold_at >= start)
+    if end is not None:
+        query = query.filter(ClearanceSale.sold_at < end)
+
+    rows = query.group_by(key).order_by(key).all()
+    return [{
+        'key': row.key.isoformat() if hasattr(row.key, 'isoformat') else row.key,
+        'sale_count': row.sale_count,
+        'qty': int(row.qty or 0),
+        'cost_value': round(float(row.cost_value or 0), 2)
+    } for row in rows]
@@ -0,0 +1,263 @@
+"""
+Customer Autocomplete Index
+
+Customer pickers search on every keystroke, so lookups are answered from
+a process-local index instead of an unindexable ``ILIKE '%q%'`` scan:
+- a sorted array of normalized keys (account number, full name and each
+  name word) searched by binary search for prefix matches
+- trigram postings over account number and name for infix matches,
+  used when prefix matches don't fill the result list
+
+The index is built on first use and kept fresh by Customer mapper events,
+applied once the writing transaction commits. Changes made by other
+processes are picked up by a full rebuild once the index is older than
+CUSTOMER_INDEX_MAX_AGE seconds.
+"""
+
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from sqlalchemy import event, inspect
+from app import db
+from app.models import Customer
+
+logger = logging.getLogger(__name__)
+
+NGRAM_SIZE = 3
+
+# Customer fields held in the index (everything the pickers display)
+INDEXED_FIELDS = ('account_number', 'name', 'contact_name', 'phone', 'address')
+
+# Rank buckets, best first
+RANK_ACCOUNT_EXACT = 0
+RANK_ACCOUNT_PREFIX = 1
+RANK_NAME_PREFIX = 2
+RANK_WORD_PREFIX = 3
+RANK_INFIX = 4
+
+
+def normalize(value):
+    """Lower-case, accent-free text with punctuation collapsed to single spaces"""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch)).lower()
+    return ' '.join(re.findall(r'[a-z0-9]+', value))
+
+
+def _ngrams(text):
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class CustomerAutocompleteIndex:
+    """Prefix array plus trigram postings over customer account numbers and names"""
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._entries = {}  # customer_id -> dict of INDEXED_FIELDS plus normalized keys
+        self._keys = []  # sorted (key, customer_id)
+        self._postings = {}  # trigram -> set(customer_id)
+
+    def init_app(self, app):
+        self.max_age = app.config.get('CUSTOMER_INDEX_MAX_AGE', self.max_age)
+
+    # ==================== BUILDING ====================
+
+    @staticmethod
+    def _entry(row):
+        entry = {field: getattr(row, field) for field in INDEXED_FIELDS}
+        entry['id'] = row.id
+        account = normalize(row.account_number).replace(' ', '')
+        name = normalize(row.name)
+        entry['_account'] = account
+        entry['_name'] = name
+        entry['_keys'] = {account, name, *name.split()} - {''}
+        entry['_grams'] = _ngrams(account) | _ngrams(name)
+        return entry
+
+    def rebuild(self):
+        """Load every customer and replace the index"""
+        rows = db.session.query(Customer.id, *[getattr(Customer, f) for f in INDEXED_FIELDS]).all()
+
+        entries, keys, postings = {}, [], {}
+        for row in rows:
+            entry = self._entry(row)
+            entries[row.id] = entry
+            keys.extend((key, row.id) for key in entry['_keys'])
+            for gram in entry['_grams']:
+                postings.setdefault(gram, set()).add(row.id)
+        keys.sort()
+
+        with self._lock:
+            self._entries, self._keys, self._postings = entries, keys, postings
+            self._built_at = time.monotonic()
+        logger.debug(f"Built customer autocomplete index with {len(entries)} customers")
+        return len(entries)
+
+    def _ensure_fresh(self):
+        if self._built_at is None or time.monotonic() - self._built_at > self.max_age:
+            self.rebuild()
+
+    # ==================== INCREMENTAL UPDATES ====================
+
+    def _remove_locked(self, customer_id):
+        entry = self._entries.pop(customer_id, None)
+        if entry is None:
+            return
+        for key in entry['_keys']:
+            position = bisect.bisect_left(self._keys, (key, customer_id))
+            if position < len(self._keys) and self._keys[position] == (key, customer_id):
+                del self._keys[position]
+        for gram in entry['_grams']:
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(customer_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def apply_changes(self, upserts, deleted_ids):
+        """
+        Apply committed customer changes.
+
+        Args:
+            upserts (list): Objects exposing id and INDEXED_FIELDS
+            deleted_ids (iterable): IDs of deleted customers
+        """
+        with self._lock:
+            if self._built_at is None:
+                return  # Not built yet; the first lookup loads current data
+            for customer_id in deleted_ids:
+                self._remove_locked(customer_id)
+            for row in upserts:
+                self._remove_locked(row.id)
+                entry = self._entry(row)
+                self._entries[row.id] = entry
+                for key in entry['_keys']:
+                    bisect.insort(self._keys, (key, row.id))
+                for gram in entry['_grams']:
+                    self._postings.setdefault(gram, set()).add(row.id)
+
+    # ==================== LOOKUP ====================
+
+    def _prefix_ids(self, prefix):
+        """IDs of customers with any key starting with prefix"""
+        position = bisect.bisect_left(self._keys, (prefix,))
+        ids = set()
+        while position < len(self._keys) and self._keys[position][0].startswith(prefix):
+            ids.add(self._keys[position][1])
+            position += 1
+        return ids
+
+    def _infix_ids(self, text):
+        """IDs of customers whose account number or name contains text"""
+        grams = _ngrams(text)
+        if grams:
+            postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+            candidates = set.intersection(*postings)
+        else:
+            candidates = self._entries.keys()  # Too short for trigrams
+        return {
+            cid for cid in candidates
+            if text in self._entries[cid]['_name'] or text.replace(' ', '') in self._entries[cid]['_account']
+        }
+
+    def _rank(self, entry, words, compact):
+        if entry['_account'] == compact:
+            return RANK_ACCOUNT_EXACT
+        if entry['_account'].startswith(compact):
+            return RANK_ACCOUNT_PREFIX
+        if entry['_name'].startswith(words[0]):
+            return RANK_NAME_PREFIX
+        if all(any(token.startswith(word) for token in entry['_keys']) for word in words):
+            return RANK_WORD_PREFIX
+        return RANK_INFIX
+
+    def search(self, query, limit=20):
+        """
+        Customers matching an autocomplete query.
+
+        Every word of the query must prefix a word of the customer's name
+        (or the query must prefix the account number); when that yields
+        fewer than `limit` customers, substring matches are added.
+
+        Returns:
+            list: Index entries (dicts with id and INDEXED_FIELDS), best first
+        """
+        text = normalize(query)
+        if not text:
+            return []
+        words = text.split()
+        compact = text.replace(' ', '')
+
+        self._ensure_fresh()
+        with self._lock:
+            matches = self._prefix_ids(compact)
+            word_matches = self._prefix_ids(words[0])
+            for word in words[1:]:
+                word_matches &= self._prefix_ids(word)
+            matches |= word_matches
+
+            if len(matches) < limit:
+                matches |= self._infix_ids(text)
+
+            entries = [self._entries[cid] for cid in matches]
+
+        best = heapq.nsmallest(limit, entries, key=lambda e: (self._rank(e, words, compact), e['_name'], e['id']))
+        return [{k: v for k, v in entry.items() if not k.startswith('_')} for entry in best]
+
+
+customer_index = CustomerAutocompleteIndex()
+
+
+# ==================== CHANGE TRACKING ====================
+
+class _Snapshot:
+    """Indexed field values captured at flush time (objects are expired by the commit)"""
+    __slots__ = ('id',) + INDEXED_FIELDS
+
+    def __init__(self, customer):
+        self.id = customer.id
+        for field in INDEXED_FIELDS:
+            setattr(self, field, getattr(customer, field))
+
+
+def _record(target, snapshot):
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault('customer_index_changes', {})[target.id] = snapshot
+
+
+@event.listens_for(Customer, 'after_insert')
+def _customer_inserted(mapper, connection, target):
+    _record(target, _Snapshot(target))
+
+
+@event.listens_for(Customer, 'after_update')
+def _customer_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in INDEXED_FIELDS):
+        _record(target, _Snapshot(target))
+
+
+@event.listens_for(Customer, 'after_delete')
+def _customer_deleted(mapper, connection, target):
+    _record(target, None)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_after_commit(session):
+    changes = session.info.pop('customer_index_changes', None)
+    if changes:
+        customer_index.apply_changes(
+            [snapshot for snapshot in changes.values() if snapshot is not None],
+            [cid for cid, snapshot in changes.items() if snapshot is None]
+        )
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('customer_index_changes', None)
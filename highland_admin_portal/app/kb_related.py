@@ -0,0 +1,316 @@
+"""
+Knowledge Base Related Articles
+
+Related articles are precomputed and stored in the related_article table
+(top KB_RELATED_TOP_K neighbours per published article), so the detail
+page needs a single indexed lookup.
+
+Similarity is TF-IDF cosine over each article's title (weighted x3),
+tags (x2) and body text, plus a small bonus for sharing a category.
+
+- ``flask kb-rebuild-related`` rebuilds the whole table (run after bulk
+  imports, or periodically to refresh IDF weights).
+- Publishing, editing or deleting an article triggers an incremental
+  refresh after the transaction commits. With KB_RELATED_ASYNC it runs
+  on a background worker with its own session and connection, otherwise
+  it runs in the committing thread.
+
+A refresh re-weights the whole published corpus, as IDF depends on every
+article, but only rewrites the lists that can change. Per-article term
+counts are cached in memory keyed by content, so only articles that
+actually changed are re-tokenized.
+"""
+
+import heapq
+import logging
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Article, RelatedArticle
+from app.utils import html_to_text
+
+logger = logging.getLogger(__name__)
+
+TITLE_WEIGHT = 3
+TAG_WEIGHT = 2
+CATEGORY_BONUS = 0.05
+MIN_SCORE = 0.05
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]{3,}')
+STOP_WORDS = frozenset('''
+    the and for are but not you all any can had her was one our out has him his how its may new now
+    see two who did get use way she too also been from have into more only over such than that them
+    then they this very were what when will with your each which their there these those would about
+    after before other should could where while being here just some
+'''.split())
+
+# Article fields whose change can alter similarity
+TRACKED_FIELDS = ('status', 'title', 'body', 'tags', 'category_id')
+
+
+def tokenize(text):
+    """Lower-case word tokens without stop words"""
+    return [token for token in TOKEN_PATTERN.findall((text or '').lower()) if token not in STOP_WORDS]
+
+
+class RelatedArticleIndex:
+    """Builds and maintains the related_article table"""
+
+    def __init__(self, top_k=5, run_async=True):
+        self.top_k = top_k
+        self.run_async = run_async
+        self.app = None
+        self._terms = {}  # article_id -> (signature, Counter)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def init_app(self, app):
+        self.app = app
+        self.top_k = app.config.get('KB_RELATED_TOP_K', self.top_k)
+        self.run_async = app.config.get('KB_RELATED_ASYNC', self.run_async)
+
+        @app.cli.command('kb-rebuild-related')
+        def rebuild_related_command():
+            """Rebuild related-article recommendations for all published articles."""
+            count = self.rebuild()
+            print(f'Stored related articles for {count} published articles')
+
+    # ==================== CORPUS ====================
+
+    def _load_corpus(self, session):
+        """
+        Term counts and categories for every published article.
+
+        Only articles whose content changed since the last load are
+        re-read and re-tokenized.
+        """
+        rows = session.query(
+            Article.id, Article.title, Article.tags, Article.category_id, Article.content_hash
+        ).filter(Article.status == 'published').all()
+
+        signatures = {row.id: (row.title, row.tags, row.content_hash) for row in rows}
+
+        with self._lock:
+            stale = [aid for aid, sig in signatures.items() if self._terms.get(aid, (None,))[0] != sig]
+
+        if stale:
+            bodies = dict(session.query(Article.id, Article.body_html).filter(Article.id.in_(stale)).all())
+            fresh = {}
+            for row in rows:
+                if row.id in bodies:
+                    counts = Counter(tokenize(html_to_text(bodies[row.id])))
+                    for token in tokenize(row.title):
+                        counts[token] += TITLE_WEIGHT
+                    for token in tokenize((row.tags or '').replace(',', ' ')):
+                        counts[token] += TAG_WEIGHT
+                    fresh[row.id] = (signatures[row.id], counts)
+            with self._lock:
+                self._terms.update(fresh)
+
+        with self._lock:
+            for aid in set(self._terms) - set(signatures):
+                del self._terms[aid]
+            terms = {aid: self._terms[aid][1] for aid in signatures}
+
+        categories = {row.id: row.category_id for row in rows}
+        return terms, categories
+
+    @staticmethod
+    def _vectorize(terms):
+        """Unit-length TF-IDF vectors plus an inverted index of term -> [(article_id, weight)]"""
+        doc_freq = Counter()
+        for counts in terms.values():
+            doc_freq.update(counts.keys())
+
+        total = len(terms)
+        idf = {term: math.log((1 + total) / (1 + df)) + 1 for term, df in doc_freq.items()}
+
+        vectors = {}
+        inverted = defaultdict(list)
+        for aid, counts in terms.items():
+            weights = {term: (1 + math.log(count)) * idf[term] for term, count in counts.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            vectors[aid] = {term: w / norm for term, w in weights.items()}
+            for term, w in vectors[aid].items():
+                inverted[term].append((aid, w))
+
+        return vectors, inverted
+
+    @staticmethod
+    def _scores(aid, vectors, inverted, categories):
+        """Similarity of one article to every other article scoring at least MIN_SCORE"""
+        scores = defaultdict(float)
+        for term, weight in vectors.get(aid, {}).items():
+            for other, other_weight in inverted[term]:
+                if other != aid:
+                    scores[other] += weight * other_weight
+
+        category = categories.get(aid)
+        if category is not None:
+            for other in scores:
+                if categories.get(other) == category:
+                    scores[other] += CATEGORY_BONUS
+
+        return {other: score for other, score in scores.items() if score >= MIN_SCORE}
+
+    def _neighbours(self, aid, vectors, inverted, categories):
+        """Top-k (related_id, score) pairs for one article"""
+        scores = self._scores(aid, vectors, inverted, categories)
+        return heapq.nlargest(self.top_k, scores.items(), key=lambda pair: pair[1])
+
+    def _store(self, session, article_ids, vectors, inverted, categories):
+        article_ids = list(article_ids)
+        if not article_ids:
+            return
+        session.execute(db.delete(RelatedArticle).where(RelatedArticle.article_id.in_(article_ids)))
+        rows = [
+            {'article_id': aid, 'related_id': other, 'score': round(score, 6)}
+            for aid in article_ids if aid in vectors
+            for other, score in self._neighbours(aid, vectors, inverted, categories)
+        ]
+        if rows:
+            session.execute(db.insert(RelatedArticle), rows)
+
+    # ==================== BUILDING ====================
+
+    def rebuild(self, session=None):
+        """
+        Recompute neighbours for every published article.
+
+        Returns:
+            int: Number of published articles processed
+        """
+        session = session or db.session
+        terms, categories = self._load_corpus(session)
+        vectors, inverted = self._vectorize(terms)
+
+        session.execute(db.delete(RelatedArticle))
+        self._store(session, vectors.keys(), vectors, inverted, categories)
+        session.commit()
+        return len(vectors)
+
+    def refresh(self, changed_ids, session=None):
+        """
+        Incrementally update the neighbour lists affected by changed articles.
+
+        Vectors are recomputed for the whole published corpus (from cached
+        term counts), but only these lists are rewritten: those of the
+        changed articles themselves, of any article currently listing one
+        of them, and of any article a changed article now scores high
+        enough to enter.
+        IDF weights drift slightly between full rebuilds; that only
+        nudges scores and is corrected by the next rebuild.
+        """
+        session = session or db.session
+        changed_ids = set(changed_ids)
+        terms, categories = self._load_corpus(session)
+        vectors, inverted = self._vectorize(terms)
+
+        # Lists that include a changed article, found before removed articles' rows are deleted
+        # below: a list that loses an entry must be recomputed to fill the gap
+        affected = changed_ids & set(vectors)
+        affected.update(
+            row.article_id for row in session.query(RelatedArticle.article_id)
+            .filter(RelatedArticle.related_id.in_(changed_ids)).distinct()
+        )
+
+        # Unpublished or deleted articles drop out of everyone's lists
+        removed = changed_ids - set(vectors)
+        if removed:
+            session.execute(db.delete(RelatedArticle).where(
+                db.or_(RelatedArticle.article_id.in_(removed), RelatedArticle.related_id.in_(removed))
+            ))
+
+        # Lists a changed article may now enter: full lists only change if it beats their weakest entry
+        weakest = dict(
+            session.query(RelatedArticle.article_id, db.func.min(RelatedArticle.score))
+            .group_by(RelatedArticle.article_id)
+            .having(db.func.count(RelatedArticle.related_id) >= self.top_k)
+            .all()
+        )
+        for aid in changed_ids & set(vectors):
+            for other, score in self._scores(aid, vectors, inverted, categories).items():
+                if other not in weakest or score > weakest[other]:
+                    affected.add(other)
+
+        self._store(session, affected & set(vectors), vectors, inverted, categories)
+        session.commit()
+        return len(affected)
+
+    # ==================== REFRESH AFTER COMMIT ====================
+
+    def queue_refresh(self, article_ids):
+        """Refresh the given articles' neighbours, on the background worker if KB_RELATED_ASYNC"""
+        if self.app is None or not article_ids:
+            return
+        if not self.run_async:
+            self._run_refresh(set(article_ids))
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='kb-related')
+        self._executor.submit(self._run_refresh, set(article_ids))
+
+    def wait(self):
+        """Block until every queued background refresh has finished"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _run_refresh(self, article_ids):
+        # A session of its own (and so its own pooled connection), never the caller's db.session:
+        # this runs after the caller's commit, or on the worker thread
+        with self.app.app_context(), Session(db.engine) as session:
+            try:
+                count = self.refresh(article_ids, session)
+                logger.debug(f"Refreshed related articles for {count} articles")
+            except Exception as e:
+                session.rollback()
+                logger.error(f"Error refreshing related articles: {e}", exc_info=True)
+
+
+related_article_index = RelatedArticleIndex()
+
+
+# ==================== CHANGE TRACKING ====================
+
+def _mark_changed(target):
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault('kb_related_changed', set()).add(target.id)
+
+
+@event.listens_for(Article, 'after_insert')
+def _article_inserted(mapper, connection, target):
+    if target.status == 'published':
+        _mark_changed(target)
+
+
+@event.listens_for(Article, 'after_update')
+def _article_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in TRACKED_FIELDS):
+        _mark_changed(target)
+
+
+@event.listens_for(Article, 'after_delete')
+def _article_deleted(mapper, connection, target):
+    _mark_changed(target)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _queue_after_commit(session):
+    changed = session.info.pop('kb_related_changed', None)
+    if changed:
+        related_article_index.queue_refresh(changed)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('kb_related_changed', None)
@@ -0,0 +1,143 @@
+"""
+Knowledge Base Render Cache
+
+Article bodies are sanitized once, when they are saved, rather than on
+every read. Each save stores:
+- body_html: the sanitized body used for display
+- excerpt: a plain-text summary for list views
+- content_hash: SHA-256 of the raw body, used to build ETags
+
+Serialized API payloads are additionally kept in a small in-process LRU
+keyed by article ID and ETag, so repeat reads of an unchanged article are
+answered from memory (or with a 304) without loading the body column.
+The ETag covers everything the payload shows: the article's own version
+columns, the category, supplier and author names, and the popularity
+score. trending_score also decays with time, so the ETag changes every
+TRENDING_REFRESH_SECONDS as well.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import defer
+from app import db
+from app.models import Article, Category, Supplier, User
+from app.utils import html_to_text, sanitize_article_html
+
+logger = logging.getLogger(__name__)
+
+EXCERPT_LENGTH = 300
+
+# How stale a cached trending_score may get (it moves ~0.4% per hour with a 7-day half-life)
+TRENDING_REFRESH_SECONDS = 3600
+
+
+# ==================== RENDERING ====================
+
+def make_excerpt(text, length=EXCERPT_LENGTH):
+    """Truncate plain text to at most `length` characters on a word boundary"""
+    if len(text) <= length:
+        return text
+    return text[:length - 1].rsplit(' ', 1)[0].rstrip(' ,.;:') + '…'
+
+
+def render_article(article):
+    """Recompute the stored sanitized body, excerpt and content hash"""
+    body = article.body or ''
+    article.body_html = sanitize_article_html(body)
+    article.excerpt = make_excerpt(html_to_text(article.body_html))
+    article.content_hash = hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+def summary_only():
+    """Loader options for list queries that show the excerpt instead of the body"""
+    return (defer(Article.body), defer(Article.body_html))
+
+
+@event.listens_for(Article, 'before_insert')
+def _render_on_insert(mapper, connection, target):
+    render_article(target)
+
+
+@event.listens_for(Article, 'before_update')
+def _render_on_update(mapper, connection, target):
+    if inspect(target).attrs.body.history.has_changes() or target.content_hash is None:
+        render_article(target)
+
+
+# ==================== PAYLOAD CACHE ====================
+
+def article_meta(article_id):
+    """
+    Status and payload version of an article, without loading its body.
+
+    Returns:
+        Row: (status, updated_at, content_hash, view_count, popularity_score,
+        category_name, supplier_name, author_name), or None if not found
+    """
+    return db.session.query(
+        Article.status, Article.updated_at, Article.content_hash, Article.view_count, Article.popularity_score,
+        Category.name, Supplier.name, User.full_name
+    ).outerjoin(Category, Category.id == Article.category_id)\
+        .outerjoin(Supplier, Supplier.id == Article.supplier_id)\
+        .outerjoin(User, User.id == Article.author_id)\
+        .filter(Article.id == article_id)\
+        .first()
+
+
+def article_etag(article_id, meta, now=None):
+    """Weak ETag value (unquoted) covering every field of an article's API payload"""
+    trending_window = int((now if now is not None else time.time()) // TRENDING_REFRESH_SECONDS)
+    version = ':'.join(
+        [str(article_id), str(trending_window)] +
+        [value.isoformat() if hasattr(value, 'isoformat') else repr(value) for value in meta]
+    )
+    return hashlib.sha1(version.encode('utf-8')).hexdigest()
+
+
+class ArticleRenderCache:
+    """Thread-safe LRU of serialized article payloads keyed by (article_id, etag)"""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_size = app.config.get('KB_RENDER_CACHE_SIZE', self.max_size)
+
+    def get(self, article_id, etag):
+        with self._lock:
+            entry = self._entries.get(article_id)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries.move_to_end(article_id)
+            return entry[1]
+
+    def put(self, article_id, etag, payload):
+        """Store a payload and return its serialized JSON"""
+        serialized = json.dumps(payload)
+        if self.max_size <= 0:
+            return serialized
+        with self._lock:
+            self._entries[article_id] = (etag, serialized)
+            self._entries.move_to_end(article_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return serialized
+
+    def invalidate(self, article_id):
+        with self._lock:
+            self._entries.pop(article_id, None)
+
+
+article_render_cache = ArticleRenderCache()
+
+
+@event.listens_for(Article, 'after_delete')
+def _evict_on_delete(mapper, connection, target):
+    article_render_cache.invalidate(target.id)
@@ -0,0 +1,274 @@
+"""
+Knowledge Base Full-Text Search
+
+Maintains a full-text index over KB articles and provides ranked search:
+- SQLite: an FTS5 virtual table (article_fts) ranked with bm25()
+- PostgreSQL: an article_fts table with a weighted tsvector and GIN index
+
+Article HTML is stripped before indexing. The index is kept in sync by
+mapper events on Article, so every create/update/delete that goes through
+the ORM updates it in the same transaction.
+"""
+
+import logging
+import re
+from markupsafe import Markup, escape
+from sqlalchemy import event, text, inspect, bindparam, DDL, Integer, Float
+from app import db
+from app.models import Article, Tag
+from app.utils import html_to_text
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_DIALECTS = ('sqlite', 'postgresql')
+
+# Highlight markers used inside snippets; replaced with <mark> after escaping
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+MAX_QUERY_TERMS = 10
+
+# Column weights for bm25(): title, body, tags
+SQLITE_BM25_WEIGHTS = '10.0, 1.0, 5.0'
+
+_index_available = {}
+
+
+# ==================== SCHEMA ====================
+
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS article_fts "
+    "USING fts5(title, body, tags, tokenize='porter unicode61')"
+)
+
+POSTGRES_CREATE = (
+    "CREATE TABLE IF NOT EXISTS article_fts ("
+    "article_id INTEGER PRIMARY KEY REFERENCES article(id) ON DELETE CASCADE, "
+    "title TEXT, body TEXT, tags TEXT, document TSVECTOR)"
+)
+
+POSTGRES_CREATE_INDEX = (
+    "CREATE INDEX IF NOT EXISTS idx_article_fts_document ON article_fts USING GIN (document)"
+)
+
+DROP_INDEX_TABLE = "DROP TABLE IF EXISTS article_fts"
+
+# Keep the index alongside the article table when using db.create_all()/drop_all()
+event.listen(Article.__table__, 'after_create', DDL(SQLITE_CREATE).execute_if(dialect='sqlite'))
+event.listen(Article.__table__, 'after_create', DDL(POSTGRES_CREATE).execute_if(dialect='postgresql'))
+event.listen(Article.__table__, 'after_create', DDL(POSTGRES_CREATE_INDEX).execute_if(dialect='postgresql'))
+event.listen(Article.__table__, 'before_drop', DDL(DROP_INDEX_TABLE).execute_if(dialect=SUPPORTED_DIALECTS))
+
+
+def index_available(connection=None):
+    """
+    Check whether the full-text index exists for the current database.
+
+    The result is cached per database URL so the check costs one
+    inspection per process.
+    """
+    bind = connection if connection is not None else db.engine
+    engine = getattr(bind, 'engine', bind)
+    key = str(engine.url)
+
+    if key not in _index_available:
+        if engine.dialect.name not in SUPPORTED_DIALECTS:
+            _index_available[key] = False
+        else:
+            try:
+                _index_available[key] = inspect(bind).has_table('article_fts')
+            except Exception as e:
+                logger.error(f"Error checking article search index: {e}", exc_info=True)
+                _index_available[key] = False
+    return _index_available[key]
+
+
+# ==================== INDEX MAINTENANCE ====================
+
+def _index_values(article):
+    return {
+        'id': article.id,
+        'title': article.title or '',
+        'body': html_to_text(article.body),
+        'tags': (article.tags or '').replace(',', ' ')
+    }
+
+
+def index_article(connection, article):
+    """Insert or replace an article's entry in the full-text index"""
+    values = _index_values(article)
+
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(
+            "INSERT INTO article_fts (article_id, title, body, tags, document) "
+            "VALUES (:id, :title, :body, :tags, "
+            "setweight(to_tsvector('english', :title), 'A') || "
+            "setweight(to_tsvector('english', :tags), 'B') || "
+            "setweight(to_tsvector('english', :body), 'C')) "
+            "ON CONFLICT (article_id) DO UPDATE SET "
+            "title = EXCLUDED.title, body = EXCLUDED.body, tags = EXCLUDED.tags, "
+            "document = EXCLUDED.document"
+        ), values)
+    else:
+        connection.execute(text("DELETE FROM article_fts WHERE rowid = :id"), values)
+        connection.execute(text(
+            "INSERT INTO article_fts (rowid, title, body, tags) VALUES (:id, :title, :body, :tags)"
+        ), values)
+
+
+def remove_article(connection, article_id):
+    """Remove an article from the full-text index"""
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text("DELETE FROM article_fts WHERE article_id = :id"), {'id': article_id})
+    else:
+        connection.execute(text("DELETE FROM article_fts WHERE rowid = :id"), {'id': article_id})
+
+
+def rebuild_article_index():
+    """Rebuild the full-text index from every article (e.g. after a bulk import)"""
+    if not index_available():
+        return 0
+
+    connection = db.session.connection()
+    connection.execute(text("DELETE FROM article_fts"))
+    count = 0
+    for article in Article.query.yield_per(500):
+        index_article(connection, article)
+        count += 1
+    db.session.commit()
+    return count
+
+
+def init_app(app):
+    @app.cli.command('kb-rebuild-search')
+    def rebuild_search_command():
+        """Rebuild the knowledge base full-text search index."""
+        if not index_available():
+            print('No full-text index on this database (search uses LIKE)')
+            return
+        count = rebuild_article_index()
+        print(f'Indexed {count} articles')
+
+
+@event.listens_for(Article, 'after_insert')
+def _article_inserted(mapper, connection, target):
+    if index_available(connection):
+        index_article(connection, target)
+
+
+@event.listens_for(Article, 'after_update')
+def _article_updated(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in ('title', 'body', 'tags')):
+        return
+    if index_available(connection):
+        index_article(connection, target)
+
+
+@event.listens_for(Article, 'after_delete')
+def _article_deleted(mapper, connection, target):
+    if index_available(connection):
+        remove_article(connection, target.id)
+
+
+# ==================== SEARCH ====================
+
+def _query_terms(search):
+    """Split a user query into safe word tokens (no FTS operators)"""
+    return re.findall(r'\w+', (search or '').lower())[:MAX_QUERY_TERMS]
+
+
+def _match_expression(terms, dialect):
+    """Build an all-terms-must-match expression with prefix matching on the last term"""
+    if dialect == 'postgresql':
+        return ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+    return ' '.join([f'"{t}"' for t in terms[:-1]] + [f'"{terms[-1]}"*'])
+
+
+def _ranked_matches(terms):
+    """Subquery of (article_id, rank) for matching articles; lower rank is better"""
+    dialect = db.engine.dialect.name
+    match = _match_expression(terms, dialect)
+
+    if dialect == 'postgresql':
+        sql = text(
+            "SELECT article_id, -ts_rank_cd(document, to_tsquery('english', :match)) AS rank "
+            "FROM article_fts WHERE document @@ to_tsquery('english', :match)"
+        )
+    else:
+        sql = text(
+            f"SELECT rowid AS article_id, bm25(article_fts, {SQLITE_BM25_WEIGHTS}) AS rank "
+            "FROM article_fts WHERE article_fts MATCH :match"
+        )
+
+    return sql.bindparams(match=match).columns(article_id=Integer, rank=Float).subquery('article_matches')
+
+
+def filter_articles_by_search(query, search):
+    """
+    Restrict an Article query to articles matching a search string.
+
+    Results are ordered by relevance (BM25 on SQLite, ts_rank_cd on
+    PostgreSQL); callers may append further ORDER BY terms as tie-breakers.
+    Falls back to LIKE matching when no full-text index is available.
+    """
+    terms = _query_terms(search)
+    if not terms:
+        return query
+
+    if not index_available():
+        return query.filter(
+            db.or_(
+                Article.title.contains(search),
+                Article.body.contains(search),
+                Article.tag_objects.any(Tag.name == Tag.normalize(search))
+            )
+        )
+
+    matches = _ranked_matches(terms)
+    return query.join(matches, matches.c.article_id == Article.id).order_by(matches.c.rank)
+
+
+def get_search_snippets(search, article_ids):
+    """
+    Build highlighted text snippets for the given articles.
+
+    Only the articles actually being displayed are passed in, so snippet
+    generation stays proportional to the page size.
+
+    Returns:
+        dict: Mapping of article ID to a Markup snippet with <mark> highlights
+    """
+    terms = _query_terms(search)
+    if not terms or not article_ids or not index_available():
+        return {}
+
+    dialect = db.engine.dialect.name
+    match = _match_expression(terms, dialect)
+
+    if dialect == 'postgresql':
+        sql = text(
+            "SELECT article_id, ts_headline('english', body, to_tsquery('english', :match), :options) "
+            "FROM article_fts WHERE article_id IN :ids"
+        ).bindparams(options=f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords=30, MinWords=12')
+    else:
+        sql = text(
+            "SELECT rowid, snippet(article_fts, -1, :start, :end, '…', 24) "
+            "FROM article_fts WHERE article_fts MATCH :match AND rowid IN :ids"
+        ).bindparams(start=HIGHLIGHT_START, end=HIGHLIGHT_END)
+
+    sql = sql.bindparams(bindparam('ids', expanding=True), match=match)
+
+    try:
+        rows = db.session.execute(sql, {'ids': list(article_ids)}).fetchall()
+    except Exception as e:
+        logger.error(f"Error building search snippets: {e}", exc_info=True)
+        return {}
+
+    return {row[0]: render_snippet(row[1]) for row in rows if row[1]}
+
+
+def render_snippet(snippet):
+    """Escape a raw snippet and turn highlight markers into <mark> tags"""
+    escaped = str(escape(snippet))
+    return Markup(escaped.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>'))
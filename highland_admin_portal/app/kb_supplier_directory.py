@@ -0,0 +1,291 @@
+"""
+Knowledge Base Supplier Directory
+
+Supplier search
+    Each supplier's name and contact fields are folded into a lower-cased
+    search_text column when it is saved, and searched by substring through
+    a trigram index:
+    - SQLite: an FTS5 table (supplier_fts) using the trigram tokenizer
+    - PostgreSQL: a pg_trgm GIN index on supplier.search_text
+    Name prefix matches rank first. Terms shorter than three characters
+    can't use a trigram index and fall back to LIKE.
+
+Article summaries
+    supplier_article_summary holds each supplier's published article
+    count, latest published article and per-category counts. Article
+    writes mark the affected suppliers, and their summaries are recomputed
+    at the end of the same flush, so the directory and detail pages never
+    aggregate articles themselves.
+"""
+
+import json
+import logging
+import re
+from datetime import datetime
+from sqlalchemy import event, text, inspect, DDL
+from app import db
+from app.models import Supplier, SupplierArticleSummary, Article
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = ('name', 'category', 'contact_name', 'email', 'phone', 'website', 'address', 'contact_info')
+
+MAX_QUERY_TERMS = 10
+TRIGRAM_LENGTH = 3
+
+# Article fields that feed the supplier summary
+TRACKED_FIELDS = ('status', 'supplier_id', 'category_id', 'title', 'created_at')
+
+_index_available = {}
+
+
+# ==================== SCHEMA ====================
+
+SQLITE_CREATE = "CREATE VIRTUAL TABLE IF NOT EXISTS supplier_fts USING fts5(search_text, tokenize='trigram')"
+
+POSTGRES_CREATE_EXTENSION = "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+
+POSTGRES_CREATE_INDEX = (
+    "CREATE INDEX IF NOT EXISTS idx_supplier_search_trgm ON supplier USING GIN (search_text gin_trgm_ops)"
+)
+
+SQLITE_DROP = "DROP TABLE IF EXISTS supplier_fts"
+
+# Keep the index alongside the supplier table when using db.create_all()/drop_all()
+event.listen(Supplier.__table__, 'after_create', DDL(SQLITE_CREATE).execute_if(dialect='sqlite'))
+event.listen(Supplier.__table__, 'after_create', DDL(POSTGRES_CREATE_EXTENSION).execute_if(dialect='postgresql'))
+event.listen(Supplier.__table__, 'after_create', DDL(POSTGRES_CREATE_INDEX).execute_if(dialect='postgresql'))
+event.listen(Supplier.__table__, 'before_drop', DDL(SQLITE_DROP).execute_if(dialect='sqlite'))
+
+
+def fts_available(connection=None):
+    """
+    Check whether the SQLite trigram table exists for the current database.
+
+    Cached per database URL. Always False on PostgreSQL, where the
+    trigram index lives on the supplier table itself.
+    """
+    bind = connection if connection is not None else db.engine
+    engine = getattr(bind, 'engine', bind)
+    key = str(engine.url)
+
+    if key not in _index_available:
+        if engine.dialect.name != 'sqlite':
+            _index_available[key] = False
+        else:
+            try:
+                _index_available[key] = inspect(bind).has_table('supplier_fts')
+            except Exception as e:
+                logger.error(f"Error checking supplier search index: {e}", exc_info=True)
+                _index_available[key] = False
+    return _index_available[key]
+
+
+# ==================== SEARCH TEXT ====================
+
+def build_search_text(supplier):
+    """Lower-cased, whitespace-collapsed text of the searchable fields"""
+    parts = [getattr(supplier, field) for field in SEARCH_FIELDS]
+    if supplier.phone:
+        parts.append(re.sub(r'\D', '', supplier.phone))  # So "01463 123456" matches "01463123456"
+    return re.sub(r'\s+', ' ', ' '.join(p for p in parts if p)).strip().lower()
+
+
+@event.listens_for(Supplier, 'before_insert')
+def _set_search_text_on_insert(mapper, connection, target):
+    target.search_text = build_search_text(target)
+
+
+@event.listens_for(Supplier, 'before_update')
+def _set_search_text_on_update(mapper, connection, target):
+    state = inspect(target)
+    if target.search_text is None or any(state.attrs[name].history.has_changes() for name in SEARCH_FIELDS):
+        target.search_text = build_search_text(target)
+
+
+def index_supplier(connection, supplier_id, search_text):
+    """Insert or replace a supplier's row in the SQLite trigram table"""
+    values = {'id': supplier_id, 'search_text': search_text or ''}
+    connection.execute(text("DELETE FROM supplier_fts WHERE rowid = :id"), values)
+    connection.execute(text("INSERT INTO supplier_fts (rowid, search_text) VALUES (:id, :search_text)"), values)
+
+
+@event.listens_for(Supplier, 'after_insert')
+@event.listens_for(Supplier, 'after_update')
+def _supplier_saved(mapper, connection, target):
+    if inspect(target).attrs.search_text.history.has_changes() and fts_available(connection):
+        index_supplier(connection, target.id, target.search_text)
+
+
+@event.listens_for(Supplier, 'after_delete')
+def _supplier_deleted(mapper, connection, target):
+    if fts_available(connection):
+        connection.execute(text("DELETE FROM supplier_fts WHERE rowid = :id"), {'id': target.id})
+
+
+# ==================== SEARCH ====================
+
+def _query_terms(search):
+    return (search or '').lower().split()[:MAX_QUERY_TERMS]
+
+
+def filter_suppliers_by_search(query, search):
+    """
+    Restrict a Supplier query to suppliers whose name or contact details
+    contain every search term.
+
+    Suppliers whose name starts with the first term are ordered first;
+    callers may append further ORDER BY terms as tie-breakers.
+    """
+    terms = _query_terms(search)
+    if not terms:
+        return query
+
+    long_terms = [t for t in terms if len(t) >= TRIGRAM_LENGTH]
+    short_terms = [t for t in terms if len(t) < TRIGRAM_LENGTH]
+
+    if long_terms and fts_available():
+        match = ' AND '.join('"{}"'.format(t.replace('"', '""')) for t in long_terms)
+        matches = text("SELECT rowid FROM supplier_fts WHERE supplier_fts MATCH :match").bindparams(match=match)
+        query = query.filter(Supplier.id.in_(matches.columns(rowid=db.Integer)))
+    else:
+        # PostgreSQL: the pg_trgm GIN index serves these LIKEs
+        short_terms = terms
+
+    for term in short_terms:
+        query = query.filter(Supplier.search_text.contains(term, autoescape=True))
+
+    name_prefix = db.func.lower(Supplier.name).startswith(terms[0], autoescape=True)
+    return query.order_by(db.case((name_prefix, 0), else_=1))
+
+
+# ==================== ARTICLE SUMMARIES ====================
+
+def refresh_summaries(connection, supplier_ids):
+    """
+    Recompute supplier_article_summary rows for the given suppliers.
+
+    Runs three grouped queries however many suppliers are refreshed.
+    Suppliers that no longer exist are skipped.
+    """
+    supplier_ids = {sid for sid in supplier_ids if sid is not None}
+    if not supplier_ids:
+        return
+
+    article = Article.__table__
+    summary = SupplierArticleSummary.__table__
+    published = db.and_(article.c.status == 'published', article.c.supplier_id.in_(supplier_ids))
+
+    existing = set(connection.execute(
+        db.select(Supplier.__table__.c.id).where(Supplier.__table__.c.id.in_(supplier_ids))
+    ).scalars())
+
+    category_counts = {sid: {} for sid in existing}
+    rows = connection.execute(
+        db.select(article.c.supplier_id, article.c.category_id, db.func.count())
+        .where(published)
+        .group_by(article.c.supplier_id, article.c.category_id)
+    )
+    for supplier_id, category_id, count in rows:
+        if supplier_id in category_counts and category_id is not None:
+            category_counts[supplier_id][str(category_id)] = count
+
+    ranked = db.select(
+        article.c.supplier_id, article.c.id, article.c.title, article.c.created_at,
+        db.func.count().over(partition_by=article.c.supplier_id).label('article_count'),
+        db.func.row_number().over(
+            partition_by=article.c.supplier_id,
+            order_by=(article.c.created_at.desc(), article.c.id.desc())
+        ).label('position')
+    ).where(published).subquery()
+    latest = {
+        row.supplier_id: row for row in connection.execute(
+            db.select(ranked).where(ranked.c.position == 1)
+        )
+    }
+
+    now = datetime.utcnow()
+    values = []
+    for supplier_id in existing:
+        row = latest.get(supplier_id)
+        values.append({
+            'supplier_id': supplier_id,
+            'article_count': row.article_count if row else 0,
+            'latest_article_id': row.id if row else None,
+            'latest_article_title': row.title if row else None,
+            'latest_published_at': row.created_at if row else None,
+            'category_counts': json.dumps(category_counts[supplier_id], sort_keys=True),
+            'updated_at': now
+        })
+
+    connection.execute(db.delete(summary).where(summary.c.supplier_id.in_(supplier_ids)))
+    if values:
+        connection.execute(db.insert(summary), values)
+
+
+def rebuild_supplier_directory():
+    """Rebuild search text, the trigram table and every article summary (e.g. after a bulk import)"""
+    connection = db.session.connection()
+    supplier = Supplier.__table__
+
+    if fts_available():
+        connection.execute(text("DELETE FROM supplier_fts"))
+
+    supplier_ids = []
+    for row in db.session.query(Supplier).yield_per(500):
+        search_text = build_search_text(row)
+        connection.execute(
+            db.update(supplier).where(supplier.c.id == row.id)
+            .values(search_text=search_text, updated_at=supplier.c.updated_at)
+        )
+        if fts_available():
+            index_supplier(connection, row.id, search_text)
+        supplier_ids.append(row.id)
+
+    refresh_summaries(connection, supplier_ids)
+    db.session.commit()
+    return len(supplier_ids)
+
+
+def init_app(app):
+    @app.cli.command('kb-rebuild-suppliers')
+    def rebuild_suppliers_command():
+        """Rebuild the supplier search index and article summaries."""
+        count = rebuild_supplier_directory()
+        print(f'Rebuilt search index and article summaries for {count} suppliers')
+
+
+# ==================== CHANGE TRACKING ====================
+
+def _mark_changed(target, supplier_ids):
+    session = inspect(target).session
+    if session is not None:
+        session.info.setdefault('kb_supplier_summary_changed', set()).update(supplier_ids)
+
+
+@event.listens_for(Article, 'after_insert')
+def _article_inserted(mapper, connection, target):
+    if target.supplier_id is not None and target.status == 'published':
+        _mark_changed(target, [target.supplier_id])
+
+
+@event.listens_for(Article, 'after_update')
+def _article_updated(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in TRACKED_FIELDS):
+        return
+    history = state.attrs.supplier_id.history
+    _mark_changed(target, [target.supplier_id, *history.deleted])
+
+
+@event.listens_for(Article, 'after_delete')
+def _article_deleted(mapper, connection, target):
+    if target.supplier_id is not None:
+        _mark_changed(target, [target.supplier_id])
+
+
+@event.listens_for(db.session, 'after_flush')
+def _refresh_after_flush(session, flush_context):
+    changed = session.info.pop('kb_supplier_summary_changed', None)
+    if changed:
+        refresh_summaries(session.connection(), changed)
@@ -0,0 +1,199 @@
+"""
+Knowledge Base View Tracking
+
+Article views are buffered in memory and written in batches so that
+reading an article is a read-only request. Hits are grouped by
+(article_id, user_id). A background thread flushes the buffer every
+KB_VIEW_FLUSH_INTERVAL seconds, or sooner once KB_VIEW_FLUSH_THRESHOLD
+hits are pending, and the buffer is flushed once more at shutdown.
+The buffer is module-level: binding it to another app (each create_app()
+call) flushes it to the previous app and stops that app's flusher thread.
+A flush that fails puts its views back in the buffer for the next one;
+beyond KB_VIEW_MAX_PENDING buffered views the oldest are dropped.
+
+Each flush performs one bulk INSERT into article_view and one
+``UPDATE article SET view_count = view_count + n`` per article. The same
+UPDATE stores the new popularity score. That score is kept in log space
+(see Article.add_popularity), so it is computed in Python from the
+current scores, which are read with SELECT ... FOR UPDATE.
+"""
+
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime
+from app import db
+from app.models import Article, ArticleView
+
+logger = logging.getLogger(__name__)
+
+
+class ArticleViewBuffer:
+    """Process-local buffer of article views awaiting a batched write"""
+
+    def __init__(self, flush_interval=30, flush_threshold=500, max_pending=50000):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.max_pending = max_pending
+        self.app = None
+        self._pending = defaultdict(list)  # (article_id, user_id) -> [viewed_at, ...]
+        self._pending_total = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._atexit_registered = False
+
+    def init_app(self, app):
+        """Bind the buffer to an app and flush any remaining views at exit"""
+        if self.app is not None:
+            self.flush()
+            self._stop_thread()
+        self.app = app
+        self.flush_interval = app.config.get('KB_VIEW_FLUSH_INTERVAL', self.flush_interval)
+        self.flush_threshold = app.config.get('KB_VIEW_FLUSH_THRESHOLD', self.flush_threshold)
+        self.max_pending = app.config.get('KB_VIEW_MAX_PENDING', self.max_pending)
+        if not self._atexit_registered:
+            atexit.register(self.flush)
+            self._atexit_registered = True
+
+    def record(self, article_id, user_id):
+        """Record a single article view without touching the database"""
+        with self._lock:
+            self._pending[(article_id, user_id)].append(datetime.utcnow())
+            self._pending_total += 1
+            should_wake = self._pending_total >= self.flush_threshold
+
+        self._ensure_thread()
+        if should_wake:
+            self._wake.set()
+
+    def pending_views(self, article_id):
+        """Number of buffered (not yet flushed) views for an article"""
+        with self._lock:
+            return sum(len(hits) for (aid, _), hits in self._pending.items() if aid == article_id)
+
+    def flush(self):
+        """
+        Write all buffered views to the database.
+
+        On failure the views are requeued, so the next flush retries them.
+
+        Returns:
+            int: Number of views written
+        """
+        if self.app is None:
+            return 0
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(list)
+                self._pending_total = 0
+
+            if not pending:
+                return 0
+
+            with self.app.app_context():
+                try:
+                    return self._write(pending)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Error flushing article views: {e}", exc_info=True)
+                    self._requeue(pending)
+                    return 0
+                finally:
+                    db.session.remove()
+
+    def _requeue(self, pending):
+        """Merge the views of a failed flush back into the buffer, keeping at most max_pending"""
+        with self._lock:
+            room = max(self.max_pending - self._pending_total, 0)
+            hits = sorted(
+                (viewed_at, key) for key, key_hits in pending.items() for viewed_at in key_hits
+            )
+            dropped = len(hits) - room
+            if dropped > 0:
+                hits = hits[dropped:]  # Keep the newest
+                logger.warning(f"Article view buffer full, dropped {dropped} views")
+
+            requeued = defaultdict(list)
+            for viewed_at, key in hits:
+                requeued[key].append(viewed_at)
+            for key, key_hits in requeued.items():
+                self._pending[key][:0] = key_hits  # Older than anything recorded since the swap
+            self._pending_total += len(hits)
+
+    def _write(self, pending):
+        article_ids = {article_id for article_id, _ in pending}
+
+        # Skip views for articles deleted since they were read; lock the scores being updated
+        scores = dict(
+            db.session.query(Article.id, Article.popularity_score)
+            .filter(Article.id.in_(article_ids))
+            .order_by(Article.id)  # Same lock order in every process
+            .with_for_update()
+            .all()
+        )
+
+        rows = []
+        per_article = defaultdict(list)
+        for (article_id, user_id), hits in pending.items():
+            if article_id not in scores:
+                continue
+            per_article[article_id].extend(hits)
+            rows.extend(
+                {'article_id': article_id, 'user_id': user_id, 'viewed_at': viewed_at}
+                for viewed_at in hits
+            )
+
+        if not rows:
+            return 0
+
+        db.session.execute(db.insert(ArticleView), rows)
+
+        for article_id, hits in per_article.items():
+            db.session.execute(
+                db.update(Article)
+                .where(Article.id == article_id)
+                .values(
+                    view_count=db.func.coalesce(Article.view_count, 0) + len(hits),
+                    popularity_score=Article.add_popularity(scores[article_id] or 0, hits),
+                    updated_at=Article.updated_at  # Views aren't edits; skip the onupdate timestamp
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+        db.session.commit()
+        logger.debug(f"Flushed {len(rows)} article views across {len(per_article)} articles")
+        return len(rows)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, args=(self._stop,), name='kb-view-flusher', daemon=True)
+            self._thread.start()
+
+    def _stop_thread(self):
+        """Stop the flusher thread; the next record() starts a new one"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            stop, self._stop = self._stop, threading.Event()
+        stop.set()
+        if thread is not None:
+            self._wake.set()
+            thread.join(timeout=5)
+
+    def _run(self, stop):
+        while not stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if not stop.is_set():
+                self.flush()
+
+
+article_view_buffer = ArticleViewBuffer()
@@ -0,0 +1,203 @@
+"""
+Shared Image Store
+
+Uploaded images (knowledge base articles, company updates) are stored by
+the SHA-256 of their content, so uploading the same image twice reuses
+the existing file. Layout under MEDIA_FOLDER:
+
+    <digest[:2]>/<digest>/original.<ext>
+    <digest[:2]>/<digest>/thumb.jpg, thumb.webp
+    <digest[:2]>/<digest>/medium.jpg, medium.webp
+
+Resized variants are generated on a background worker pool after the
+upload request returns. Until a variant exists the original is served in
+its place. Because a URL always maps to the same content, variants are
+served with long-lived immutable cache headers (see blueprints/media.py).
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import url_for
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Bounding boxes for derived variants; 'medium' matches the old company update resize
+VARIANT_SIZES = {
+    'thumb': (200, 200),
+    'medium': (800, 600),
+}
+SIZES = ('original',) + tuple(VARIANT_SIZES)
+
+# PIL format -> stored file extension
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+MIMETYPES = {'jpg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif', 'webp': 'image/webp'}
+
+
+class MediaStore:
+    """Content-addressed image storage with background variant generation"""
+
+    def __init__(self, workers=2):
+        self.root = None
+        self.workers = workers
+        self._executor = None
+        self._in_progress = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.root = app.config.get('MEDIA_FOLDER') or os.path.join(app.static_folder, 'uploads', 'media')
+        self.workers = app.config.get('MEDIA_WORKERS', self.workers)
+
+    # ==================== STORING ====================
+
+    def save(self, file_storage, max_bytes):
+        """
+        Store an uploaded image and queue its variants.
+
+        Args:
+            file_storage: Uploaded file (werkzeug FileStorage)
+            max_bytes (int): Maximum accepted file size
+
+        Returns:
+            str: Content digest identifying the image
+
+        Raises:
+            ValueError: If the file is too large or is not a supported image
+        """
+        data = file_storage.read(max_bytes + 1)
+        if len(data) > max_bytes:
+            raise ValueError(f'File too large. Maximum size is {max_bytes // (1024 * 1024)}MB')
+
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                image_format = img.format
+                img.verify()
+        except Exception:
+            raise ValueError('File is not a valid image')
+
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError('Unsupported image format')
+
+        digest = hashlib.sha256(data).hexdigest()
+        original = self._original_path(digest)
+
+        if original is None:
+            original = os.path.join(self._dir(digest), f'original.{IMAGE_FORMATS[image_format]}')
+            os.makedirs(self._dir(digest), exist_ok=True)
+            _atomic_write(original, data)
+        else:
+            logger.debug(f"Image {digest[:12]} already stored, reusing")
+
+        self._schedule(digest, original)
+        return digest
+
+    def urls(self, digest):
+        """URLs for every size of a stored image"""
+        return {size: url_for('media.serve_image', digest=digest, size=size) for size in SIZES}
+
+    # ==================== SERVING ====================
+
+    def resolve(self, digest, size, accept_webp=False):
+        """
+        Find the file to serve for a requested size.
+
+        Returns:
+            tuple: (path, mimetype, is_final) or None if the image doesn't exist.
+                   is_final is False when the original stands in for a variant
+                   that hasn't been generated yet.
+        """
+        original = self._original_path(digest)
+        if original is None:
+            return None
+
+        ext = original.rsplit('.', 1)[1]
+        if size == 'original' or ext == 'gif':
+            # Animated GIFs are always served as uploaded
+            return original, MIMETYPES[ext], True
+
+        formats = ('webp', 'jpg') if accept_webp else ('jpg',)
+        for variant_ext in formats:
+            path = os.path.join(self._dir(digest), f'{size}.{variant_ext}')
+            if os.path.exists(path):
+                return path, MIMETYPES[variant_ext], True
+
+        # Variant missing (still queued, or lost by a restart mid-job)
+        self._schedule(digest, original)
+        return original, MIMETYPES[ext], False
+
+    # ==================== VARIANTS ====================
+
+    def _schedule(self, digest, original):
+        if original.endswith('.gif') or self._variants_complete(digest):
+            return
+
+        with self._lock:
+            if digest in self._in_progress:
+                return
+            self._in_progress.add(digest)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='media')
+
+        self._executor.submit(self._generate_variants, digest, original)
+
+    def _generate_variants(self, digest, original):
+        try:
+            with Image.open(original) as img:
+                img.load()
+                for size, box in VARIANT_SIZES.items():
+                    variant = img.copy()
+                    variant.thumbnail(box, Image.Resampling.LANCZOS)
+                    base = os.path.join(self._dir(digest), size)
+
+                    webp = io.BytesIO()
+                    variant.save(webp, 'WEBP', quality=80, method=4)
+                    _atomic_write(f'{base}.webp', webp.getvalue())
+
+                    if variant.mode in ('RGBA', 'LA', 'P'):
+                        variant = variant.convert('RGB')
+                    jpeg = io.BytesIO()
+                    variant.save(jpeg, 'JPEG', quality=85, optimize=True)
+                    _atomic_write(f'{base}.jpg', jpeg.getvalue())
+
+            logger.debug(f"Generated variants for image {digest[:12]}")
+        except Exception as e:
+            logger.error(f"Error generating variants for image {digest[:12]}: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._in_progress.discard(digest)
+
+    def _variants_complete(self, digest):
+        directory = self._dir(digest)
+        return all(
+            os.path.exists(os.path.join(directory, f'{size}.{ext}'))
+            for size in VARIANT_SIZES for ext in ('jpg', 'webp')
+        )
+
+    # ==================== PATHS ====================
+
+    def _dir(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _original_path(self, digest):
+        directory = self._dir(digest)
+        for ext in IMAGE_FORMATS.values():
+            path = os.path.join(directory, f'original.{ext}')
+            if os.path.exists(path):
+                return path
+        return None
+
+
+def _atomic_write(path, data):
+    """Write via a temporary file so readers never see a partial image"""
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+media_store = MediaStore()
@@ -1,8 +1,12 @@
 from app import db, login_manager
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.ext.hybrid import hybrid_method
+from sqlalchemy.orm import validates
 from datetime import datetime
+import json
 import logging
+import math
 
 logger = logging.getLogger(__name__)
 
@@ -250,23 +254,19 @@ class Customer(db.Model):
         db.Index('idx_customer_name', 'name'),
     )
 
+    def _address_list(self):
+        # Use the relationship when it was eager-loaded (or not saved yet), else the per-request address lookup
+        if 'addresses' in self.__dict__ or self.id is None:
+            return self.addresses
+        from app.address_lookup import addresses_for
+        return addresses_for(self.id)
+
     def to_dict(self):
         """Convert customer to dictionary with addresses"""
+        from app.address_lookup import address_dicts
+
         # Get addresses or create default from legacy address field
-        addresses_list = []
-        if self.addresses:
-            addresses_list = [addr.to_dict() for addr in self.addresses]
-        elif self.address:
-            # Backward compatibility: convert old single address to new format
-            addresses_list = [{
-                'id': None,
-                'label': 'Primary',
-                'phone': '',
-                'street': self.address,
-                'city': '',
-                'zip': '',
-                'is_primary': True
-            }]
+        addresses_list = address_dicts(self._address_list(), legacy_street=self.address)
         
         return {
             'id': self.id,
@@ -283,23 +283,13 @@ class Customer(db.Model):
     
     def get_primary_address(self):
         """Get the primary address or the first address"""
-        if not self.addresses:
-            return None
-        
-        # Try to find primary address
-        for addr in self.addresses:
-            if addr.is_primary:
-                return addr
-        
-        # Return first address if no primary is set
-        return self.addresses[0] if self.addresses else None
+        from app.address_lookup import pick_primary
+        return pick_primary(self._address_list())
     
     def get_address_by_label(self, label):
         """Get address by its label"""
-        for addr in self.addresses:
-            if addr.label == label:
-                return addr
-        return None
+        from app.address_lookup import pick_label
+        return pick_label(self._address_list(), label)
 
 class CustomerAddress(db.Model):
     """Model for customer addresses - allows multiple addresses per customer"""
@@ -314,6 +304,10 @@ class CustomerAddress(db.Model):
     zip = db.Column(db.String(20))  # Postcode
     is_primary = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('customer_id', 'label', name='uq_customer_address_label'),
+    )
     
     def to_dict(self):
         return {
@@ -337,6 +331,14 @@ class Product(db.Model):
         db.Index('idx_product_name', 'name'),
     )
 
+# Words of each product name, for prefix search (see app/product_search.py)
+product_name_token = db.Table(
+    'product_name_token',
+    db.Column('token', db.String(100), primary_key=True),
+    db.Column('product_id', db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('idx_product_name_token_product', 'product_id'),
+)
+
 class Callsheet(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)  
@@ -470,6 +472,10 @@ class Form(db.Model):
     completed_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     is_archived = db.Column(db.Boolean, default=False)
     
+    # Customer fields copied out of the JSON data so they can be searched in SQL
+    customer_account = db.Column(db.String(50))
+    customer_name = db.Column(db.String(100))
+    
     # Define the completer relationship separately
     completer = db.relationship('User', foreign_keys=[completed_by], backref='completed_forms')
 
@@ -477,8 +483,18 @@ class Form(db.Model):
         db.Index('idx_form_user_date', 'user_id', 'date_created'),
         db.Index('idx_form_status', 'is_completed', 'is_archived'),
         db.Index('idx_form_type', 'type'),
+        db.Index('idx_form_customer_account', 'customer_account'),
+        db.Index('idx_form_customer_name', 'customer_name'),
     )
 
+    @staticmethod
+    def customer_fields(form_data):
+        """Extract the indexed customer columns from a form data dict"""
+        return {
+            'customer_account': (form_data.get('customer_account') or '')[:50] or None,
+            'customer_name': (form_data.get('customer_name') or '')[:100] or None
+        }
+
 class CustomerStock(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
@@ -486,6 +502,8 @@ class CustomerStock(db.Model):
     product_name = db.Column(db.String(100), nullable=False)
     current_stock = db.Column(db.Integer, nullable=False, default=0)
     reorder_level = db.Column(db.Integer, default=5)  # Alert when stock gets low
+    # current_stock <= reorder_level, kept in step by app/stock_ledger.py so alerts are an indexed count
+    is_low_stock = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -493,16 +511,24 @@ class CustomerStock(db.Model):
     customer = db.relationship('Customer', backref=db.backref('stock_items', lazy=True))
     transactions = db.relationship('StockTransaction', backref='stock_item', lazy=True, cascade='all, delete-orphan')
     
+    __table_args__ = (
+        db.Index('idx_customer_stock_product', 'product_name', 'id'),
+        db.Index('idx_customer_stock_customer_product', 'customer_id', 'product_name', 'id'),
+        db.Index('idx_customer_stock_low', 'is_low_stock', 'product_name', 'id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
             'customer_id': self.customer_id,
+            'customer_account': self.customer.account_number,
             'customer_name': self.customer.name,
             'product_code': self.product_code,
             'product_name': self.product_name,
             'current_stock': self.current_stock,
             'reorder_level': self.reorder_level,
-            'is_low_stock': self.current_stock <= self.reorder_level
+            'is_low_stock': self.current_stock <= (self.reorder_level or 0),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
 class StockTransaction(db.Model):
@@ -514,10 +540,15 @@ class StockTransaction(db.Model):
     notes = db.Column(db.Text)
     transaction_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    balance_after = db.Column(db.Integer)  # Item's current_stock right after this movement
     
     # Relationships
     user = db.relationship('User', backref='stock_transactions')
     
+    __table_args__ = (
+        db.Index('idx_stock_transaction_item_date', 'stock_item_id', 'transaction_date', 'id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -526,15 +557,16 @@ class StockTransaction(db.Model):
             'reference': self.reference,
             'notes': self.notes,
             'transaction_date': self.transaction_date.isoformat(),
-            'created_by': self.user.username
+            'created_by': self.user.username,
+            'balance_after': self.balance_after
         }
 
 class StandingOrder(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
     
-    # Weekly delivery schedule (store as comma-separated day numbers: 0=Monday, 6=Sunday)
-    delivery_days = db.Column(db.String(20), nullable=False)  # e.g., "0,3" for Monday & Thursday
+    # Weekly delivery schedule as a bitmask: bit d set means delivery on day d (0=Monday, 6=Sunday)
+    delivery_mask = db.Column(db.Integer, nullable=False, default=0)  # e.g., 0b1001 (9) for Monday & Thursday
     
     start_date = db.Column(db.Date, nullable=False)
     end_date = db.Column(db.Date, nullable=True)  # Null means ongoing
@@ -559,20 +591,50 @@ class StandingOrder(db.Model):
     items = db.relationship('StandingOrderItem', backref='standing_order', cascade='all, delete-orphan')
     schedules = db.relationship('StandingOrderSchedule', backref='standing_order', cascade='all, delete-orphan')
     logs = db.relationship('StandingOrderLog', backref='standing_order', cascade='all, delete-orphan')
-    
-    
+
+    # Only status is indexed: delivers_on() tests a bit of delivery_mask, which a btree index can't serve
+    __table_args__ = (
+        db.Index('idx_standing_order_status', 'status'),
+    )
+
+    @staticmethod
+    def days_to_mask(days):
+        """Convert a list of day numbers to a delivery bitmask"""
+        mask = 0
+        for d in days:
+            mask |= 1 << int(d)
+        return mask
+
+    @staticmethod
+    def mask_to_days(mask):
+        """Convert a delivery bitmask to a sorted list of day numbers"""
+        return [d for d in range(7) if mask and mask & (1 << d)]
+
+    @property
+    def delivery_days(self):
+        """Comma-separated day numbers, kept for backward compatibility (e.g. "0,3")"""
+        return ','.join(str(d) for d in self.mask_to_days(self.delivery_mask))
+
+    @delivery_days.setter
+    def delivery_days(self, value):
+        """Accept either a comma-separated string or a list of day numbers"""
+        if isinstance(value, str):
+            value = [d for d in value.split(',') if d.strip()]
+        self.delivery_mask = self.days_to_mask(value or [])
+
+    @hybrid_method
+    def delivers_on(self, day):
+        """True if the order delivers on the given day number"""
+        return bool(self.delivery_mask & (1 << day))
+
+    @delivers_on.expression
+    def delivers_on(cls, day):
+        """SQL predicate: delivery_mask & (1 << day) != 0"""
+        return cls.delivery_mask.op('&')(1 << day) != 0
 
     def get_delivery_days_list(self):
         """Return list of day numbers (weekdays only)"""
-        if not self.delivery_days:
-            return []
-        
-        try:
-            days = [int(d) for d in self.delivery_days.split(',')]
-            # Filter using WEEKDAYS constant
-            return [d for d in days if d in self.WEEKDAYS]
-        except (ValueError, AttributeError):
-            return []
+        return [d for d in self.mask_to_days(self.delivery_mask) if d in self.WEEKDAYS]
     
     def get_delivery_days_names(self):
         """Return readable day names (weekdays only)"""
@@ -706,6 +768,33 @@ class ClearanceStock(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+class ClearanceSale(db.Model):
+    """One sale off a clearance line (append-only; sold-quantity reports aggregate this)"""
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('clearance_stock.id', ondelete='SET NULL'), nullable=True)
+    pallet = db.Column(db.String(50))  # Copied from the item so reports survive edits and deletes
+    qty = db.Column(db.Integer, nullable=False)
+    unit_cost = db.Column(db.Float, nullable=False)
+    sold_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sold_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_clearance_sale_sold_at', 'sold_at'),
+        db.Index('idx_clearance_sale_item', 'item_id', 'sold_at'),
+        db.Index('idx_clearance_sale_pallet', 'pallet', 'sold_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'item_id': self.item_id,
+            'pallet': self.pallet,
+            'qty': self.qty,
+            'unit_cost': self.unit_cost,
+            'sold_at': self.sold_at.isoformat(),
+            'sold_by': self.sold_by
+        }
+
 # ============================================================================
 # Knowledge Base Models
 # ============================================================================
@@ -716,26 +805,69 @@ class Supplier(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, unique=True)
+    category = db.Column(db.String(100))
+    description = db.Column(db.Text)
+    contact_name = db.Column(db.String(100))
+    phone = db.Column(db.String(50))
+    email = db.Column(db.String(120))
     website = db.Column(db.String(200))
+    address = db.Column(db.Text)
     contact_info = db.Column(db.Text)
     notes = db.Column(db.Text)
+    search_text = db.Column(db.Text)  # Lower-cased name and contact fields, see app/kb_supplier_directory.py
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
     articles = db.relationship('Article', backref='supplier', lazy=True)
+    article_summary = db.relationship('SupplierArticleSummary', uselist=False, lazy='joined',
+                                      cascade='all, delete-orphan')
 
     def to_dict(self):
         return {
             'id': self.id,
             'name': self.name,
+            'category': self.category,
+            'description': self.description,
+            'contact_name': self.contact_name,
+            'phone': self.phone,
+            'email': self.email,
             'website': self.website,
+            'address': self.address,
             'contact_info': self.contact_info,
             'notes': self.notes,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+class SupplierArticleSummary(db.Model):
+    """Precomputed published-article roll-up per supplier (see app/kb_supplier_directory.py)"""
+    __tablename__ = 'supplier_article_summary'
+
+    supplier_id = db.Column(db.Integer, db.ForeignKey('supplier.id', ondelete='CASCADE'), primary_key=True)
+    article_count = db.Column(db.Integer, nullable=False, default=0)
+    latest_article_id = db.Column(db.Integer, db.ForeignKey('article.id', ondelete='SET NULL'))
+    latest_article_title = db.Column(db.String(200))
+    latest_published_at = db.Column(db.DateTime)
+    category_counts = db.Column(db.Text)  # JSON object of category ID -> published article count
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def get_category_counts(self):
+        """Category ID -> published article count"""
+        try:
+            return {int(k): v for k, v in json.loads(self.category_counts or '{}').items()}
+        except (ValueError, TypeError):
+            return {}
+
+    def to_dict(self):
+        return {
+            'article_count': self.article_count,
+            'latest_article_id': self.latest_article_id,
+            'latest_article_title': self.latest_article_title,
+            'latest_published_at': self.latest_published_at.isoformat() if self.latest_published_at else None,
+            'category_counts': self.get_category_counts()
+        }
+
 class Category(db.Model):
     """Category model for knowledge base articles"""
     __tablename__ = 'category'
@@ -758,6 +890,79 @@ class Category(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+# Association between articles and normalized tags
+article_tag = db.Table(
+    'article_tag',
+    db.Column('article_id', db.Integer, db.ForeignKey('article.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('idx_article_tag_tag', 'tag_id', 'article_id'),
+)
+
+class Tag(db.Model):
+    """Normalized knowledge base tag (lower-case, single-spaced)"""
+    __tablename__ = 'tag'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+
+    @staticmethod
+    def normalize(name):
+        """Canonical form of a tag name: trimmed, single-spaced, lower-case"""
+        return ' '.join((name or '').split()).lower()[:50]
+
+    @staticmethod
+    def parse(tags_string):
+        """Split a comma-separated tag string into unique normalized names, preserving order"""
+        names = []
+        for part in (tags_string or '').split(','):
+            name = Tag.normalize(part)
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    @classmethod
+    def get_or_create(cls, names):
+        """
+        Fetch tags by normalized name, creating any that don't exist yet.
+
+        Args:
+            names: List of normalized tag names
+
+        Returns:
+            list: Tag objects in the same order as names
+        """
+        if not names:
+            return []
+
+        with db.session.no_autoflush:
+            existing = {tag.name: tag for tag in cls.query.filter(cls.name.in_(names)).all()}
+            # Tags created earlier in this transaction but not flushed yet
+            for obj in db.session.new:
+                if isinstance(obj, cls) and obj.name in names:
+                    existing.setdefault(obj.name, obj)
+
+        tags = []
+        for name in names:
+            tag = existing.get(name)
+            if tag is None:
+                # Add right away so later lookups in this transaction find it in session.new
+                tag = cls(name=name)
+                db.session.add(tag)
+            tags.append(tag)
+        return tags
+
+    @classmethod
+    def article_ids_with_all(cls, names):
+        """Subquery of article IDs tagged with every one of the given names"""
+        return db.select(article_tag.c.article_id)\
+            .join(cls, cls.id == article_tag.c.tag_id)\
+            .where(cls.name.in_(names))\
+            .group_by(article_tag.c.article_id)\
+            .having(db.func.count(article_tag.c.tag_id) == len(names))
+
+    def __repr__(self):
+        return f'<Tag {self.name}>'
+
 class Article(db.Model):
     """Knowledge base article model"""
     __tablename__ = 'article'
@@ -766,10 +971,15 @@ class Article(db.Model):
     title = db.Column(db.String(200), nullable=False)
     body = db.Column(db.Text, nullable=False)
 
+    # Render cache, recomputed whenever body changes (see app/kb_render.py)
+    body_html = db.Column(db.Text)  # Sanitized body for display
+    excerpt = db.Column(db.String(300))  # Plain-text summary for list views
+    content_hash = db.Column(db.String(64))  # SHA-256 of body
+
     # Categorization
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=True)
     supplier_id = db.Column(db.Integer, db.ForeignKey('supplier.id'), nullable=True)
-    tags = db.Column(db.String(500))  # Comma-separated tags
+    tags = db.Column(db.String(500))  # Comma-separated tags, mirrored into tag_objects
 
     # Status workflow
     status = db.Column(db.String(20), default='draft')  # draft, pending, published
@@ -777,6 +987,7 @@ class Article(db.Model):
     # Metadata
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     view_count = db.Column(db.Integer, default=0)
+    popularity_score = db.Column(db.Float, nullable=False, default=0.0)  # log2 of time-decayed views, see add_popularity()
     attachments = db.Column(db.Text)  # JSON string for file paths
 
     # Timestamps
@@ -786,13 +997,70 @@ class Article(db.Model):
     # Relationships
     author = db.relationship('User', backref='articles')
     views = db.relationship('ArticleView', backref='article', lazy=True, cascade='all, delete-orphan')
+    tag_objects = db.relationship('Tag', secondary=article_tag, backref=db.backref('articles', lazy='dynamic'))
 
     __table_args__ = (
         db.Index('idx_article_status', 'status'),
         db.Index('idx_article_category', 'category_id'),
         db.Index('idx_article_author', 'author_id'),
+        db.Index('idx_article_status_popularity', 'status', 'popularity_score'),
+        db.Index('idx_article_status_category', 'status', 'category_id'),
+        db.Index('idx_article_status_supplier', 'status', 'supplier_id'),
+        db.Index('idx_article_created', 'created_at', 'id'),
+        db.Index('idx_article_status_created', 'status', 'created_at', 'id'),
     )
 
+    # Popularity uses forward exponential decay: each view has weight
+    # 2 ** ((viewed_at - POPULARITY_EPOCH) / half-life), so newer views weigh
+    # more and ordering by the total ranks articles by decayed view count
+    # without ever rewriting old scores. The weights grow without bound, so
+    # popularity_score stores log2(1 + sum of weights) and views are added
+    # with log-sum-exp. The stored value grows by only 1 per half-life.
+    POPULARITY_EPOCH = datetime(2025, 1, 1)
+    POPULARITY_HALF_LIFE_DAYS = 7
+
+    @classmethod
+    def popularity_log_weight(cls, when):
+        """log2 of the weight of a single view at the given time"""
+        elapsed_days = (when - cls.POPULARITY_EPOCH).total_seconds() / 86400
+        return elapsed_days / cls.POPULARITY_HALF_LIFE_DAYS
+
+    @classmethod
+    def add_popularity(cls, score, view_times):
+        """popularity_score after adding views at view_times to score (log2 space)"""
+        exponents = [score] + [cls.popularity_log_weight(when) for when in view_times]
+        top = max(exponents)
+        return top + math.log2(sum(2 ** (exponent - top) for exponent in exponents))
+
+    @property
+    def trending_score(self):
+        """Decayed view count as of now (views in the last half-life count ~1, older ones less)"""
+        now = self.popularity_log_weight(datetime.utcnow())
+        return max(2 ** ((self.popularity_score or 0) - now) - 2 ** -now, 0.0)
+
+    @validates('tags')
+    def _sync_tag_objects(self, key, value):
+        """Keep the normalized tag association in step with the tags string"""
+        self.tag_objects = Tag.get_or_create(Tag.parse(value))
+        return value
+
+    @classmethod
+    def published_counts_by(cls, column):
+        """
+        Count published articles per value of a grouping column in one query.
+
+        Args:
+            column: Article column to group by (e.g. Article.category_id)
+
+        Returns:
+            dict: Mapping of column value to published article count
+        """
+        rows = db.session.query(column, db.func.count(cls.id))\
+            .filter(cls.status == 'published', column.isnot(None))\
+            .group_by(column)\
+            .all()
+        return dict(rows)
+
     def to_dict(self, include_body=True):
         data = {
             'id': self.id,
@@ -802,10 +1070,12 @@ class Article(db.Model):
             'supplier_id': self.supplier_id,
             'supplier_name': self.supplier.name if self.supplier else None,
             'tags': self.tags,
+            'excerpt': self.excerpt,
             'status': self.status,
             'author_id': self.author_id,
             'author_name': self.author.full_name if self.author else None,
             'view_count': self.view_count,
+            'trending_score': round(self.trending_score, 2),
             'attachments': self.attachments,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
@@ -813,6 +1083,7 @@ class Article(db.Model):
 
         if include_body:
             data['body'] = self.body
+            data['body_html'] = self.body_html
 
         return data
 
@@ -831,4 +1102,18 @@ class ArticleView(db.Model):
     __table_args__ = (
         db.Index('idx_article_view_article', 'article_id'),
         db.Index('idx_article_view_user', 'user_id'),
-    )
\ No newline at end of file
+    )
+
+
+class RelatedArticle(db.Model):
+    """Precomputed related-article neighbours (see app/kb_related.py)"""
+    __tablename__ = 'related_article'
+
+    article_id = db.Column(db.Integer, db.ForeignKey('article.id', ondelete='CASCADE'), primary_key=True)
+    related_id = db.Column(db.Integer, db.ForeignKey('article.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_related_article_score', 'article_id', 'score'),
+        db.Index('idx_related_article_related', 'related_id'),
+    )
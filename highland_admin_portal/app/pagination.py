@@ -0,0 +1,142 @@
+"""
+Keyset (Cursor) Pagination
+
+Pages are fetched with ``WHERE (sort_key, id) > (last_sort_key, last_id)``
+instead of OFFSET, so every page costs the same as the first and no
+COUNT(*) is needed to know whether more rows exist. The position of the
+last row is handed to clients as an opaque, URL-safe cursor token.
+
+Totals are opt-in and approximate: PostgreSQL's planner estimate, or on
+other databases an exact count capped at APPROX_COUNT_CAP.
+"""
+
+import base64
+import json
+import logging
+from datetime import datetime, date
+from app import db
+
+logger = logging.getLogger(__name__)
+
+APPROX_COUNT_CAP = 10000
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token can't be decoded"""
+
+
+# ==================== CURSORS ====================
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+    return value
+
+
+def encode_cursor(sort_value, row_id):
+    """Build an opaque cursor token for the position after a row"""
+    payload = json.dumps([_encode_value(sort_value), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Decode a cursor token.
+
+    Returns:
+        tuple: (sort_value, row_id)
+
+    Raises:
+        InvalidCursor: If the token is malformed
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(row_id, int):
+            raise ValueError('cursor id must be an integer')
+        return _decode_value(sort_value), row_id
+    except Exception as e:
+        raise InvalidCursor(f'Invalid cursor: {e}')
+
+
+# ==================== PAGINATION ====================
+
+def keyset_paginate(query, sort_column, id_column, cursor=None, limit=50, descending=False):
+    """
+    Fetch one page of a query ordered by (sort_column, id_column).
+
+    The sort column must be non-nullable; id_column breaks ties so the
+    ordering is total. A composite index on (sort_column, id_column), or
+    an index on sort_column alone, keeps each page an index range scan.
+
+    Args:
+        query: SQLAlchemy query without ORDER BY/LIMIT
+        sort_column: Column the page is ordered by
+        id_column: Unique tie-breaker column (usually the primary key)
+        cursor (str): Token returned as next_cursor by the previous page
+        limit (int): Page size
+        descending (bool): Order newest/highest first
+
+    Returns:
+        tuple: (items, next_cursor) where next_cursor is None on the last page
+
+    Raises:
+        InvalidCursor: If the cursor token is malformed
+    """
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        position = db.tuple_(sort_column, id_column)
+        query = query.filter(position < (sort_value, row_id) if descending else position > (sort_value, row_id))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    rows = query.limit(limit + 1).all()
+    items = rows[:limit]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+
+    return items, next_cursor
+
+
+def approximate_count(query):
+    """
+    Cheap row count for a query.
+
+    Returns:
+        tuple: (count, is_exact)
+    """
+    statement = query.order_by(None).statement
+
+    if db.engine.dialect.name == 'postgresql':
+        try:
+            compiled = statement.compile(dialect=db.engine.dialect)
+            with db.session.begin_nested():  # A failed EXPLAIN must not abort the outer transaction
+                plan = db.session.connection().exec_driver_sql(
+                    'EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params
+                ).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows']), False
+        except Exception as e:
+            logger.warning(f"Falling back to capped count, planner estimate failed: {e}")
+
+    capped = statement.limit(APPROX_COUNT_CAP + 1).subquery()
+    count = db.session.execute(db.select(db.func.count()).select_from(capped)).scalar()
+    return min(count, APPROX_COUNT_CAP), count <= APPROX_COUNT_CAP
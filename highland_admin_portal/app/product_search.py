@@ -0,0 +1,282 @@
+"""
+Product Catalogue Search
+
+Product pickers call /api/products/search on every keystroke. A query is
+answered in stages, stopping once `limit` products are found:
+1. Product codes equal to or starting with the query: an index range scan
+   on idx_product_code (codes are tried as typed and upper-cased)
+2. Products whose name has a word starting with each query word, looked
+   up in the product_name_token table (token, product_id). The longest
+   word drives a range scan in token order that keeps each product's
+   first matching word only, so the lookup stops after `limit` distinct
+   products instead of sorting every match; names matching the word
+   exactly come first.
+3. Substring matches on code, name and description through the trigram
+   search index (see app/search_index.py). The index lookup is capped at
+   the remaining count, so this stage returns the first matches found,
+   sorted by name, rather than the alphabetically first matches.
+
+Prefixes are matched as ranges [prefix, prefix + RANGE_END), which only
+holds under a byte-wise collation. SQLite compares text byte-wise by
+default; on PostgreSQL the comparisons use COLLATE "C", served by the
+*_collate_c indexes created below.
+
+Results of hot queries are kept in a small in-process cache for
+PRODUCT_SEARCH_CACHE_TTL seconds. The cache is cleared whenever this
+process commits a product change. Other processes see the change once
+their cached entry expires.
+"""
+
+import logging
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+import click
+from sqlalchemy import event, inspect, DDL
+from app import db, search_index
+from app.models import Product, product_name_token
+
+logger = logging.getLogger(__name__)
+
+MAX_TOKEN_LENGTH = 100
+MAX_QUERY_WORDS = 5
+RANGE_END = '\U0010ffff'  # Sorts after any character, so [p, p + RANGE_END) covers every string starting with p
+
+
+def tokenize(name):
+    """Distinct lower-case words of a product name"""
+    return list(dict.fromkeys(w[:MAX_TOKEN_LENGTH] for w in re.findall(r'[a-z0-9]+', (name or '').lower())))
+
+
+# PostgreSQL indexes for byte-wise prefix ranges (the default collation may ignore RANGE_END)
+POSTGRES_CREATE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_product_code_collate_c ON product (code COLLATE "C", id)',
+    'CREATE INDEX IF NOT EXISTS idx_product_name_token_collate_c ON product_name_token (token COLLATE "C", product_id)',
+]
+
+event.listen(Product.__table__, 'after_create',
+             DDL(POSTGRES_CREATE_INDEXES[0]).execute_if(dialect='postgresql'))
+event.listen(product_name_token, 'after_create',
+             DDL(POSTGRES_CREATE_INDEXES[1]).execute_if(dialect='postgresql'))
+
+
+def _bytewise(column):
+    """The column under a byte-wise collation (already the default on SQLite)"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return column.collate('C')
+    return column
+
+
+def _prefix_range(column, prefix):
+    """Indexable `column LIKE 'prefix%'` (case-sensitive)"""
+    column = _bytewise(column)
+    return db.and_(column >= prefix, column < prefix + RANGE_END)
+
+
+class ProductSearchService:
+    """Staged product lookup with a TTL cache of recent results"""
+
+    def __init__(self, cache_ttl=30, cache_size=512):
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # (query, limit) -> (expires_at, results)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.cache_ttl = app.config.get('PRODUCT_SEARCH_CACHE_TTL', self.cache_ttl)
+        self.cache_size = app.config.get('PRODUCT_SEARCH_CACHE_SIZE', self.cache_size)
+
+        @app.cli.command('benchmark-product-search')
+        @click.option('--queries', default=500, help='Number of sample queries to time')
+        def benchmark_product_search_command(queries):
+            """Time product searches against the current catalogue."""
+            self.benchmark(queries)
+
+    # ==================== SEARCH ====================
+
+    def search(self, query, limit=20):
+        """
+        Products matching a picker query, best matches first.
+
+        Returns:
+            list: Dicts with id, code and name
+        """
+        query = (query or '').strip()
+        if not query:
+            return []
+
+        key = (query, limit)  # Case-sensitive: stage 1 tries the code prefix as typed
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > now:
+                self._cache.move_to_end(key)
+                return cached[1]
+
+        results = self._search(query, limit)
+
+        if self.cache_ttl > 0 and self.cache_size > 0:
+            with self._lock:
+                self._cache[key] = (now + self.cache_ttl, results)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return results
+
+    def _search(self, query, limit):
+        found = OrderedDict()
+
+        def add(products):
+            for product in products:
+                if len(found) >= limit:
+                    break
+                found.setdefault(product.id, {'id': product.id, 'code': product.code, 'name': product.name})
+
+        columns = (Product.id, Product.code, Product.name)
+
+        # 1. Code prefix (an exact match sorts first within its range)
+        for prefix in dict.fromkeys([query, query.upper()]):
+            add(db.session.query(*columns)
+                .filter(_prefix_range(Product.code, prefix))
+                .order_by(_bytewise(Product.code), Product.id)
+                .limit(limit).all())
+        if len(found) >= limit:
+            return list(found.values())
+
+        # 2. Every query word prefixes a word of the name
+        words = tokenize(query)[:MAX_QUERY_WORDS]
+        if words:
+            driver = max(words, key=len)
+            token = product_name_token.alias('token')
+            matches = db.select(token.c.product_id).where(_prefix_range(token.c.token, driver))
+            for word in words:
+                if word != driver:
+                    other = product_name_token.alias()
+                    matches = matches.where(db.exists().where(
+                        other.c.product_id == token.c.product_id, _prefix_range(other.c.token, word)
+                    ))
+            # One row per product (its first matching word), so a name with several matching words
+            # takes one slot and the scan can still stop after `limit` rows
+            earlier = product_name_token.alias()
+            matches = matches.where(~db.exists().where(
+                earlier.c.product_id == token.c.product_id,
+                _prefix_range(earlier.c.token, driver),
+                _bytewise(earlier.c.token) < _bytewise(token.c.token),
+            ))
+            ids = db.session.execute(
+                matches.order_by(_bytewise(token.c.token), token.c.product_id).limit(limit)
+            ).scalars().all()
+            if ids:
+                products = {product.id: product for product in
+                            db.session.query(*columns).filter(Product.id.in_(ids)).all()}
+                add(products[pid] for pid in ids if pid in products)
+        if len(found) >= limit:
+            return list(found.values())
+
+        # 3. Substring anywhere in code, name or description (up to `limit` matches, as the
+        #    products already found may be among them)
+        add(sorted(
+            db.session.query(*columns)
+            .filter(search_index.search(Product, ['code', 'name', 'description'], query, limit=limit))
+            .limit(limit).all(),
+            key=lambda product: (product.name, product.id)
+        ))
+
+        return list(found.values())
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    # ==================== BENCHMARK ====================
+
+    def benchmark(self, queries=500):
+        """Print latency percentiles for uncached and cached searches over sample queries"""
+        products = db.session.query(Product.code, Product.name).order_by(db.func.random()).limit(queries).all()
+        if not products:
+            print('No products to benchmark against')
+            return
+
+        samples = []
+        for code, name in products:
+            words = tokenize(name)
+            samples.append(random.choice([
+                code[:random.randint(2, max(2, len(code)))],
+                random.choice(words)[:4] if words else code,
+                name[1:6],
+            ]))
+
+        def measure(run):
+            timings = []
+            for sample in samples:
+                start = time.perf_counter()
+                run(sample)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            return {p: timings[min(len(timings) - 1, int(len(timings) * p / 100))] for p in (50, 95, 99)}
+
+        catalogue = db.session.query(db.func.count(Product.id)).scalar()
+        print(f'{len(samples)} queries over {catalogue} products')
+
+        uncached = measure(lambda q: self._search(q, 20))
+        for sample in samples:
+            self.search(sample, 20)  # Warm the cache
+        cached = measure(lambda q: self.search(q, 20))
+
+        for label, stats in (('uncached', uncached), ('cached', cached)):
+            print(f'{label:>9}: p50 {stats[50]:.2f} ms, p95 {stats[95]:.2f} ms, p99 {stats[99]:.2f} ms')
+
+
+product_search = ProductSearchService()
+
+
+# ==================== NAME TOKENS ====================
+
+def index_product_tokens(connection, product_id, name):
+    """Replace a product's rows in product_name_token"""
+    connection.execute(db.delete(product_name_token).where(product_name_token.c.product_id == product_id))
+    tokens = tokenize(name)
+    if tokens:
+        connection.execute(db.insert(product_name_token), [
+            {'token': token, 'product_id': product_id} for token in tokens
+        ])
+
+
+def _mark_changed(target):
+    session = inspect(target).session
+    if session is not None:
+        session.info['product_search_changed'] = True
+
+
+@event.listens_for(Product, 'after_insert')
+def _product_inserted(mapper, connection, target):
+    index_product_tokens(connection, target.id, target.name)
+    _mark_changed(target)
+
+
+@event.listens_for(Product, 'after_update')
+def _product_updated(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.name.history.has_changes():
+        index_product_tokens(connection, target.id, target.name)
+    if any(state.attrs[name].history.has_changes() for name in ('code', 'name', 'description')):
+        _mark_changed(target)
+
+
+@event.listens_for(Product, 'after_delete')
+def _product_deleted(mapper, connection, target):
+    connection.execute(db.delete(product_name_token).where(product_name_token.c.product_id == target.id))
+    _mark_changed(target)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _clear_after_commit(session):
+    if session.info.pop('product_search_changed', False):
+        product_search.clear_cache()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('product_search_changed', None)
@@ -6,10 +6,12 @@ Includes: Dashboard, User Management, Todos, Activity Feed, Products
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import current_user, login_required
 from app import db
+from app.product_search import product_search
 from app.models import (User, Customer, CallsheetEntry, Form, Callsheet, CallsheetArchive,
                         TodoItem, CompanyUpdate, StandingOrder, StandingOrderLog,
-                        StockTransaction, Product)
+                        StockTransaction, CustomerStock)
 from app.forms import CreateUserForm, EditUserForm
+from sqlalchemy.orm import contains_eager, joinedload
 from functools import wraps
 from datetime import datetime
 import logging
@@ -59,6 +61,7 @@ def index():
 def dashboard():
     """Main dashboard"""
     from app.models import Article
+    from app.kb_render import summary_only
 
     # Get customer count
     customer_count = Customer.query.count()
@@ -68,12 +71,14 @@ def dashboard():
 
     # Get recent KB articles
     recent_articles = Article.query.filter_by(status='published')\
+        .options(*summary_only())\
         .order_by(Article.created_at.desc())\
         .limit(6).all()
 
-    # Get popular articles
+    # Get trending articles (time-decayed popularity)
     popular_articles = Article.query.filter_by(status='published')\
-        .order_by(Article.view_count.desc())\
+        .options(*summary_only())\
+        .order_by(Article.popularity_score.desc())\
         .limit(5).all()
 
     return render_template(
@@ -348,23 +353,7 @@ def search_products():
         if len(query) < 2:
             return jsonify([])
 
-        products = Product.query.filter(
-            db.or_(
-                Product.code.ilike(f'%{query}%'),
-                Product.name.ilike(f'%{query}%'),
-                Product.description.ilike(f'%{query}%')
-            )
-        ).limit(20).all()
-
-        results = []
-        for product in products:
-            results.append({
-                'id': product.id,
-                'code': product.code,
-                'name': product.name,
-            })
-
-        return jsonify(results)
+        return jsonify(product_search.search(query, limit=20))
     except Exception as e:
         logger.error(f"Error searching products: {e}", exc_info=True)
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -380,7 +369,9 @@ def get_recent_activity():
 
     try:
         # Recent forms (created by any user)
-        recent_forms = Form.query.join(User, Form.user_id == User.id).order_by(Form.date_created.desc()).limit(5).all()
+        recent_forms = Form.query.join(User, Form.user_id == User.id).options(
+            contains_eager(Form.author)
+        ).order_by(Form.date_created.desc()).limit(5).all()
         for form in recent_forms:
             activities.append({
                 'type': 'form_created',
@@ -398,7 +389,9 @@ def get_recent_activity():
         completed_forms = Form.query.filter(
             Form.is_completed == True,
             Form.completed_date.isnot(None)
-        ).join(User, Form.completed_by == User.id).order_by(Form.completed_date.desc()).limit(3).all()
+        ).join(User, Form.completed_by == User.id).options(
+            contains_eager(Form.completer)
+        ).order_by(Form.completed_date.desc()).limit(3).all()
 
         for form in completed_forms:
             if form.completer:
@@ -415,7 +408,9 @@ def get_recent_activity():
 
     try:
         # Recent company updates (by any user)
-        recent_updates = CompanyUpdate.query.join(User, CompanyUpdate.user_id == User.id).order_by(CompanyUpdate.created_at.desc()).limit(4).all()
+        recent_updates = CompanyUpdate.query.join(User, CompanyUpdate.user_id == User.id).options(
+            contains_eager(CompanyUpdate.author)
+        ).order_by(CompanyUpdate.created_at.desc()).limit(4).all()
         for update in recent_updates:
             activities.append({
                 'type': 'company_update',
@@ -430,7 +425,9 @@ def get_recent_activity():
 
     try:
         # Recent callsheet creation (by any user)
-        recent_callsheets = Callsheet.query.join(User, Callsheet.created_by == User.id).order_by(Callsheet.created_at.desc()).limit(3).all()
+        recent_callsheets = Callsheet.query.join(User, Callsheet.created_by == User.id).options(
+            contains_eager(Callsheet.created_by_user)
+        ).order_by(Callsheet.created_at.desc()).limit(3).all()
         for callsheet in recent_callsheets:
             activities.append({
                 'type': 'callsheet_created',
@@ -451,6 +448,10 @@ def get_recent_activity():
             Customer, CallsheetEntry.customer_id == Customer.id
         ).join(
             Callsheet, CallsheetEntry.callsheet_id == Callsheet.id
+        ).options(
+            contains_eager(CallsheetEntry.entered_by),
+            contains_eager(CallsheetEntry.customer),
+            contains_eager(CallsheetEntry.callsheet)
         ).order_by(CallsheetEntry.id.desc()).limit(5).all()
 
         for entry in recent_callsheet_additions:
@@ -459,7 +460,7 @@ def get_recent_activity():
                 activities.append({
                     'type': 'callsheet_customer_added',
                     'description': f'Added {entry.customer.name} to callsheet "{entry.callsheet.name}"',
-                    'user': User.query.get(entry.user_id).username,
+                    'user': entry.entered_by.username,
                     'timestamp': entry.callsheet.created_at,
                     'link': url_for('callsheets.callsheets'),
                     'icon': 'bi-person-plus'
@@ -472,7 +473,10 @@ def get_recent_activity():
         recent_callsheet_calls = CallsheetEntry.query.filter(
             CallsheetEntry.call_status != 'not_called',
             CallsheetEntry.updated_at.isnot(None)
-        ).join(User, CallsheetEntry.user_id == User.id).join(Customer, CallsheetEntry.customer_id == Customer.id).order_by(CallsheetEntry.updated_at.desc()).limit(5).all()
+        ).join(User, CallsheetEntry.user_id == User.id).join(Customer, CallsheetEntry.customer_id == Customer.id).options(
+            contains_eager(CallsheetEntry.entered_by),
+            contains_eager(CallsheetEntry.customer)
+        ).order_by(CallsheetEntry.updated_at.desc()).limit(5).all()
 
         for entry in recent_callsheet_calls:
             status_descriptions = {
@@ -487,7 +491,7 @@ def get_recent_activity():
             activities.append({
                 'type': 'callsheet_call',
                 'description': f'{status_desc.title()} {entry.customer.name}',
-                'user': User.query.get(entry.user_id).username,
+                'user': entry.entered_by.username,
                 'timestamp': entry.updated_at,
                 'link': url_for('callsheets.callsheets'),
                 'icon': 'bi-telephone'
@@ -497,7 +501,10 @@ def get_recent_activity():
 
     try:
         # Recent standing order creation
-        recent_standing_orders = StandingOrder.query.join(User, StandingOrder.created_by == User.id).order_by(StandingOrder.created_at.desc()).limit(3).all()
+        recent_standing_orders = StandingOrder.query.join(User, StandingOrder.created_by == User.id).options(
+            contains_eager(StandingOrder.created_by_user),
+            joinedload(StandingOrder.customer)
+        ).order_by(StandingOrder.created_at.desc()).limit(3).all()
         for order in recent_standing_orders:
             activities.append({
                 'type': 'standing_order_created',
@@ -514,7 +521,10 @@ def get_recent_activity():
         # Recent standing order actions (pause, resume, end)
         recent_so_logs = StandingOrderLog.query.filter(
             StandingOrderLog.action_type.in_(['paused', 'resumed', 'ended'])
-        ).join(User, StandingOrderLog.performed_by == User.id).order_by(StandingOrderLog.performed_at.desc()).limit(3).all()
+        ).join(User, StandingOrderLog.performed_by == User.id).options(
+            contains_eager(StandingOrderLog.user),
+            joinedload(StandingOrderLog.standing_order).joinedload(StandingOrder.customer)
+        ).order_by(StandingOrderLog.performed_at.desc()).limit(3).all()
 
         for log in recent_so_logs:
             action_descriptions = {
@@ -536,7 +546,10 @@ def get_recent_activity():
 
     try:
         # Recent customer stock transactions
-        recent_stock_transactions = StockTransaction.query.join(User, StockTransaction.created_by == User.id).order_by(StockTransaction.transaction_date.desc()).limit(3).all()
+        recent_stock_transactions = StockTransaction.query.join(User, StockTransaction.created_by == User.id).options(
+            contains_eager(StockTransaction.user),
+            joinedload(StockTransaction.stock_item).joinedload(CustomerStock.customer)
+        ).order_by(StockTransaction.transaction_date.desc()).limit(3).all()
         for transaction in recent_stock_transactions:
             transaction_types = {
                 'stock_in': 'Added stock for',
@@ -0,0 +1,180 @@
+"""
+Substring Search Indexes
+
+``ILIKE '%q%'`` can't use a btree index, so the searchable text columns of
+the main tables get trigram indexes instead:
+- PostgreSQL: a pg_trgm GIN index per column, which serves ILIKE directly
+- SQLite: an external-content FTS5 table per model (<table>_trgm) using the
+  trigram tokenizer, kept in sync with the base table by triggers
+
+Endpoints filter through ``search(model, fields, q)``, which returns a
+criterion matching rows where any of the fields contains q
+(case-insensitively) and uses whichever index the database has.
+Queries shorter than three characters can't use a trigram index and fall
+back to ILIKE.
+"""
+
+import logging
+from sqlalchemy import event, inspect, DDL
+from app import db
+from app.models import Customer, Product, CustomerStock, ClearanceStock, Form
+
+logger = logging.getLogger(__name__)
+
+TRIGRAM_LENGTH = 3
+
+# Indexed text columns per model
+SEARCH_INDEXES = {
+    Customer: ('account_number', 'name', 'contact_name'),
+    Product: ('code', 'name', 'description'),
+    CustomerStock: ('product_code', 'product_name'),
+    ClearanceStock: ('supplier_code', 'his_code', 'description', 'pallet'),
+    Form: ('customer_account', 'customer_name'),
+}
+
+_index_available = {}
+
+
+# ==================== SCHEMA ====================
+
+def fts_table_name(table_name):
+    return f'{table_name}_trgm'
+
+
+def sqlite_statements(table_name, fields):
+    """DDL creating a model's FTS5 trigram table and its sync triggers"""
+    fts = fts_table_name(table_name)
+    columns = ', '.join(fields)
+    new_values = ', '.join(f'new.{f}' for f in fields)
+    old_values = ', '.join(f'old.{f}' for f in fields)
+    delete_old = f"INSERT INTO {fts} ({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    insert_new = f"INSERT INTO {fts} (rowid, {columns}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{columns}, content='{table_name}', content_rowid='id', tokenize='trigram')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON "{table_name}" BEGIN {insert_new} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON "{table_name}" BEGIN {delete_old} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON "{table_name}" '
+        f'BEGIN {delete_old} {insert_new} END',
+    ]
+
+
+def sqlite_rebuild_statement(table_name):
+    """Re-read every row of the base table into its trigram table"""
+    fts = fts_table_name(table_name)
+    return f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')"
+
+
+def sqlite_drop_statements(table_name):
+    fts = fts_table_name(table_name)
+    return [f'DROP TRIGGER IF EXISTS {fts}_{suffix}' for suffix in ('ai', 'ad', 'au')] + \
+        [f'DROP TABLE IF EXISTS {fts}']
+
+
+def postgres_statements(table_name, fields):
+    """DDL creating a pg_trgm GIN index per searchable column"""
+    return ['CREATE EXTENSION IF NOT EXISTS pg_trgm'] + [
+        f'CREATE INDEX IF NOT EXISTS idx_{table_name}_{field}_trgm ON "{table_name}" USING GIN ({field} gin_trgm_ops)'
+        for field in fields
+    ]
+
+
+def postgres_drop_statements(table_name, fields):
+    return [f'DROP INDEX IF EXISTS idx_{table_name}_{field}_trgm' for field in fields]
+
+
+# Keep the indexes alongside their tables when using db.create_all()/drop_all(). Only SQLite
+# needs before_drop hooks: its trigram tables are separate tables, while PostgreSQL's trigram
+# indexes are dropped along with the table they index. None of these objects are in db.metadata;
+# migrations/env.py keeps autogenerate from dropping them.
+for _model, _fields in SEARCH_INDEXES.items():
+    _table = _model.__table__
+    for _statement in sqlite_statements(_table.name, _fields):
+        event.listen(_table, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+    for _statement in postgres_statements(_table.name, _fields):
+        event.listen(_table, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+    for _statement in sqlite_drop_statements(_table.name):
+        event.listen(_table, 'before_drop', DDL(_statement).execute_if(dialect='sqlite'))
+
+
+def fts_available(table_name):
+    """
+    Check whether a model's SQLite trigram table exists.
+
+    Cached per database URL and table. Always False on other databases
+    (PostgreSQL indexes the columns themselves).
+    """
+    engine = db.engine
+    key = (str(engine.url), table_name)
+
+    if key not in _index_available:
+        if engine.dialect.name != 'sqlite':
+            _index_available[key] = False
+        else:
+            try:
+                _index_available[key] = inspect(engine).has_table(fts_table_name(table_name))
+            except Exception as e:
+                logger.error(f"Error checking search index for {table_name}: {e}", exc_info=True)
+                _index_available[key] = False
+    return _index_available[key]
+
+
+# ==================== SEARCH ====================
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search(model, fields, q, limit=None):
+    """
+    Criterion matching rows where any of the given fields contains q.
+
+    Args:
+        model: Model class
+        fields (iterable): Names of text columns to search
+        q (str): Search text (matched as a case-insensitive substring)
+        limit (int): Match at most this many rows (in index order), so a
+            SQLite trigram lookup can stop early instead of collecting every
+            match. The caller should apply the same LIMIT without an ORDER BY.
+
+    Returns:
+        SQL expression for use in query.filter()
+    """
+    q = (q or '').strip()
+    fields = list(fields)
+    table_name = model.__table__.name
+    indexed = SEARCH_INDEXES.get(model, ())
+
+    if len(q) >= TRIGRAM_LENGTH and set(fields) <= set(indexed) and fts_available(table_name):
+        fts = fts_table_name(table_name)
+        match = '{%s} : "%s"' % (' '.join(fields), q.replace('"', '""'))
+        matches = db.select(db.column('rowid')).select_from(db.table(fts))\
+            .where(db.literal_column(fts).op('MATCH')(match))
+        if limit is not None:
+            matches = matches.limit(limit)
+        return model.id.in_(matches)
+
+    # PostgreSQL: served by the pg_trgm GIN indexes
+    pattern = f'%{_escape_like(q)}%'
+    return db.or_(*[getattr(model, field).ilike(pattern, escape='\\') for field in fields])
+
+
+def rebuild_search_indexes():
+    """Rebuild every SQLite trigram table from its base table (no-op elsewhere)"""
+    connection = db.session.connection()
+    rebuilt = []
+    for model in SEARCH_INDEXES:
+        table_name = model.__table__.name
+        if fts_available(table_name):
+            connection.exec_driver_sql(sqlite_rebuild_statement(table_name))
+            rebuilt.append(table_name)
+    db.session.commit()
+    return rebuilt
+
+
+def init_app(app):
+    @app.cli.command('rebuild-search-indexes')
+    def rebuild_search_indexes_command():
+        """Rebuild the SQLite trigram search tables (e.g. after restoring a database)."""
+        rebuilt = rebuild_search_indexes()
+        print(f'Rebuilt search indexes: {", ".join(rebuilt) or "none (not needed on this database)"}')
@@ -0,0 +1,275 @@
+"""
+Customer Stock Ledger
+
+Stock movements are applied with a single conditional UPDATE per stock
+item instead of a read-modify-write in Python:
+
+    UPDATE customer_stock
+       SET current_stock = current_stock + :delta
+     WHERE id = :id AND current_stock + :delta >= 0
+
+The database evaluates the check and the write atomically, so two staff
+booking stock out at the same moment can't both pass the check on a stale
+balance. An UPDATE that matches no row means the item is missing or the
+movement would take it below zero; nothing is written in either case.
+
+The row lock an UPDATE takes is held until the transaction commits, so a
+delivery note locks every item it touches until the whole note is booked.
+apply_batch() updates items in stock item ID order, so two notes sharing
+items lock them in the same order and wait for each other rather than
+deadlocking.
+
+Transient failures (deadlock, serialization failure, SQLite "database is
+locked") roll the transaction back and re-run the whole unit of work, up
+to STOCK_LEDGER_MAX_RETRIES times with a short jittered backoff.
+
+The same UPDATE refreshes CustomerStock.is_low_stock; ORM writes to
+current_stock or reorder_level refresh it through mapper events. The
+low-stock alert count is then one indexed count.
+
+Each StockTransaction stores balance_after, the level the UPDATE returned.
+History pages show a running balance without summing the ledger, and the
+balance at any moment is one index seek on
+(stock_item_id, transaction_date, id).
+"""
+
+import logging
+import random
+import time
+from datetime import datetime
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.models import CustomerStock, StockTransaction
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_TYPES = ('stock_in', 'stock_out', 'adjustment')
+
+REORDER_LEVEL_DEFAULT = CustomerStock.__table__.c.reorder_level.default.arg
+
+# PostgreSQL SQLSTATEs worth retrying: serialization_failure, deadlock_detected
+RETRYABLE_PGCODES = ('40001', '40P01')
+
+
+class StockLedgerError(ValueError):
+    """Raised when a stock movement can't be applied"""
+
+
+class InsufficientStock(StockLedgerError):
+    """Raised when a movement would take an item below zero"""
+
+    def __init__(self, stock_item_id, available, quantity):
+        self.stock_item_id = stock_item_id
+        self.available = available
+        self.quantity = quantity
+        super().__init__(f'Insufficient stock (available: {available})')
+
+
+class StockItemNotFound(StockLedgerError):
+    """Raised when the stock item doesn't exist"""
+
+    def __init__(self, stock_item_id):
+        self.stock_item_id = stock_item_id
+        super().__init__(f'Stock item {stock_item_id} not found')
+
+
+class BatchRejected(StockLedgerError):
+    """Raised when any movement of a batch can't be applied"""
+
+    def __init__(self, failures):
+        self.failures = failures  # [(movement index, StockLedgerError)]
+        super().__init__(f'{len(failures)} line(s) could not be booked')
+
+
+def stock_delta(transaction_type, quantity):
+    """
+    Signed change to current_stock for a movement.
+
+    stock_in adds, stock_out removes, adjustment applies quantity as given
+    (positive or negative).
+    """
+    if transaction_type in ('stock_in', 'stock_out') and quantity <= 0:
+        raise StockLedgerError('Quantity must be positive')
+    if transaction_type == 'stock_in':
+        return quantity
+    if transaction_type == 'stock_out':
+        return -quantity
+    if transaction_type == 'adjustment':
+        return quantity
+    raise StockLedgerError(f'Invalid transaction type: {transaction_type}')
+
+
+def _is_retryable(error):
+    pgcode = getattr(error.orig, 'pgcode', None)
+    if pgcode:
+        return pgcode in RETRYABLE_PGCODES
+    return 'database is locked' in str(error.orig).lower()
+
+
+class StockLedger:
+    """Applies customer stock movements with conditional atomic updates"""
+
+    def __init__(self, max_retries=3, retry_backoff=0.05):
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+    def init_app(self, app):
+        self.max_retries = app.config.get('STOCK_LEDGER_MAX_RETRIES', self.max_retries)
+
+    # ==================== MOVEMENTS ====================
+
+    def apply(self, stock_item_id, transaction_type, quantity, user_id, reference='', notes=''):
+        """
+        Apply one movement in the current transaction (the caller commits).
+
+        Returns:
+            tuple: (StockTransaction, new stock level)
+
+        Raises:
+            InsufficientStock: The movement would take the item below zero
+            StockItemNotFound: No stock item with that ID
+        """
+        delta = stock_delta(transaction_type, quantity)
+        new_stock = CustomerStock.current_stock + delta
+        new_level = db.session.execute(
+            db.update(CustomerStock)
+            .where(CustomerStock.id == stock_item_id, new_stock >= 0)
+            .values(
+                current_stock=new_stock,
+                is_low_stock=new_stock <= db.func.coalesce(CustomerStock.reorder_level, 0),
+                updated_at=datetime.utcnow()
+            )
+            .returning(CustomerStock.current_stock)
+            .execution_options(synchronize_session='fetch')
+        ).scalar()
+
+        if new_level is None:
+            available = db.session.query(CustomerStock.current_stock)\
+                .filter(CustomerStock.id == stock_item_id).scalar()
+            if available is None:
+                raise StockItemNotFound(stock_item_id)
+            raise InsufficientStock(stock_item_id, available, quantity)
+
+        transaction = StockTransaction(
+            stock_item_id=stock_item_id,
+            transaction_type=transaction_type,
+            quantity=quantity,
+            reference=reference,
+            notes=notes,
+            created_by=user_id,
+            balance_after=new_level
+        )
+        db.session.add(transaction)
+        return transaction, new_level
+
+    def apply_batch(self, movements, user_id):
+        """
+        Apply several movements in the current transaction (all or nothing).
+
+        Items are updated in stock item ID order (then line order), so
+        concurrent batches touching the same items can't deadlock. Every
+        line is attempted so all shortfalls are reported together.
+
+        Args:
+            movements (list): Dicts with stock_item_id, transaction_type,
+                quantity and optional reference/notes
+            user_id (int): User booking the movements
+
+        Returns:
+            list: (StockTransaction, new stock level) per movement, in input order
+
+        Raises:
+            BatchRejected: One or more movements couldn't be applied
+        """
+        results = [None] * len(movements)
+        failures = []
+        order = sorted(range(len(movements)), key=lambda i: (movements[i]['stock_item_id'], i))
+
+        for i in order:
+            movement = movements[i]
+            try:
+                results[i] = self.apply(
+                    movement['stock_item_id'], movement['transaction_type'], movement['quantity'], user_id,
+                    reference=movement.get('reference', ''), notes=movement.get('notes', '')
+                )
+            except StockLedgerError as e:
+                failures.append((i, e))
+
+        if failures:
+            raise BatchRejected(sorted(failures, key=lambda failure: failure[0]))
+        return results
+
+    # ==================== TRANSACTIONS ====================
+
+    def run(self, work):
+        """
+        Call work() and commit, retrying the whole unit on transient conflicts.
+
+        work() must only touch the database through db.session (it is
+        re-run from scratch after a rollback). Any other exception rolls
+        back and propagates.
+
+        Returns:
+            Whatever work() returned
+        """
+        attempt = 0
+        while True:
+            try:
+                result = work()
+                db.session.commit()
+                return result
+            except OperationalError as e:
+                db.session.rollback()
+                if attempt >= self.max_retries or not _is_retryable(e):
+                    raise
+                attempt += 1
+                logger.warning(f"Stock ledger conflict, retrying ({attempt}/{self.max_retries}): {e.orig}")
+                time.sleep(self.retry_backoff * attempt * (1 + random.random()))
+            except Exception:
+                db.session.rollback()
+                raise
+
+
+stock_ledger = StockLedger()
+
+
+# ==================== LOW STOCK FLAG ====================
+
+def low_stock_count():
+    """Number of stock lines at or below their reorder level (an index-only count)"""
+    return db.session.query(db.func.count(CustomerStock.id)).filter(CustomerStock.is_low_stock.is_(True)).scalar()
+
+
+@event.listens_for(CustomerStock, 'before_insert')
+def _stock_item_inserted(mapper, connection, target):
+    # Column defaults aren't applied yet; fall back to them for unset values
+    current_stock = target.current_stock if target.current_stock is not None else 0
+    reorder_level = target.reorder_level if target.reorder_level is not None else REORDER_LEVEL_DEFAULT
+    target.is_low_stock = current_stock <= reorder_level
+
+
+@event.listens_for(CustomerStock, 'before_update')
+def _stock_item_updated(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.current_stock.history.has_changes() or state.attrs.reorder_level.history.has_changes():
+        target.is_low_stock = (target.current_stock or 0) <= (target.reorder_level or 0)
+
+
+# ==================== BALANCES ====================
+
+def balance_as_of(stock_item_id, moment):
+    """
+    Stock level of an item at a point in time.
+
+    Returns:
+        tuple: (balance, StockTransaction or None). The balance is 0 when
+        there were no movements yet.
+    """
+    transaction = StockTransaction.query\
+        .filter(StockTransaction.stock_item_id == stock_item_id, StockTransaction.transaction_date <= moment)\
+        .order_by(StockTransaction.transaction_date.desc(), StockTransaction.id.desc())\
+        .first()
+    if transaction is None:
+        return 0, None
+    return transaction.balance_after, transaction
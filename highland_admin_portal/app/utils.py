@@ -6,8 +6,11 @@ used across multiple blueprints and routes.
 """
 
 import logging
-from app.models import Customer, CustomerAddress
-from app import db
+import re
+import html
+from flask import g
+from app.models import Customer, User
+from app.address_lookup import add_address
 import bleach
 
 logger = logging.getLogger(__name__)
@@ -139,6 +142,87 @@ def sanitize_html_content(html_content):
         return html_content  # Return original if sanitization fails
 
 
+def html_to_text(html_content):
+    """
+    Convert HTML content to plain text for indexing and excerpts.
+
+    Block-level tags are turned into spaces so words from adjacent
+    paragraphs don't run together, entities are unescaped and whitespace
+    is collapsed.
+
+    Args:
+        html_content (str): HTML content to convert
+
+    Returns:
+        str: Plain text (empty string if input is empty)
+    """
+    if not html_content:
+        return ''
+
+    text = re.sub(r'<\s*(br|/p|/li|/div|/h[1-6]|/tr|/td)[^>]*>', ' ', html_content, flags=re.IGNORECASE)
+    text = bleach.clean(text, tags=[], attributes={}, strip=True)
+    text = html.unescape(text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+# Markup produced by the knowledge base article editor (Quill)
+ARTICLE_ALLOWED_TAGS = [
+    'p', 'br', 'strong', 'b', 'em', 'i', 'u', 's', 'a', 'img', 'ol', 'ul', 'li',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre', 'code', 'span', 'sub', 'sup', 'hr'
+]
+ARTICLE_ALLOWED_ATTRIBUTES = {
+    '*': ['class', 'style'],
+    'a': ['href', 'title', 'target', 'rel'],
+    'img': ['src', 'alt', 'title', 'width', 'height']
+}
+ARTICLE_ALLOWED_STYLES = ('color', 'background-color')
+_CSS_VALUE_PATTERN = re.compile(r'^(#[0-9a-f]{3,8}|rgba?\([\d\s.,%]+\)|[a-z]+)$', re.IGNORECASE)
+
+
+class _ArticleCssSanitizer:
+    """Keeps only the colour declarations the editor emits from inline styles"""
+
+    def sanitize_css(self, style):
+        declarations = []
+        for declaration in style.split(';'):
+            prop, _, value = declaration.partition(':')
+            prop, value = prop.strip().lower(), value.strip()
+            if prop in ARTICLE_ALLOWED_STYLES and _CSS_VALUE_PATTERN.match(value):
+                declarations.append(f'{prop}: {value}')
+        return '; '.join(declarations)
+
+
+def sanitize_article_html(html_content):
+    """
+    Sanitize knowledge base article HTML.
+
+    Allows the richer markup produced by the article editor (headings,
+    code blocks, quotes, alignment classes and text colours) while
+    stripping scripts, event handlers and other unsafe content.
+
+    Args:
+        html_content (str): Raw article HTML
+
+    Returns:
+        str: Sanitized HTML (empty string if input is empty)
+    """
+    if not html_content:
+        return ''
+
+    try:
+        return bleach.clean(
+            html_content,
+            tags=ARTICLE_ALLOWED_TAGS,
+            attributes=ARTICLE_ALLOWED_ATTRIBUTES,
+            protocols=['http', 'https', 'mailto'],
+            css_sanitizer=_ArticleCssSanitizer(),
+            strip=True
+        )
+    except Exception as e:
+        logger.error(f"Error sanitizing article HTML: {e}", exc_info=True)
+        return html.escape(html_content)  # Show as text rather than render unsanitized
+
+
 # ==================== ADDRESS HANDLING ====================
 
 def handle_new_address_from_form(form_data, customer_account):
@@ -146,8 +230,8 @@ def handle_new_address_from_form(form_data, customer_account):
     Handle creating a new address if the form submitted one.
 
     This function checks if a new address is being submitted via the form
-    and creates it in the database if needed. It handles duplicate detection
-    and returns the address label to use.
+    and creates it in the database if needed, leaving an existing address
+    with the same label untouched. It returns the address label to use.
 
     Args:
         form_data (dict): Form data containing address information
@@ -183,20 +267,10 @@ def handle_new_address_from_form(form_data, customer_account):
                 logger.error("No label provided for new address")
                 return None
 
-            # Check if this label already exists for this customer
-            duplicate = CustomerAddress.query.filter_by(
-                customer_id=customer.id,
-                label=new_label
-            ).first()
-
-            if duplicate:
-                logger.warning(f"Address with label '{new_label}' already exists for customer {customer.name}")
-                return new_label
-
-            # Create new address
-            new_address = CustomerAddress(
-                customer_id=customer.id,
-                label=new_label,
+            # Insert unless this label already exists for this customer (one statement)
+            created = add_address(
+                customer.id,
+                new_label,
                 street=new_street,
                 city=new_city,
                 zip=new_zip,
@@ -204,10 +278,10 @@ def handle_new_address_from_form(form_data, customer_account):
                 is_primary=False  # New addresses are not primary by default
             )
 
-            db.session.add(new_address)
-            db.session.flush()  # Get the ID but don't commit yet
-
-            logger.info(f"Created new address '{new_label}' for customer {customer.name} (ID: {new_address.id})")
+            if created:
+                logger.info(f"Created new address '{new_label}' for customer {customer.name}")
+            else:
+                logger.warning(f"Address with label '{new_label}' already exists for customer {customer.name}")
 
             return new_label
 
@@ -219,6 +293,49 @@ def handle_new_address_from_form(form_data, customer_account):
         return None
 
 
+# ==================== USER LOOKUPS ====================
+
+def get_users_by_id(user_ids):
+    """
+    Resolve many user IDs with at most one query per request.
+
+    Users are cached on flask.g for the lifetime of the request, so each
+    user is fetched from the database at most once however many times
+    they are looked up.
+
+    Args:
+        user_ids (iterable): User IDs to resolve (None values are ignored)
+
+    Returns:
+        dict: Mapping of user ID to User (missing users are omitted)
+    """
+    cache = g.setdefault('_user_cache', {})
+    wanted = {uid for uid in user_ids if uid is not None}
+    missing = wanted - cache.keys()
+
+    if missing:
+        for user in User.query.filter(User.id.in_(missing)).all():
+            cache[user.id] = user
+        # Remember misses too so unknown IDs are not queried again
+        for uid in missing:
+            cache.setdefault(uid, None)
+
+    return {uid: cache[uid] for uid in wanted if cache.get(uid) is not None}
+
+
+def get_user_cached(user_id):
+    """
+    Resolve a single user ID through the per-request user cache.
+
+    Args:
+        user_id (int): User ID to resolve
+
+    Returns:
+        User: The user, or None if not found
+    """
+    return get_users_by_id([user_id]).get(user_id)
+
+
 # ==================== CATEGORY CONFIGURATION ====================
 
 def get_category_config():
@@ -42,9 +42,34 @@ class Config:
     # Upload settings
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'uploads')
+    MEDIA_FOLDER = os.environ.get('MEDIA_FOLDER')  # Image store; defaults to app/static/uploads/media
+    MEDIA_WORKERS = int(os.environ.get('MEDIA_WORKERS', 2))  # Threads generating image variants
     
     # Application settings
     PERMANENT_SESSION_LIFETIME = 86400  # 24 hours in seconds
+    
+    # Knowledge base view tracking (views are buffered and written in batches)
+    KB_VIEW_FLUSH_INTERVAL = int(os.environ.get('KB_VIEW_FLUSH_INTERVAL', 30))  # seconds
+    KB_VIEW_FLUSH_THRESHOLD = int(os.environ.get('KB_VIEW_FLUSH_THRESHOLD', 500))  # pending views
+    KB_VIEW_MAX_PENDING = int(os.environ.get('KB_VIEW_MAX_PENDING', 50000))  # views kept across failed flushes
+
+    # Knowledge base render cache (serialized article payloads held in memory)
+    KB_RENDER_CACHE_SIZE = int(os.environ.get('KB_RENDER_CACHE_SIZE', 256))  # articles
+
+    # Related articles stored per published article
+    KB_RELATED_TOP_K = int(os.environ.get('KB_RELATED_TOP_K', 5))
+    # Refresh them on a background worker after an article is saved (else in the saving request)
+    KB_RELATED_ASYNC = os.environ.get('KB_RELATED_ASYNC', 'true').lower() == 'true'
+
+    # Customer autocomplete index (in memory; rebuilt to pick up other processes' writes)
+    CUSTOMER_INDEX_MAX_AGE = int(os.environ.get('CUSTOMER_INDEX_MAX_AGE', 300))  # seconds
+
+    # Product search result cache
+    PRODUCT_SEARCH_CACHE_TTL = int(os.environ.get('PRODUCT_SEARCH_CACHE_TTL', 30))  # seconds (0 disables)
+    PRODUCT_SEARCH_CACHE_SIZE = int(os.environ.get('PRODUCT_SEARCH_CACHE_SIZE', 512))  # queries
+
+    # Customer stock ledger: retries of a booking after a deadlock/serialization failure
+    STOCK_LEDGER_MAX_RETRIES = int(os.environ.get('STOCK_LEDGER_MAX_RETRIES', 3))
 
 class DevelopmentConfig(Config):
     """Development-specific configuration"""
@@ -78,9 +103,12 @@ class ProductionConfig(Config):
 
 class TestingConfig(Config):
     """Testing-specific configuration"""
+    DEBUG = False
     TESTING = True
+    FLASK_ENV = 'testing'
     WTF_CSRF_ENABLED = False
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    KB_RELATED_ASYNC = False  # The in-memory database is a single shared connection
     SECRET_KEY = 'test-secret-key-not-secure'  # OK for testing only
 
 # Configuration selection based on environment
@@ -1,4 +1,5 @@
 import logging
+import re
 from logging.config import fileConfig
 
 from flask import current_app
@@ -51,6 +52,22 @@ def get_metadata():
     return target_db.metadata
 
 
+# Search index objects created with raw DDL rather than db.metadata (see app/kb_search.py,
+# app/kb_supplier_directory.py, app/search_index.py and app/product_search.py), including
+# SQLite's FTS5 shadow tables (<name>_data, <name>_idx, ...). Autogenerate would otherwise emit
+# drops for them.
+UNMANAGED_TABLES = re.compile(r'^(article_fts|supplier_fts|\w+_trgm)(_\w+)?$')
+UNMANAGED_INDEXES = re.compile(r'^idx_(article_fts_document|\w+_trgm|\w+_collate_c)$')
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == 'table':
+        return not UNMANAGED_TABLES.match(name)
+    if type_ == 'index':
+        return not UNMANAGED_INDEXES.match(name)
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +82,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -93,6 +111,8 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     connectable = get_engine()
 
@@ -0,0 +1,63 @@
+"""standing order delivery days as bitmask
+
+Revision ID: a3e91c5d7b20
+Revises: 7f4d54faf4d3
+Create Date: 2026-10-19 14:05:12.417203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3e91c5d7b20'
+down_revision = '7f4d54faf4d3'
+branch_labels = None
+depends_on = None
+
+
+standing_order = sa.table(
+    'standing_order',
+    sa.column('id', sa.Integer),
+    sa.column('delivery_days', sa.String),
+    sa.column('delivery_mask', sa.Integer),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('standing_order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('delivery_mask', sa.Integer(), nullable=False, server_default='0'))
+
+    # Convert "0,3" style strings into bitmasks
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(standing_order.c.id, standing_order.c.delivery_days)).fetchall()
+    for row in rows:
+        mask = 0
+        for d in (row.delivery_days or '').split(','):
+            d = d.strip()
+            if d.isdigit():
+                mask |= 1 << int(d)
+        conn.execute(
+            standing_order.update().where(standing_order.c.id == row.id).values(delivery_mask=mask)
+        )
+
+    with op.batch_alter_table('standing_order', schema=None) as batch_op:
+        batch_op.create_index('idx_standing_order_status_mask', ['status', 'delivery_mask'], unique=False)
+        batch_op.drop_column('delivery_days')
+
+
+def downgrade():
+    with op.batch_alter_table('standing_order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('delivery_days', sa.VARCHAR(length=20), nullable=False, server_default=''))
+
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(standing_order.c.id, standing_order.c.delivery_mask)).fetchall()
+    for row in rows:
+        days = ','.join(str(d) for d in range(7) if (row.delivery_mask or 0) & (1 << d))
+        conn.execute(
+            standing_order.update().where(standing_order.c.id == row.id).values(delivery_days=days)
+        )
+
+    with op.batch_alter_table('standing_order', schema=None) as batch_op:
+        batch_op.drop_index('idx_standing_order_status_mask')
+        batch_op.drop_column('delivery_mask')
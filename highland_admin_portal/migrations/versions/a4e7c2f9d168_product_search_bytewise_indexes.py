@@ -0,0 +1,30 @@
+"""byte-wise product search indexes on postgresql
+
+Revision ID: a4e7c2f9d168
+Revises: f8d3a7c1e594
+Create Date: 2026-10-20 11:06:31.847205
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4e7c2f9d168'
+down_revision = 'f8d3a7c1e594'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Product search matches prefixes as [prefix, prefix + U+10FFFF) ranges, which needs a
+    # byte-wise collation. SQLite compares byte-wise already.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE INDEX IF NOT EXISTS idx_product_code_collate_c ON product (code COLLATE "C", id)')
+        op.execute('CREATE INDEX IF NOT EXISTS idx_product_name_token_collate_c '
+                   'ON product_name_token (token COLLATE "C", product_id)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS idx_product_name_token_collate_c')
+        op.execute('DROP INDEX IF EXISTS idx_product_code_collate_c')
@@ -0,0 +1,58 @@
+"""stock transaction running balances
+
+Revision ID: a8d3f6b2c914
+Revises: f4c7a1e9b352
+Create Date: 2026-10-19 22:03:18.265041
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d3f6b2c914'
+down_revision = 'f4c7a1e9b352'
+branch_labels = None
+depends_on = None
+
+
+# Backfill as of this revision (copied so later changes to the app can't alter the migration)
+def backfill_balances(conn):
+    stock = sa.table('customer_stock', sa.column('id'), sa.column('current_stock'))
+    ledger = sa.table('stock_transaction', sa.column('id'), sa.column('stock_item_id'),
+                      sa.column('transaction_type'), sa.column('quantity'),
+                      sa.column('transaction_date'), sa.column('balance_after'))
+
+    delta = sa.case((ledger.c.transaction_type == 'stock_out', -ledger.c.quantity), else_=ledger.c.quantity)
+    newer = sa.func.sum(delta).over(
+        partition_by=ledger.c.stock_item_id,
+        order_by=(ledger.c.transaction_date.desc(), ledger.c.id.desc()),
+        rows=(None, -1)
+    )
+    balances = sa.select(
+        ledger.c.id, ledger.c.balance_after, (stock.c.current_stock - sa.func.coalesce(newer, 0)).label('balance')
+    ).join(stock, stock.c.id == ledger.c.stock_item_id).subquery()
+
+    rows = conn.execute(
+        sa.select(balances.c.id, balances.c.balance).where(balances.c.balance_after.is_(None))
+    ).fetchall()
+    if rows:
+        conn.execute(
+            ledger.update().where(ledger.c.id == sa.bindparam('transaction_id')).values(balance_after=sa.bindparam('balance')),
+            [{'transaction_id': row.id, 'balance': row.balance} for row in rows]
+        )
+
+
+def upgrade():
+    with op.batch_alter_table('stock_transaction', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('balance_after', sa.Integer(), nullable=True))
+        batch_op.create_index('idx_stock_transaction_item_date', ['stock_item_id', 'transaction_date', 'id'], unique=False)
+
+    # Work existing balances back from each item's current stock
+    backfill_balances(op.get_bind())
+
+
+def downgrade():
+    with op.batch_alter_table('stock_transaction', schema=None) as batch_op:
+        batch_op.drop_index('idx_stock_transaction_item_date')
+        batch_op.drop_column('balance_after')
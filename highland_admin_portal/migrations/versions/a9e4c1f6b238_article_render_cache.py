@@ -0,0 +1,104 @@
+"""article render cache columns
+
+Revision ID: a9e4c1f6b238
+Revises: f2a6d8b5e413
+Create Date: 2026-10-19 17:52:09.276415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import hashlib
+import html
+import re
+import bleach
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9e4c1f6b238'
+down_revision = 'f2a6d8b5e413'
+branch_labels = None
+depends_on = None
+
+
+# Rendering as of this revision (copied so later changes to the app can't alter the migration)
+EXCERPT_LENGTH = 300
+ALLOWED_TAGS = [
+    'p', 'br', 'strong', 'b', 'em', 'i', 'u', 's', 'a', 'img', 'ol', 'ul', 'li',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre', 'code', 'span', 'sub', 'sup', 'hr'
+]
+ALLOWED_ATTRIBUTES = {
+    '*': ['class', 'style'],
+    'a': ['href', 'title', 'target', 'rel'],
+    'img': ['src', 'alt', 'title', 'width', 'height']
+}
+ALLOWED_STYLES = ('color', 'background-color')
+CSS_VALUE_PATTERN = re.compile(r'^(#[0-9a-f]{3,8}|rgba?\([\d\s.,%]+\)|[a-z]+)$', re.IGNORECASE)
+
+
+class _CssSanitizer:
+    def sanitize_css(self, style):
+        declarations = []
+        for declaration in style.split(';'):
+            prop, _, value = declaration.partition(':')
+            prop, value = prop.strip().lower(), value.strip()
+            if prop in ALLOWED_STYLES and CSS_VALUE_PATTERN.match(value):
+                declarations.append(f'{prop}: {value}')
+        return '; '.join(declarations)
+
+
+def _sanitize(content):
+    if not content:
+        return ''
+    try:
+        return bleach.clean(content, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES,
+                            protocols=['http', 'https', 'mailto'], css_sanitizer=_CssSanitizer(), strip=True)
+    except Exception:
+        return html.escape(content)
+
+
+def _html_to_text(content):
+    if not content:
+        return ''
+    text = re.sub(r'<\s*(br|/p|/li|/div|/h[1-6]|/tr|/td)[^>]*>', ' ', content, flags=re.IGNORECASE)
+    text = bleach.clean(text, tags=[], attributes={}, strip=True)
+    return re.sub(r'\s+', ' ', html.unescape(text)).strip()
+
+
+def _excerpt(text):
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+    return text[:EXCERPT_LENGTH - 1].rsplit(' ', 1)[0].rstrip(' ,.;:') + '…'
+
+
+def upgrade():
+    with op.batch_alter_table('article', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('body_html', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('excerpt', sa.String(length=300), nullable=True))
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+    # Render existing articles
+    conn = op.get_bind()
+    article = sa.table('article',
+        sa.column('id', sa.Integer),
+        sa.column('body', sa.Text),
+        sa.column('body_html', sa.Text),
+        sa.column('excerpt', sa.String),
+        sa.column('content_hash', sa.String)
+    )
+
+    rows = conn.execute(sa.select(article.c.id, article.c.body)).fetchall()
+    for article_id, body in rows:
+        body = body or ''
+        body_html = _sanitize(body)
+        conn.execute(article.update().where(article.c.id == article_id).values(
+            body_html=body_html,
+            excerpt=_excerpt(_html_to_text(body_html)),
+            content_hash=hashlib.sha256(body.encode('utf-8')).hexdigest()
+        ))
+
+
+def downgrade():
+    with op.batch_alter_table('article', schema=None) as batch_op:
+        batch_op.drop_column('content_hash')
+        batch_op.drop_column('excerpt')
+        batch_op.drop_column('body_html')
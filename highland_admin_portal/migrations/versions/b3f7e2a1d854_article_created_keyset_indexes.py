@@ -0,0 +1,27 @@
+"""article created_at keyset pagination indexes
+
+Revision ID: b3f7e2a1d854
+Revises: a9e4c1f6b238
+Create Date: 2026-10-19 18:31:44.602193
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f7e2a1d854'
+down_revision = 'a9e4c1f6b238'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('article', schema=None) as batch_op:
+        batch_op.create_index('idx_article_created', ['created_at', 'id'], unique=False)
+        batch_op.create_index('idx_article_status_created', ['status', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('article', schema=None) as batch_op:
+        batch_op.drop_index('idx_article_status_created')
+        batch_op.drop_index('idx_article_created')
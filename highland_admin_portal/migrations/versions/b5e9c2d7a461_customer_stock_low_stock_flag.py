@@ -0,0 +1,66 @@
+"""customer stock low-stock flag and list indexes
+
+Revision ID: b5e9c2d7a461
+Revises: a8d3f6b2c914
+Create Date: 2026-10-19 22:41:55.730196
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e9c2d7a461'
+down_revision = 'a8d3f6b2c914'
+branch_labels = None
+depends_on = None
+
+
+# Trigram index sync triggers as of this revision (copied so later changes to the app can't
+# alter the migration)
+SEARCH_TRIGGERS = {
+    'ai': 'AFTER INSERT ON "customer_stock" BEGIN {insert_new} END',
+    'ad': 'AFTER DELETE ON "customer_stock" BEGIN {delete_old} END',
+    'au': 'AFTER UPDATE OF product_code, product_name ON "customer_stock" BEGIN {delete_old} {insert_new} END',
+}
+DELETE_OLD = ("INSERT INTO customer_stock_trgm (customer_stock_trgm, rowid, product_code, product_name) "
+              "VALUES ('delete', old.id, old.product_code, old.product_name);")
+INSERT_NEW = ("INSERT INTO customer_stock_trgm (rowid, product_code, product_name) "
+              "VALUES (new.id, new.product_code, new.product_name);")
+
+
+def restore_search_triggers():
+    # Batch mode rebuilds the table on SQLite, which drops its trigram sync triggers
+    if op.get_bind().dialect.name == 'sqlite':
+        for suffix, body in SEARCH_TRIGGERS.items():
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS customer_stock_trgm_{suffix} "
+                       + body.format(delete_old=DELETE_OLD, insert_new=INSERT_NEW))
+
+
+def refresh_low_stock_flags():
+    stock = sa.table('customer_stock', sa.column('current_stock'), sa.column('reorder_level'),
+                     sa.column('is_low_stock'))
+    op.get_bind().execute(
+        stock.update().values(is_low_stock=stock.c.current_stock <= sa.func.coalesce(stock.c.reorder_level, 0))
+    )
+
+
+def upgrade():
+    with op.batch_alter_table('customer_stock', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_low_stock', sa.Boolean(), server_default=sa.false(), nullable=False))
+        batch_op.create_index('idx_customer_stock_product', ['product_name', 'id'], unique=False)
+        batch_op.create_index('idx_customer_stock_customer_product', ['customer_id', 'product_name', 'id'], unique=False)
+        batch_op.create_index('idx_customer_stock_low', ['is_low_stock', 'product_name', 'id'], unique=False)
+
+    restore_search_triggers()
+    refresh_low_stock_flags()
+
+
+def downgrade():
+    with op.batch_alter_table('customer_stock', schema=None) as batch_op:
+        batch_op.drop_index('idx_customer_stock_low')
+        batch_op.drop_index('idx_customer_stock_customer_product')
+        batch_op.drop_index('idx_customer_stock_product')
+        batch_op.drop_column('is_low_stock')
+
+    restore_search_triggers()
@@ -0,0 +1,59 @@
+"""promote form customer fields to indexed columns
+
+Revision ID: b7d2f4e81c39
+Revises: a3e91c5d7b20
+Create Date: 2026-10-19 14:21:40.118532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import json
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2f4e81c39'
+down_revision = 'a3e91c5d7b20'
+branch_labels = None
+depends_on = None
+
+
+form = sa.table(
+    'form',
+    sa.column('id', sa.Integer),
+    sa.column('data', sa.Text),
+    sa.column('customer_account', sa.String),
+    sa.column('customer_name', sa.String),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('form', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('customer_account', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('customer_name', sa.String(length=100), nullable=True))
+        batch_op.create_index('idx_form_customer_account', ['customer_account'], unique=False)
+        batch_op.create_index('idx_form_customer_name', ['customer_name'], unique=False)
+
+    # Backfill from the JSON data blob
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(form.c.id, form.c.data)).fetchall()
+    for row in rows:
+        try:
+            data = json.loads(row.data or '{}')
+        except ValueError:
+            continue
+        if not isinstance(data, dict):
+            continue
+        account = (data.get('customer_account') or '')[:50] or None
+        name = (data.get('customer_name') or '')[:100] or None
+        if account or name:
+            conn.execute(
+                form.update().where(form.c.id == row.id).values(customer_account=account, customer_name=name)
+            )
+
+
+def downgrade():
+    with op.batch_alter_table('form', schema=None) as batch_op:
+        batch_op.drop_index('idx_form_customer_name')
+        batch_op.drop_index('idx_form_customer_account')
+        batch_op.drop_column('customer_name')
+        batch_op.drop_column('customer_account')
@@ -0,0 +1,51 @@
+"""clearance sale ledger
+
+Revision ID: c3f8a5d1e276
+Revises: b5e9c2d7a461
+Create Date: 2026-10-19 23:16:40.581927
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3f8a5d1e276'
+down_revision = 'b5e9c2d7a461'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('clearance_sale',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=True),
+    sa.Column('pallet', sa.String(length=50), nullable=True),
+    sa.Column('qty', sa.Integer(), nullable=False),
+    sa.Column('unit_cost', sa.Float(), nullable=False),
+    sa.Column('sold_at', sa.DateTime(), nullable=False),
+    sa.Column('sold_by', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['item_id'], ['clearance_stock.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['sold_by'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('clearance_sale', schema=None) as batch_op:
+        batch_op.create_index('idx_clearance_sale_sold_at', ['sold_at'], unique=False)
+        batch_op.create_index('idx_clearance_sale_item', ['item_id', 'sold_at'], unique=False)
+        batch_op.create_index('idx_clearance_sale_pallet', ['pallet', 'sold_at'], unique=False)
+
+    # Carry existing sold quantities over as one opening sale per item, dated at its last update
+    op.execute(
+        "INSERT INTO clearance_sale (item_id, pallet, qty, unit_cost, sold_at, sold_by) "
+        "SELECT id, pallet, qty_sold, cost_price, updated_at, created_by "
+        "FROM clearance_stock WHERE qty_sold > 0"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('clearance_sale', schema=None) as batch_op:
+        batch_op.drop_index('idx_clearance_sale_pallet')
+        batch_op.drop_index('idx_clearance_sale_item')
+        batch_op.drop_index('idx_clearance_sale_sold_at')
+
+    op.drop_table('clearance_sale')
@@ -0,0 +1,72 @@
+"""article full-text search index
+
+Revision ID: c4a8e2f19d57
+Revises: b7d2f4e81c39
+Create Date: 2026-10-19 14:48:03.552917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import html
+import re
+import bleach
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a8e2f19d57'
+down_revision = 'b7d2f4e81c39'
+branch_labels = None
+depends_on = None
+
+
+def _html_to_text(content):
+    if not content:
+        return ''
+    text = re.sub(r'<\s*(br|/p|/li|/div|/h[1-6]|/tr|/td)[^>]*>', ' ', content, flags=re.IGNORECASE)
+    text = bleach.clean(text, tags=[], attributes={}, strip=True)
+    return re.sub(r'\s+', ' ', html.unescape(text)).strip()
+
+
+def upgrade():
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS article_fts "
+            "USING fts5(title, body, tags, tokenize='porter unicode61')"
+        )
+        insert = sa.text(
+            "INSERT INTO article_fts (rowid, title, body, tags) VALUES (:id, :title, :body, :tags)"
+        )
+    elif dialect == 'postgresql':
+        op.execute(
+            "CREATE TABLE IF NOT EXISTS article_fts ("
+            "article_id INTEGER PRIMARY KEY REFERENCES article(id) ON DELETE CASCADE, "
+            "title TEXT, body TEXT, tags TEXT, document TSVECTOR)"
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS idx_article_fts_document ON article_fts USING GIN (document)")
+        insert = sa.text(
+            "INSERT INTO article_fts (article_id, title, body, tags, document) "
+            "VALUES (:id, :title, :body, :tags, "
+            "setweight(to_tsvector('english', :title), 'A') || "
+            "setweight(to_tsvector('english', :tags), 'B') || "
+            "setweight(to_tsvector('english', :body), 'C'))"
+        )
+    else:
+        # Other databases fall back to LIKE search at runtime
+        return
+
+    rows = conn.execute(sa.text("SELECT id, title, body, tags FROM article")).fetchall()
+    for row in rows:
+        conn.execute(insert, {
+            'id': row.id,
+            'title': row.title or '',
+            'body': _html_to_text(row.body),
+            'tags': (row.tags or '').replace(',', ' ')
+        })
+
+
+def downgrade():
+    if op.get_bind().dialect.name in ('sqlite', 'postgresql'):
+        op.execute("DROP TABLE IF EXISTS article_fts")
@@ -0,0 +1,39 @@
+"""related articles table
+
+Revision ID: c6d2a8f4e917
+Revises: b3f7e2a1d854
+Create Date: 2026-10-19 19:04:18.335720
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6d2a8f4e917'
+down_revision = 'b3f7e2a1d854'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Populate afterwards with: flask kb-rebuild-related
+    op.create_table('related_article',
+    sa.Column('article_id', sa.Integer(), nullable=False),
+    sa.Column('related_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['article_id'], ['article.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['related_id'], ['article.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('article_id', 'related_id')
+    )
+    with op.batch_alter_table('related_article', schema=None) as batch_op:
+        batch_op.create_index('idx_related_article_score', ['article_id', 'score'], unique=False)
+        batch_op.create_index('idx_related_article_related', ['related_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('related_article', schema=None) as batch_op:
+        batch_op.drop_index('idx_related_article_related')
+        batch_op.drop_index('idx_related_article_score')
+
+    op.drop_table('related_article')
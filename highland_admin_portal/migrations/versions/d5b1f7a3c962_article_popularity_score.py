@@ -0,0 +1,54 @@
+"""article time-decayed popularity score
+
+Revision ID: d5b1f7a3c962
+Revises: c4a8e2f19d57
+Create Date: 2026-10-19 16:02:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5b1f7a3c962'
+down_revision = 'c4a8e2f19d57'
+branch_labels = None
+depends_on = None
+
+# Must match Article.POPULARITY_EPOCH / POPULARITY_HALF_LIFE_DAYS
+POPULARITY_EPOCH = datetime(2025, 1, 1)
+POPULARITY_HALF_LIFE_DAYS = 7
+
+
+def _weight(viewed_at):
+    if isinstance(viewed_at, str):
+        viewed_at = datetime.fromisoformat(viewed_at)
+    elapsed_days = (viewed_at - POPULARITY_EPOCH).total_seconds() / 86400
+    return 2 ** (elapsed_days / POPULARITY_HALF_LIFE_DAYS)
+
+
+def upgrade():
+    with op.batch_alter_table('article', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('popularity_score', sa.Float(), nullable=False, server_default='0'))
+        batch_op.create_index('idx_article_status_popularity', ['status', 'popularity_score'], unique=False)
+
+    # Backfill from recorded view history
+    conn = op.get_bind()
+    article = sa.table('article', sa.column('id', sa.Integer), sa.column('popularity_score', sa.Float))
+    article_view = sa.table('article_view', sa.column('article_id', sa.Integer), sa.column('viewed_at', sa.DateTime))
+
+    scores = {}
+    rows = conn.execute(sa.select(article_view.c.article_id, article_view.c.viewed_at)
+                        .where(article_view.c.viewed_at.isnot(None)))
+    for article_id, viewed_at in rows:
+        scores[article_id] = scores.get(article_id, 0.0) + _weight(viewed_at)
+
+    for article_id, score in scores.items():
+        conn.execute(article.update().where(article.c.id == article_id).values(popularity_score=score))
+
+
+def downgrade():
+    with op.batch_alter_table('article', schema=None) as batch_op:
+        batch_op.drop_index('idx_article_status_popularity')
+        batch_op.drop_column('popularity_score')
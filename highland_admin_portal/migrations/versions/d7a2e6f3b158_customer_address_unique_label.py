@@ -0,0 +1,91 @@
+"""unique customer address labels
+
+Revision ID: d7a2e6f3b158
+Revises: c3f8a5d1e276
+Create Date: 2026-10-19 23:52:07.314865
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a2e6f3b158'
+down_revision = 'c3f8a5d1e276'
+branch_labels = None
+depends_on = None
+
+
+LABEL_LENGTH = 100  # customer_address.label is String(100)
+ADDRESS_FIELDS = ('street', 'city', 'zip', 'phone')
+
+
+def unique_label(label, taken):
+    # "Main" -> "Main (2)", "Main (3)", ... trimmed so the suffix fits the column
+    n = 2
+    while True:
+        suffix = f' ({n})'
+        candidate = label[:LABEL_LENGTH - len(suffix)] + suffix
+        if candidate not in taken:
+            return candidate
+        n += 1
+
+
+def resolve_duplicate_labels(connection):
+    # For each (customer_id, label) used more than once, keep the primary address if any,
+    # else the oldest. A duplicate with the same street, city, zip and phone is merged into
+    # it (callsheet entries are moved across, then the row is deleted); a duplicate that
+    # differs is kept under a new label such as "Main (2)", so no address or link is lost
+    # (callsheet entries linked to it take the new label too).
+    address = sa.table('customer_address', sa.column('id'), sa.column('customer_id'),
+                       sa.column('label'), sa.column('is_primary'),
+                       *(sa.column(field) for field in ADDRESS_FIELDS))
+    entry = sa.table('callsheet_entry', sa.column('address_id'), sa.column('address_label'))
+
+    groups = sa.select(address.c.customer_id, address.c.label)\
+        .group_by(address.c.customer_id, address.c.label)\
+        .having(sa.func.count() > 1)\
+        .subquery()
+    rows = connection.execute(
+        sa.select(address)
+        .join(groups, sa.and_(address.c.customer_id == groups.c.customer_id, address.c.label == groups.c.label))
+        .order_by(address.c.customer_id, address.c.label, address.c.id)
+    ).fetchall()
+
+    duplicates = {}
+    for row in rows:
+        duplicates.setdefault((row.customer_id, row.label), []).append(row)
+
+    labels = {}
+    for customer_id, label in connection.execute(
+        sa.select(address.c.customer_id, address.c.label)
+        .where(address.c.customer_id.in_({customer_id for customer_id, _ in duplicates}))
+    ):
+        labels.setdefault(customer_id, set()).add(label)
+
+    for (customer_id, label), group in duplicates.items():
+        keep = next((row for row in group if row.is_primary), group[0])
+        fields = tuple(getattr(keep, field) or '' for field in ADDRESS_FIELDS)
+        for row in group:
+            if row.id == keep.id:
+                continue
+            if tuple(getattr(row, field) or '' for field in ADDRESS_FIELDS) == fields:
+                connection.execute(entry.update().where(entry.c.address_id == row.id).values(address_id=keep.id))
+                connection.execute(address.delete().where(address.c.id == row.id))
+            else:
+                new_label = unique_label(label, labels[customer_id])
+                labels[customer_id].add(new_label)
+                connection.execute(address.update().where(address.c.id == row.id).values(label=new_label))
+                connection.execute(entry.update().where(entry.c.address_id == row.id).values(address_label=new_label))
+
+
+def upgrade():
+    resolve_duplicate_labels(op.get_bind())
+
+    with op.batch_alter_table('customer_address', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_customer_address_label', ['customer_id', 'label'])
+
+
+def downgrade():
+    with op.batch_alter_table('customer_address', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_customer_address_label', type_='unique')
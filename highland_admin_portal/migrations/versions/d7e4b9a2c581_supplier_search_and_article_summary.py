@@ -0,0 +1,143 @@
+"""supplier contact fields, search index and article summary
+
+Revision ID: d7e4b9a2c581
+Revises: c6d2a8f4e917
+Create Date: 2026-10-19 19:41:52.108374
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import json
+import re
+from datetime import datetime
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7e4b9a2c581'
+down_revision = 'c6d2a8f4e917'
+branch_labels = None
+depends_on = None
+
+
+# Search text and summaries as of this revision (copied so later changes to the app can't alter
+# the migration)
+SEARCH_FIELDS = ('name', 'category', 'contact_name', 'email', 'phone', 'website', 'address', 'contact_info')
+
+
+def _search_text(row):
+    parts = [getattr(row, field) for field in SEARCH_FIELDS]
+    if row.phone:
+        parts.append(re.sub(r'\D', '', row.phone))
+    return re.sub(r'\s+', ' ', ' '.join(p for p in parts if p)).strip().lower()
+
+
+def _store_summaries(conn, supplier_ids):
+    if not supplier_ids:
+        return
+    article = sa.table('article', sa.column('id'), sa.column('supplier_id'), sa.column('category_id'),
+                       sa.column('status'), sa.column('title'), sa.column('created_at'))
+    summary = sa.table('supplier_article_summary', sa.column('supplier_id'), sa.column('article_count'),
+                       sa.column('latest_article_id'), sa.column('latest_article_title'),
+                       sa.column('latest_published_at'), sa.column('category_counts'), sa.column('updated_at'))
+    published = sa.and_(article.c.status == 'published', article.c.supplier_id.in_(supplier_ids))
+
+    category_counts = {sid: {} for sid in supplier_ids}
+    rows = conn.execute(
+        sa.select(article.c.supplier_id, article.c.category_id, sa.func.count())
+        .where(published)
+        .group_by(article.c.supplier_id, article.c.category_id)
+    )
+    for supplier_id, category_id, count in rows:
+        if category_id is not None:
+            category_counts[supplier_id][str(category_id)] = count
+
+    ranked = sa.select(
+        article.c.supplier_id, article.c.id, article.c.title, article.c.created_at,
+        sa.func.count().over(partition_by=article.c.supplier_id).label('article_count'),
+        sa.func.row_number().over(
+            partition_by=article.c.supplier_id,
+            order_by=(article.c.created_at.desc(), article.c.id.desc())
+        ).label('position')
+    ).where(published).subquery()
+    latest = {row.supplier_id: row for row in conn.execute(sa.select(ranked).where(ranked.c.position == 1))}
+
+    now = datetime.utcnow()
+    values = []
+    for supplier_id in supplier_ids:
+        row = latest.get(supplier_id)
+        values.append({
+            'supplier_id': supplier_id,
+            'article_count': row.article_count if row else 0,
+            'latest_article_id': row.id if row else None,
+            'latest_article_title': row.title if row else None,
+            'latest_published_at': row.created_at if row else None,
+            'category_counts': json.dumps(category_counts[supplier_id], sort_keys=True),
+            'updated_at': now
+        })
+    conn.execute(summary.insert(), values)
+
+
+def upgrade():
+    with op.batch_alter_table('supplier', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('description', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('contact_name', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('phone', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('email', sa.String(length=120), nullable=True))
+        batch_op.add_column(sa.Column('address', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('search_text', sa.Text(), nullable=True))
+
+    op.create_table('supplier_article_summary',
+    sa.Column('supplier_id', sa.Integer(), nullable=False),
+    sa.Column('article_count', sa.Integer(), nullable=False),
+    sa.Column('latest_article_id', sa.Integer(), nullable=True),
+    sa.Column('latest_article_title', sa.String(length=200), nullable=True),
+    sa.Column('latest_published_at', sa.DateTime(), nullable=True),
+    sa.Column('category_counts', sa.Text(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['supplier_id'], ['supplier.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['latest_article_id'], ['article.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('supplier_id')
+    )
+
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS supplier_fts USING fts5(search_text, tokenize='trigram')")
+    elif dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX IF NOT EXISTS idx_supplier_search_trgm ON supplier USING GIN (search_text gin_trgm_ops)")
+
+    # Backfill search text and summaries for existing suppliers
+    supplier = sa.table('supplier', sa.column('id', sa.Integer), sa.column('search_text', sa.Text),
+                        *[sa.column(field, sa.Text) for field in SEARCH_FIELDS])
+
+    rows = conn.execute(sa.select(supplier)).fetchall()
+    for row in rows:
+        search_text = _search_text(row)
+        conn.execute(supplier.update().where(supplier.c.id == row.id).values(search_text=search_text))
+        if dialect == 'sqlite':
+            conn.execute(sa.text("INSERT INTO supplier_fts (rowid, search_text) VALUES (:id, :search_text)"),
+                         {'id': row.id, 'search_text': search_text})
+
+    _store_summaries(conn, [row.id for row in rows])
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS supplier_fts")
+    elif conn.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS idx_supplier_search_trgm")
+
+    op.drop_table('supplier_article_summary')
+
+    with op.batch_alter_table('supplier', schema=None) as batch_op:
+        batch_op.drop_column('search_text')
+        batch_op.drop_column('address')
+        batch_op.drop_column('email')
+        batch_op.drop_column('phone')
+        batch_op.drop_column('contact_name')
+        batch_op.drop_column('description')
+        batch_op.drop_column('category')
@@ -0,0 +1,89 @@
+"""trigram search indexes
+
+Revision ID: e1b5c8d3f726
+Revises: d7e4b9a2c581
+Create Date: 2026-10-19 20:27:40.915283
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1b5c8d3f726'
+down_revision = 'd7e4b9a2c581'
+branch_labels = None
+depends_on = None
+
+SEARCH_INDEXES = {
+    'customer': ('account_number', 'name', 'contact_name'),
+    'product': ('code', 'name', 'description'),
+    'customer_stock': ('product_code', 'product_name'),
+    'clearance_stock': ('supplier_code', 'his_code', 'description', 'pallet'),
+    'form': ('customer_account', 'customer_name'),
+}
+
+
+# Index DDL as of this revision (copied so later changes to the app can't alter the migration)
+def sqlite_statements(table_name, fields):
+    fts = f'{table_name}_trgm'
+    columns = ', '.join(fields)
+    new_values = ', '.join(f'new.{f}' for f in fields)
+    old_values = ', '.join(f'old.{f}' for f in fields)
+    delete_old = f"INSERT INTO {fts} ({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    insert_new = f"INSERT INTO {fts} (rowid, {columns}) VALUES (new.id, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{columns}, content='{table_name}', content_rowid='id', tokenize='trigram')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON "{table_name}" BEGIN {insert_new} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON "{table_name}" BEGIN {delete_old} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON "{table_name}" '
+        f'BEGIN {delete_old} {insert_new} END',
+    ]
+
+
+def sqlite_rebuild_statement(table_name):
+    fts = f'{table_name}_trgm'
+    return f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')"
+
+
+def sqlite_drop_statements(table_name):
+    fts = f'{table_name}_trgm'
+    return [f'DROP TRIGGER IF EXISTS {fts}_{suffix}' for suffix in ('ai', 'ad', 'au')] + \
+        [f'DROP TABLE IF EXISTS {fts}']
+
+
+def postgres_statements(table_name, fields):
+    return ['CREATE EXTENSION IF NOT EXISTS pg_trgm'] + [
+        f'CREATE INDEX IF NOT EXISTS idx_{table_name}_{field}_trgm ON "{table_name}" USING GIN ({field} gin_trgm_ops)'
+        for field in fields
+    ]
+
+
+def postgres_drop_statements(table_name, fields):
+    return [f'DROP INDEX IF EXISTS idx_{table_name}_{field}_trgm' for field in fields]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    for table_name, fields in SEARCH_INDEXES.items():
+        if dialect == 'sqlite':
+            for statement in sqlite_statements(table_name, fields):
+                op.execute(statement)
+            op.execute(sqlite_rebuild_statement(table_name))
+        elif dialect == 'postgresql':
+            for statement in postgres_statements(table_name, fields):
+                op.execute(statement)
+        # Other databases keep using plain ILIKE
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    for table_name, fields in SEARCH_INDEXES.items():
+        if dialect == 'sqlite':
+            for statement in sqlite_drop_statements(table_name):
+                op.execute(statement)
+        elif dialect == 'postgresql':
+            for statement in postgres_drop_statements(table_name, fields):
+                op.execute(statement)
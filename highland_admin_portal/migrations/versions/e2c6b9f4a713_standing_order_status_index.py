@@ -0,0 +1,28 @@
+"""index standing orders on status only
+
+Revision ID: e2c6b9f4a713
+Revises: d7a2e6f3b158
+Create Date: 2026-10-20 09:12:44.208153
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2c6b9f4a713'
+down_revision = 'd7a2e6f3b158'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # delivery_mask was never usable in the index: delivers_on() filters on a bitwise AND of it
+    with op.batch_alter_table('standing_order', schema=None) as batch_op:
+        batch_op.drop_index('idx_standing_order_status_mask')
+        batch_op.create_index('idx_standing_order_status', ['status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('standing_order', schema=None) as batch_op:
+        batch_op.drop_index('idx_standing_order_status')
+        batch_op.create_index('idx_standing_order_status_mask', ['status', 'delivery_mask'], unique=False)
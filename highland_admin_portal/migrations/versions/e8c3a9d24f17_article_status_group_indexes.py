@@ -0,0 +1,27 @@
+"""article status/category and status/supplier indexes
+
+Revision ID: e8c3a9d24f17
+Revises: d5b1f7a3c962
+Create Date: 2026-10-19 16:40:12.530871
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c3a9d24f17'
+down_revision = 'd5b1f7a3c962'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('article', schema=None) as batch_op:
+        batch_op.create_index('idx_article_status_category', ['status', 'category_id'], unique=False)
+        batch_op.create_index('idx_article_status_supplier', ['status', 'supplier_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('article', schema=None) as batch_op:
+        batch_op.drop_index('idx_article_status_supplier')
+        batch_op.drop_index('idx_article_status_category')
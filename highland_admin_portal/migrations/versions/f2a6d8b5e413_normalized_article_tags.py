@@ -0,0 +1,75 @@
+"""normalized article tags
+
+Revision ID: f2a6d8b5e413
+Revises: e8c3a9d24f17
+Create Date: 2026-10-19 17:15:27.904316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a6d8b5e413'
+down_revision = 'e8c3a9d24f17'
+branch_labels = None
+depends_on = None
+
+
+def _parse_tags(tags_string):
+    # Must match Tag.parse()
+    names = []
+    for part in (tags_string or '').split(','):
+        name = ' '.join(part.split()).lower()[:50]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def upgrade():
+    op.create_table('tag',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('article_tag',
+    sa.Column('article_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['article_id'], ['article.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('article_id', 'tag_id')
+    )
+    with op.batch_alter_table('article_tag', schema=None) as batch_op:
+        batch_op.create_index('idx_article_tag_tag', ['tag_id', 'article_id'], unique=False)
+
+    # Split existing comma-separated tag strings
+    conn = op.get_bind()
+    article = sa.table('article', sa.column('id', sa.Integer), sa.column('tags', sa.String))
+    tag = sa.table('tag', sa.column('id', sa.Integer), sa.column('name', sa.String))
+    article_tag = sa.table('article_tag', sa.column('article_id', sa.Integer), sa.column('tag_id', sa.Integer))
+
+    article_tags = {
+        row.id: _parse_tags(row.tags)
+        for row in conn.execute(sa.select(article.c.id, article.c.tags).where(article.c.tags.isnot(None)))
+    }
+    names = sorted({name for tag_names in article_tags.values() for name in tag_names})
+    if not names:
+        return
+
+    op.bulk_insert(tag, [{'name': name} for name in names])
+    tag_ids = dict((row.name, row.id) for row in conn.execute(sa.select(tag.c.name, tag.c.id)))
+
+    op.bulk_insert(article_tag, [
+        {'article_id': article_id, 'tag_id': tag_ids[name]}
+        for article_id, tag_names in article_tags.items()
+        for name in tag_names
+    ])
+
+
+def downgrade():
+    with op.batch_alter_table('article_tag', schema=None) as batch_op:
+        batch_op.drop_index('idx_article_tag_tag')
+
+    op.drop_table('article_tag')
+    op.drop_table('tag')
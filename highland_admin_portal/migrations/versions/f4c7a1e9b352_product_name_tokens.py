@@ -0,0 +1,53 @@
+"""product name tokens for prefix search
+
+Revision ID: f4c7a1e9b352
+Revises: e1b5c8d3f726
+Create Date: 2026-10-19 21:12:06.437519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import re
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4c7a1e9b352'
+down_revision = 'e1b5c8d3f726'
+branch_labels = None
+depends_on = None
+
+MAX_TOKEN_LENGTH = 100
+
+
+# Tokenizer as of this revision (copied so later changes to the app can't alter the migration)
+def _tokenize(name):
+    return list(dict.fromkeys(w[:MAX_TOKEN_LENGTH] for w in re.findall(r'[a-z0-9]+', (name or '').lower())))
+
+
+def upgrade():
+    product_name_token = op.create_table('product_name_token',
+    sa.Column('token', sa.String(length=100), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('token', 'product_id')
+    )
+    with op.batch_alter_table('product_name_token', schema=None) as batch_op:
+        batch_op.create_index('idx_product_name_token_product', ['product_id'], unique=False)
+
+    # Backfill tokens for existing products
+    conn = op.get_bind()
+    product = sa.table('product', sa.column('id', sa.Integer), sa.column('name', sa.String))
+    rows = [
+        {'token': token, 'product_id': row.id}
+        for row in conn.execute(sa.select(product.c.id, product.c.name))
+        for token in _tokenize(row.name)
+    ]
+    if rows:
+        op.bulk_insert(product_name_token, rows)
+
+
+def downgrade():
+    with op.batch_alter_table('product_name_token', schema=None) as batch_op:
+        batch_op.drop_index('idx_product_name_token_product')
+
+    op.drop_table('product_name_token')
@@ -0,0 +1,39 @@
+"""article popularity score in log space
+
+Revision ID: f8d3a7c1e594
+Revises: e2c6b9f4a713
+Create Date: 2026-10-20 09:40:27.651930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import math
+
+
+# revision identifiers, used by Alembic.
+revision = 'f8d3a7c1e594'
+down_revision = 'e2c6b9f4a713'
+branch_labels = None
+depends_on = None
+
+
+article = sa.table('article', sa.column('id', sa.Integer), sa.column('popularity_score', sa.Float))
+
+
+def _convert(to_score):
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(article.c.id, article.c.popularity_score)).fetchall()
+    for row in rows:
+        conn.execute(
+            article.update().where(article.c.id == row.id)
+            .values(popularity_score=to_score(row.popularity_score or 0))
+        )
+
+
+def upgrade():
+    # Sum of view weights -> log2(1 + sum), which stays small however far the epoch recedes
+    _convert(lambda total: math.log2(1 + max(total, 0)))
+
+
+def downgrade():
+    _convert(lambda score: 2 ** score - 1)
@@ -0,0 +1,83 @@
+"""
+Shared fixtures: an app on the in-memory testing database, a logged-in
+test client and a statement counter for query-count assertions.
+"""
+
+import os
+import sys
+
+os.environ['FLASK_ENV'] = 'testing'
+os.environ.setdefault('SECRET_KEY', 'test-secret-key-not-secure-' + 'x' * 16)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import event
+from app import create_app, db as _db
+from app.models import User
+
+
+@pytest.fixture
+def app():
+    # Requests get their own app context (and so a fresh session and flask.g);
+    # push app.app_context() in a test to seed or inspect the database.
+    app = create_app()
+    with app.app_context():
+        _db.create_all()
+    yield app
+    with app.app_context():
+        _db.drop_all()
+
+
+@pytest.fixture
+def db(app):
+    return _db
+
+
+@pytest.fixture
+def user_id(app, db):
+    with app.app_context():
+        user = User(username='tester', email='tester@example.com', full_name='Test User',
+                    password_hash='x', role='admin')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def client(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+class QueryCounter:
+    """Counts SQL statements run through the engine while active"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_queries(app, db):
+    """Usage: with count_queries() as counter: ...; counter.count"""
+    with app.app_context():
+        engine = db.engine
+    return lambda: QueryCounter(engine)
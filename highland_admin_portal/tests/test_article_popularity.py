@@ -0,0 +1,37 @@
+"""Article popularity is a forward-decayed view count stored in log2 space"""
+
+import math
+from datetime import datetime, timedelta
+from app.models import Article
+
+
+def test_add_popularity_matches_linear_sum():
+    views = [datetime(2025, 3, 1), datetime(2025, 3, 8), datetime(2025, 6, 1, 12)]
+    linear = sum(2 ** Article.popularity_log_weight(when) for when in views)
+
+    score = 0.0
+    for when in views:
+        score = Article.add_popularity(score, [when])
+
+    assert math.isclose(score, math.log2(1 + linear))
+    assert math.isclose(Article.add_popularity(0.0, views), score)
+
+
+def test_score_stays_finite_far_from_epoch():
+    far = datetime(2200, 1, 1)
+    score = Article.add_popularity(0.0, [far] * 1000)
+    assert math.isfinite(score)
+    assert Article.add_popularity(score, [far + timedelta(days=7)]) > score
+
+
+def test_newer_views_rank_higher():
+    now = datetime.utcnow()
+    recent = Article.add_popularity(0.0, [now] * 3)
+    stale = Article.add_popularity(0.0, [now - timedelta(days=28)] * 10)
+    assert recent > stale
+
+
+def test_trending_score_counts_recent_views():
+    article = Article(popularity_score=Article.add_popularity(0.0, [datetime.utcnow()] * 4))
+    assert math.isclose(article.trending_score, 4, rel_tol=1e-3)
+    assert Article(popularity_score=0.0).trending_score < 1e-9
@@ -0,0 +1,88 @@
+"""Clearance batch sales commit per line (or all or nothing) and reports read the sale ledger"""
+
+from datetime import datetime
+import pytest
+from app.models import ClearanceStock, ClearanceSale
+from app.clearance_sales import sales_summary
+
+
+@pytest.fixture
+def item_ids(app, db, user_id):
+    with app.app_context():
+        items = [
+            ClearanceStock(qty=5, supplier_code='SC-1', description='Blue roll', cost_price=2.0, pallet='P1',
+                           created_by=user_id),
+            ClearanceStock(qty=2, supplier_code='SC-2', description='Mop head', cost_price=10.0, pallet='P1',
+                           created_by=user_id),
+            ClearanceStock(qty=4, supplier_code='SC-3', description='Bin liners', cost_price=1.5, pallet='P2',
+                           created_by=user_id),
+        ]
+        db.session.add_all(items)
+        db.session.commit()
+        return [item.id for item in items]
+
+
+def quantities(db, item_ids):
+    return [db.session.get(ClearanceStock, item_id).qty for item_id in item_ids]
+
+
+def sell(client, item_ids, quantities, **options):
+    lines = [{'item_id': item_id, 'qty': qty} for item_id, qty in zip(item_ids, quantities)]
+    return client.post('/clearance/api/clearance-stock/sell', json={'lines': lines, **options})
+
+
+def test_partial_batch_commits_the_lines_that_fit(app, db, client, item_ids):
+    response = sell(client, item_ids, [3, 5, 1])
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [line['success'] for line in body['lines']] == [True, False, True]
+    assert 'Only 2 available' in body['lines'][1]['message']
+    assert all('sale_id' in body['lines'][i] for i in (0, 2))
+    with app.app_context():
+        assert quantities(db, item_ids) == [2, 2, 3]
+        assert ClearanceSale.query.count() == 2
+
+
+def test_all_or_nothing_batch_sells_nothing_when_a_line_fails(app, db, client, item_ids):
+    response = sell(client, item_ids, [3, 5, 1], all_or_nothing=True)
+
+    assert response.status_code == 400
+    assert [line['success'] for line in response.get_json()['lines']] == [True, False, True]
+    with app.app_context():
+        assert quantities(db, item_ids) == [5, 2, 4]
+        assert ClearanceSale.query.count() == 0
+
+
+def test_sales_summary_groups_the_ledger(app, db, user_id, item_ids):
+    blue_roll, mop_head, bin_liners = item_ids
+    with app.app_context():
+        db.session.add_all([
+            ClearanceSale(item_id=blue_roll, pallet='P1', qty=2, unit_cost=2.0, sold_by=user_id,
+                          sold_at=datetime(2026, 3, 2, 9, 30)),
+            ClearanceSale(item_id=mop_head, pallet='P1', qty=1, unit_cost=10.0, sold_by=user_id,
+                          sold_at=datetime(2026, 3, 2, 15, 0)),
+            ClearanceSale(item_id=blue_roll, pallet='P1', qty=1, unit_cost=2.0, sold_by=user_id,
+                          sold_at=datetime(2026, 3, 3, 11, 0)),
+            ClearanceSale(item_id=bin_liners, pallet='P2', qty=4, unit_cost=1.5, sold_by=user_id,
+                          sold_at=datetime(2026, 3, 3, 16, 45)),
+        ])
+        db.session.commit()
+
+        assert sales_summary('day') == [
+            {'key': '2026-03-02', 'sale_count': 2, 'qty': 3, 'cost_value': 14.0},
+            {'key': '2026-03-03', 'sale_count': 2, 'qty': 5, 'cost_value': 8.0},
+        ]
+        assert sales_summary('pallet') == [
+            {'key': 'P1', 'sale_count': 3, 'qty': 4, 'cost_value': 16.0},
+            {'key': 'P2', 'sale_count': 1, 'qty': 4, 'cost_value': 6.0},
+        ]
+        assert sales_summary('item') == [
+            {'key': blue_roll, 'sale_count': 2, 'qty': 3, 'cost_value': 6.0},
+            {'key': mop_head, 'sale_count': 1, 'qty': 1, 'cost_value': 10.0},
+            {'key': bin_liners, 'sale_count': 1, 'qty': 4, 'cost_value': 6.0},
+        ]
+        assert sales_summary('pallet', start=datetime(2026, 3, 3), end=datetime(2026, 3, 4)) == [
+            {'key': 'P1', 'sale_count': 1, 'qty': 1, 'cost_value': 2.0},
+            {'key': 'P2', 'sale_count': 1, 'qty': 4, 'cost_value': 6.0},
+        ]
@@ -0,0 +1,28 @@
+"""The customer overview clamps its list sizes"""
+
+import pytest
+from datetime import datetime, timedelta
+from app.models import Customer, CallHistory
+
+
+@pytest.fixture
+def customer_id(app, db, user_id):
+    with app.app_context():
+        customer = Customer(account_number='ACC1', name='Test Customer')
+        db.session.add(customer)
+        db.session.flush()
+        now = datetime.utcnow()
+        db.session.add_all(
+            CallHistory(customer_id=customer.id, call_date=now - timedelta(minutes=i),
+                        call_status='ordered', called_by=user_id)
+            for i in range(60)
+        )
+        db.session.commit()
+        return customer.id
+
+
+@pytest.mark.parametrize('calls, expected', [('-1', 1), ('0', 1), ('5', 5), ('500', 50)])
+def test_call_limit_is_clamped(client, customer_id, calls, expected):
+    response = client.get(f'/customers/api/{customer_id}/overview?calls={calls}')
+    assert response.status_code == 200
+    assert len(response.json['recent_calls']) == expected
@@ -0,0 +1,87 @@
+"""Incremental related-article refreshes agree with a full rebuild and run after commit"""
+
+import pytest
+from app.models import Article, RelatedArticle
+from app.kb_related import RelatedArticleIndex, related_article_index
+
+BODIES = [
+    'degreaser kitchen floor grease',
+    'degreaser kitchen oven grease',
+    'degreaser floor mop bucket',
+    'kitchen oven cleaner grease',
+    'floor mop bucket wringer',
+    'oven cleaner degreaser spray',
+    'bucket wringer mop trolley',
+]
+
+
+@pytest.fixture
+def index(monkeypatch):
+    # Refresh explicitly in the test instead of after each commit
+    monkeypatch.setattr(related_article_index, 'queue_refresh', lambda article_ids: None)
+    return RelatedArticleIndex(top_k=2)
+
+
+@pytest.fixture
+def article_ids(app, db, user_id):
+    with app.app_context():
+        articles = [Article(title=f'Article {i}', body=f'<p>{body}</p>', status='published', author_id=user_id)
+                    for i, body in enumerate(BODIES, start=1)]
+        db.session.add_all(articles)
+        db.session.commit()
+        return [article.id for article in articles]
+
+
+def related_lists(db):
+    lists = {}
+    for row in RelatedArticle.query.order_by(RelatedArticle.article_id, RelatedArticle.score.desc()).all():
+        lists.setdefault(row.article_id, []).append(row.related_id)
+    return lists
+
+
+@pytest.mark.parametrize('change', ['unpublish', 'delete'])
+def test_refresh_after_removal_matches_rebuild(app, db, index, article_ids, change):
+    removed_id = article_ids[0]
+    with app.app_context():
+        index.rebuild()
+        assert any(removed_id in related for related in related_lists(db).values())
+
+        article = db.session.get(Article, removed_id)
+        if change == 'unpublish':
+            article.status = 'draft'
+        else:
+            db.session.delete(article)
+        db.session.commit()
+
+        index.refresh({removed_id})
+        incremental = related_lists(db)
+
+        index.rebuild()
+        assert incremental == related_lists(db)
+        assert all(len(related) == 2 for related in incremental.values())
+
+
+def publish(app, db, user_id, body):
+    with app.app_context():
+        article = Article(title='Degreaser guide', body=f'<p>{body}</p>', status='published', author_id=user_id)
+        db.session.add(article)
+        db.session.commit()
+        return article.id
+
+
+def listed_with(app, db, article_id):
+    with app.app_context():
+        return {row.related_id for row in RelatedArticle.query.filter_by(article_id=article_id)}
+
+
+def test_commit_refreshes_in_the_committing_thread(app, db, user_id, article_ids):
+    assert not related_article_index.run_async
+    new_id = publish(app, db, user_id, BODIES[0])
+    assert article_ids[0] in listed_with(app, db, new_id)
+
+
+def test_commit_refreshes_on_the_worker(app, db, user_id, article_ids, monkeypatch):
+    monkeypatch.setattr(related_article_index, 'run_async', True)
+    new_id = publish(app, db, user_id, BODIES[0])
+    related_article_index.wait()
+    assert article_ids[0] in listed_with(app, db, new_id)
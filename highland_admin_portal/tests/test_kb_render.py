@@ -0,0 +1,59 @@
+"""The article API's ETag and payload cache follow every field the payload shows"""
+
+import pytest
+from app.models import Article, Category, Supplier, User
+from app.kb_render import article_meta, article_etag, TRENDING_REFRESH_SECONDS
+
+
+@pytest.fixture
+def article_id(app, db, user_id):
+    with app.app_context():
+        category = Category(name='Cleaning')
+        supplier = Supplier(name='Acme Chemicals')
+        db.session.add_all([category, supplier])
+        db.session.flush()
+        article = Article(title='Floor cleaner', body='<p>Dilute 1:40</p>', status='published',
+                          author_id=user_id, category_id=category.id, supplier_id=supplier.id)
+        db.session.add(article)
+        db.session.commit()
+        return article.id
+
+
+def get_article(client, article_id, etag=None):
+    headers = {'If-None-Match': f'W/"{etag}"'} if etag else {}
+    return client.get(f'/kb/articles/api/{article_id}', headers=headers)
+
+
+@pytest.mark.parametrize('model, rename', [
+    (Category, lambda article: article.category),
+    (Supplier, lambda article: article.supplier),
+    (User, lambda article: article.author),
+])
+def test_renamed_related_record_changes_etag_and_payload(app, db, client, article_id, model, rename):
+    first = get_article(client, article_id)
+    etag = first.get_etag()[0]
+    assert get_article(client, article_id, etag).status_code == 304
+
+    with app.app_context():
+        record = rename(db.session.get(Article, article_id))
+        if model is User:
+            record.full_name = 'Renamed'
+        else:
+            record.name = 'Renamed'
+        db.session.commit()
+
+    second = get_article(client, article_id, etag)
+    assert second.status_code == 200
+    assert 'Renamed' in (second.json['category_name'], second.json['supplier_name'], second.json['author_name'])
+
+
+def test_popularity_and_time_window_change_etag(app, db, article_id):
+    with app.app_context():
+        meta = article_meta(article_id)
+        etag = article_etag(article_id, meta, now=0)
+        assert article_etag(article_id, meta, now=TRENDING_REFRESH_SECONDS - 1) == etag
+        assert article_etag(article_id, meta, now=TRENDING_REFRESH_SECONDS) != etag
+
+        db.session.get(Article, article_id).popularity_score = 5.0
+        db.session.commit()
+        assert article_etag(article_id, article_meta(article_id), now=0) != etag
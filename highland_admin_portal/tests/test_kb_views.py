@@ -0,0 +1,82 @@
+"""Buffered article views survive a failed flush and app re-binding"""
+
+import atexit
+import pytest
+from app.models import Article, ArticleView
+from app.kb_views import ArticleViewBuffer
+
+
+@pytest.fixture
+def article_id(app, db, user_id):
+    with app.app_context():
+        article = Article(title='Hand soap dilution', body='Mix 1:10', status='published', author_id=user_id)
+        db.session.add(article)
+        db.session.commit()
+        return article.id
+
+
+@pytest.fixture
+def buffer(app):
+    buffer = ArticleViewBuffer()
+    buffer.app = app
+    buffer._ensure_thread = lambda: None  # Flush explicitly
+    return buffer
+
+
+def fail_once(buffer):
+    write = buffer._write
+
+    def failing(pending):
+        buffer._write = write
+        raise RuntimeError('lock timeout')
+    buffer._write = failing
+
+
+def test_failed_flush_requeues_views(app, db, buffer, article_id, user_id):
+    for _ in range(3):
+        buffer.record(article_id, user_id)
+    fail_once(buffer)
+
+    assert buffer.flush() == 0
+    assert buffer.pending_views(article_id) == 3
+
+    buffer.record(article_id, user_id)
+    assert buffer.flush() == 4
+    assert buffer.pending_views(article_id) == 0
+    with app.app_context():
+        assert ArticleView.query.count() == 4
+        assert db.session.get(Article, article_id).view_count == 4
+
+
+def test_requeue_keeps_newest_views_up_to_cap(app, buffer, article_id, user_id):
+    buffer.max_pending = 5
+    for _ in range(4):
+        buffer.record(article_id, user_id)
+    fail_once(buffer)
+    buffer.flush()
+    assert buffer.pending_views(article_id) == 4
+
+    for _ in range(3):
+        buffer.record(article_id, user_id)
+    newest = buffer._pending[(article_id, user_id)][-3:]
+    fail_once(buffer)
+    buffer.flush()
+
+    hits = buffer._pending[(article_id, user_id)]
+    assert len(hits) == 5
+    assert hits[-3:] == newest
+    assert hits == sorted(hits)
+
+
+def test_rebinding_registers_one_exit_flush_and_stops_the_old_flusher(app, monkeypatch):
+    registered = []
+    monkeypatch.setattr(atexit, 'register', registered.append)
+    buffer = ArticleViewBuffer(flush_interval=60)
+
+    buffer.init_app(app)
+    buffer._ensure_thread()
+    first_flusher = buffer._thread
+    buffer.init_app(app)
+
+    assert not first_flusher.is_alive()
+    assert registered == [buffer.flush]
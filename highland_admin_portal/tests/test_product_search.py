@@ -0,0 +1,56 @@
+"""Staged product search and its result cache"""
+
+import pytest
+from app.models import Product
+from app.product_search import product_search
+
+
+@pytest.fixture
+def catalogue(app, db):
+    with app.app_context():
+        db.session.add_all([
+            Product(code='Ab100', name='Mixed case code'),
+            Product(code='AB200', name='Upper case code'),
+            Product(code='ZX300', name='Copper pipe fitting'),
+            Product(code='ZX301', name='Copper elbow'),
+            Product(code='ZX302', name='Brass pipe', description='Fits copper pipe'),
+        ])
+        db.session.commit()
+    product_search.clear_cache()
+    yield
+    product_search.clear_cache()
+
+
+def codes(results):
+    return [result['code'] for result in results]
+
+
+def test_cache_keys_on_query_as_typed(app, catalogue):
+    with app.app_context():
+        assert codes(product_search.search('Ab'))[0] == 'Ab100'
+        assert codes(product_search.search('AB'))[0] == 'AB200'
+        assert codes(product_search.search('Ab'))[0] == 'Ab100'
+
+
+def test_every_word_prefixes_a_name_word(app, catalogue):
+    with app.app_context():
+        assert codes(product_search.search('cop pip')) == ['ZX300']
+        assert codes(product_search.search('copper')) == ['ZX300', 'ZX301', 'ZX302']
+
+
+def test_substring_stage_fills_remaining_results(app, catalogue):
+    with app.app_context():
+        assert sorted(codes(product_search.search('opper'))) == ['ZX300', 'ZX301', 'ZX302']
+        assert len(product_search.search('opper', limit=1)) == 1
+
+
+def test_name_with_several_matching_words_takes_one_slot(app, db, catalogue):
+    with app.app_context():
+        db.session.add_all([
+            Product(code='CL400', name='Anti-unclean spray'),  # Substring match only
+            Product(code='CL100', name='Cleaner clean cleaning'),
+            Product(code='CL200', name='Cleaning cloth'),
+            Product(code='CL300', name='Clean room wipes'),
+        ])
+        db.session.commit()
+        assert codes(product_search.search('clean', limit=3)) == ['CL100', 'CL300', 'CL200']
@@ -0,0 +1,68 @@
+"""
+Forms listing and the dashboard feeds resolve authors and completers
+through joins, so the number of queries per page doesn't grow with the
+number of rows (or distinct users) shown.
+"""
+
+import json
+from datetime import datetime, timedelta
+import pytest
+from app.models import User, Form, Customer, Callsheet, CallsheetEntry, CompanyUpdate
+
+
+def seed(db, rows):
+    """Add rows forms, updates and callsheet entries, each by a new user"""
+    tag = User.query.count()
+    now = datetime.utcnow()
+    users = [User(username=f'user{tag + i}', email=f'user{tag + i}@example.com', full_name=f'User {i}',
+                  password_hash='x', role='staff') for i in range(rows)]
+    db.session.add_all(users)
+    db.session.flush()
+
+    customer = Customer(account_number=f'ACC{tag}', name='Test Customer')
+    db.session.add(customer)
+    db.session.flush()
+
+    for i, user in enumerate(users):
+        completer = users[(i + 1) % rows]
+        db.session.add(Form(
+            type='returns',
+            data=json.dumps({'customer_account': 'ACC1', 'customer_name': 'Test Customer'}),
+            date_created=now - timedelta(minutes=i),
+            user_id=user.id,
+            is_completed=i % 2 == 0,
+            completed_date=now - timedelta(minutes=i) if i % 2 == 0 else None,
+            completed_by=completer.id if i % 2 == 0 else None,
+            customer_account='ACC1',
+            customer_name='Test Customer'
+        ))
+        db.session.add(CompanyUpdate(title=f'Update {i}', message='Hello', user_id=user.id,
+                                     created_at=now - timedelta(minutes=i)))
+        callsheet = Callsheet(name=f'Sheet {i}', day_of_week='Monday', month=now.month, year=now.year,
+                              created_by=user.id, created_at=now - timedelta(minutes=i))
+        db.session.add(callsheet)
+        db.session.flush()
+        db.session.add(CallsheetEntry(callsheet_id=callsheet.id, customer_id=customer.id, user_id=user.id))
+    db.session.commit()
+
+
+def queries_for(app, db, client, count_queries, rows, url):
+    with app.app_context():
+        seed(db, rows)
+    with count_queries() as counter:
+        response = client.get(url)
+    assert response.status_code == 200
+    return counter.count
+
+
+@pytest.mark.parametrize('url', [
+    '/forms/',
+    '/forms/?per_page=100',
+    '/forms/api/recent',
+    '/api/recent-activity',
+    '/dashboard',
+])
+def test_query_count_does_not_grow_with_rows(app, db, client, count_queries, url):
+    few = queries_for(app, db, client, count_queries, 3, url)
+    many = queries_for(app, db, client, count_queries, 30, url)
+    assert many == few
@@ -0,0 +1,105 @@
+"""Stock movements are atomic: shortfalls write nothing, batches are all or nothing, conflicts retry"""
+
+import sqlite3
+import pytest
+from sqlalchemy.exc import OperationalError
+from app.models import Customer, CustomerStock, StockTransaction
+from app.stock_ledger import stock_ledger, InsufficientStock
+
+
+@pytest.fixture
+def stock_ids(app, db):
+    with app.app_context():
+        customer = Customer(account_number='HIG001', name='Highland Hotel')
+        db.session.add(customer)
+        db.session.flush()
+        items = [CustomerStock(customer_id=customer.id, product_name='Hand soap', current_stock=10),
+                 CustomerStock(customer_id=customer.id, product_name='Floor cleaner', current_stock=3)]
+        db.session.add_all(items)
+        db.session.commit()
+        return [item.id for item in items]
+
+
+def levels(db, stock_ids):
+    return [db.session.get(CustomerStock, stock_id).current_stock for stock_id in stock_ids]
+
+
+def test_stock_out_beyond_balance_writes_nothing(app, db, user_id, stock_ids):
+    with app.app_context():
+        with pytest.raises(InsufficientStock) as error:
+            stock_ledger.run(lambda: stock_ledger.apply(stock_ids[1], 'stock_out', 4, user_id))
+
+        assert error.value.available == 3
+        assert levels(db, stock_ids) == [10, 3]
+        assert StockTransaction.query.count() == 0
+
+
+def test_delivery_note_with_a_bad_line_books_no_line(app, db, client, stock_ids):
+    response = client.post('/customer-stock/api/customer-stock/delivery-note', json={
+        'reference': 'DN-1001',
+        'lines': [
+            {'stock_item_id': stock_ids[0], 'quantity': 2},
+            {'stock_item_id': stock_ids[1], 'quantity': 5},
+        ]
+    })
+
+    assert response.status_code == 400
+    assert [error['line'] for error in response.get_json()['errors']] == [2]
+    with app.app_context():
+        assert levels(db, stock_ids) == [10, 3]
+        assert StockTransaction.query.count() == 0
+
+
+def test_delivery_note_books_every_line(app, db, client, stock_ids):
+    response = client.post('/customer-stock/api/customer-stock/delivery-note', json={
+        'reference': 'DN-1002',
+        'lines': [
+            {'stock_item_id': stock_ids[1], 'quantity': 3},
+            {'stock_item_id': stock_ids[0], 'quantity': 2},
+        ]
+    })
+
+    assert response.status_code == 200
+    assert [line['new_stock_level'] for line in response.get_json()['lines']] == [0, 8]
+    with app.app_context():
+        assert levels(db, stock_ids) == [8, 0]
+        assert StockTransaction.query.count() == 2
+
+
+def database_locked():
+    return OperationalError('UPDATE customer_stock ...', {}, sqlite3.OperationalError('database is locked'))
+
+
+def test_run_retries_a_locked_database_from_scratch(app, db, user_id, stock_ids, monkeypatch):
+    monkeypatch.setattr(stock_ledger, 'retry_backoff', 0)
+    attempts = []
+
+    def work():
+        attempts.append(1)
+        result = stock_ledger.apply(stock_ids[0], 'stock_out', 1, user_id)
+        if len(attempts) == 1:
+            raise database_locked()
+        return result
+
+    with app.app_context():
+        _, new_level = stock_ledger.run(work)
+
+        assert len(attempts) == 2
+        assert new_level == 9
+        assert levels(db, stock_ids) == [9, 3]
+        assert StockTransaction.query.count() == 1
+
+
+def test_run_gives_up_after_max_retries(app, db, monkeypatch):
+    monkeypatch.setattr(stock_ledger, 'retry_backoff', 0)
+    attempts = []
+
+    def work():
+        attempts.append(1)
+        raise database_locked()
+
+    with app.app_context():
+        with pytest.raises(OperationalError):
+            stock_ledger.run(work)
+
+    assert len(attempts) == stock_ledger.max_retries + 1
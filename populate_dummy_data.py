@@ -422,7 +422,7 @@ def create_standing_orders(customers, products, users):
     for customer in customers[:3]:
         standing_order = StandingOrder(
             customer_id=customer.id,
-            delivery_days='0,3',  # Monday and Thursday
+            delivery_mask=StandingOrder.days_to_mask([0, 3]),  # Monday and Thursday
             start_date=datetime.now().date() - timedelta(days=30),
             status='active',
             special_instructions=f'Please deliver to {customer.addresses[0].label if customer.addresses else "main entrance"}',